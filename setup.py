@@ -4,4 +4,9 @@ setup(
     name="generalized_flood_wave_graphs",
     version="0.1.0",
     packages=find_packages(),
+    entry_points={
+        "console_scripts": [
+            "flood-wave-pipeline=src.pipeline.pipeline_runner:main",
+        ],
+    },
 )
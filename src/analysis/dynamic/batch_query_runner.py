@@ -0,0 +1,121 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.analysis.dynamic.fwg_node_index import FWGNodeIndex
+from src.analysis.dynamic.query_executor import QueryExecutor
+from src.data_handling.data_interface import DataInterface
+from src.fwg_building.fwg_data_interface import FWGDataInterface
+from src.fwg_building.fwg_shard_store import FWGShardStore
+from src.wng_building.wng_data_interface import WNGDataInterface
+
+# the QueryExecutor of the worker processes, see BatchQueryRunner.iter_results
+shared_query_executor = None
+
+
+def set_shared_query_executor(query_executor: QueryExecutor) -> None:
+    """
+    Initializer of the worker processes.
+    :param QueryExecutor query_executor: the QueryExecutor used by the worker
+    """
+    global shared_query_executor
+    shared_query_executor = query_executor
+
+
+def run_shared_query(query_id, query: dict) -> tuple:
+    """
+    Runs a query in a worker process. An exception of the query is returned, not raised, so the
+    other queries of the batch are not affected.
+    :param query_id: the id of the query
+    :param dict query: the query, see QueryExecutor
+    :return tuple: the id of the query, the result and the error message (None if there was
+    no error)
+    """
+    try:
+        return query_id, shared_query_executor.run(query=query), None
+    except Exception as error:
+        return query_id, None, f'{type(error).__name__}: {error}'
+
+
+class BatchQueryRunner:
+    """
+    Class for running many queries (selection, extraction and analysis) on the same FWG and WNG
+    with a process pool. The graphs and the node index of the FWG are loaded only once: with the
+    'fork' start method the workers inherit them from the parent process without copying (copy on
+    write), with other start methods they are sent once to every worker. The results are yielded
+    as soon as the queries are completed. With a shard store, every worker loads only the FWG
+    shards needed by its queries.
+    """
+    def __init__(self, data_if: DataInterface, fwg_data_if: FWGDataInterface,
+                 wng_data_if: WNGDataInterface, max_workers: int = None,
+                 start_method: str = None, shard_store: FWGShardStore = None):
+        """
+        Constructor.
+        :param DataInterface data_if: a DataInterface instance
+        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance, not used (can be None)
+        if shard_store is given
+        :param WNGDataInterface wng_data_if: a WNGDataInterface instance
+        :param int max_workers: the number of worker processes, the number of CPUs if None.
+        If it is 0, the queries run in the current process.
+        :param str start_method: start method of the worker processes, 'fork' if available
+        :param FWGShardStore shard_store: store of the FWG shards, see QueryExecutor
+        """
+        self.query_executor = QueryExecutor(
+            data_if=data_if, fwg_data_if=fwg_data_if, wng_data_if=wng_data_if,
+            shard_store=shard_store
+        )
+        self.max_workers = max_workers
+
+        if start_method is None:
+            is_fork_available = 'fork' in multiprocessing.get_all_start_methods()
+            start_method = 'fork' if is_fork_available else 'spawn'
+        self.start_method = start_method
+
+        if shard_store is None:
+            # built before the workers are started, so they share it
+            FWGNodeIndex.get_node_index(fwg_data_if=fwg_data_if)
+
+    def iter_results(self, queries):
+        """
+        Runs the queries and yields the results in the order of completion.
+        :param queries: list of queries (see QueryExecutor) or dictionary of queries with ids
+        as keys, the ids of a list are the positions
+        :return: iterator of (query id, result, error message) tuples, see run_shared_query
+        """
+        query_items = queries.items() if isinstance(queries, dict) else enumerate(queries)
+
+        if self.max_workers == 0:
+            set_shared_query_executor(query_executor=self.query_executor)
+            for query_id, query in query_items:
+                yield run_shared_query(query_id=query_id, query=query)
+            return
+
+        if self.start_method == 'fork':
+            # inherited by the forked workers
+            set_shared_query_executor(query_executor=self.query_executor)
+            initializer, initargs = None, ()
+        else:
+            initializer, initargs = set_shared_query_executor, (self.query_executor, )
+
+        with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=initializer, initargs=initargs
+        ) as executor:
+            futures = [
+                executor.submit(run_shared_query, query_id, query)
+                for query_id, query in query_items
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def run(self, queries) -> dict:
+        """
+        Run function. Runs all queries.
+        :param queries: list or dictionary of queries, see iter_results
+        :return dict: keys are the query ids, values are dictionaries with keys 'result' and
+        'error'
+        """
+        return {
+            query_id: {'result': result, 'error': error}
+            for query_id, result, error in self.iter_results(queries=queries)
+        }
@@ -0,0 +1,79 @@
+from src.analysis.dynamic.fwg_query_cache import FWGQueryCache
+from src.analysis.dynamic.fwg_selector_base import FWGSelectorBase
+from src.analysis.dynamic.station_grid_index import StationGridIndex
+from src.data_handling.data_interface import DataInterface
+from src.fwg_building.fwg_data_interface import FWGDataInterface
+from src.fwg_building.fwg_shard_store import FWGShardStore
+from src.wng_building.wng_data_interface import WNGDataInterface
+
+
+class BoundingBoxFWGSelector(FWGSelectorBase):
+    """
+    Class for selecting the stations of the WNG in a region given by a bounding box or a polygon
+    in EOV coordinates, then filtering the FWG with these stations. The stations are looked up in
+    the station grid index (StationGridIndex) of the data.
+    """
+    def __init__(self, data_folder_path: str,
+                 fwg_data_if: FWGDataInterface, wng_data_if: WNGDataInterface,
+                 data_if: DataInterface, do_remove_water_levels: bool = False,
+                 cache: FWGQueryCache = None, shard_store: FWGShardStore = None):
+        """
+        Constructor.
+        :param str data_folder_path: path of the data folder
+        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance, not used (can be None)
+        if shard_store is given
+        :param WNGDataInterface wng_data_if: a WNGDataInterface instance
+        :param DataInterface data_if: a DataInterface instance containing the station coordinates
+        :param bool do_remove_water_levels: True if remove water levels from nodes, hence turning
+        three-tuple nodes into two-tuples, False if not
+        :param FWGQueryCache cache: cache of the selected subgraphs, None if the subgraphs are
+        always computed
+        :param FWGShardStore shard_store: store of the FWG shards, the shards overlapping the time
+        window are loaded before filtering, None if the whole FWG is in fwg_data_if
+        """
+        super().__init__(
+            data_folder_path=data_folder_path,
+            fwg_data_if=fwg_data_if, wng_data_if=wng_data_if,
+            do_remove_water_levels=do_remove_water_levels, cache=cache,
+            shard_store=shard_store
+        )
+        self.data_if = data_if
+
+    def get_wng_subgraph(self, spatial_filtering: dict) -> None:
+        """
+        Gets the subgraph of the WNG, see get_wng_subgraph_in_region.
+        :param dict spatial_filtering: Dictionary containing the bounding box as
+        [min EOVx, min EOVy, max EOVx, max EOVy] or the (EOVx, EOVy) vertices of a polygon,
+        for example
+        {
+            'bounding_box': [90000, 700000, 130000, 760000]
+        }
+        or
+        {
+            'polygon': [[90000, 700000], [130000, 720000], [100000, 760000]]
+        }
+        """
+        self.get_wng_subgraph_in_region(spatial_filtering=spatial_filtering)
+
+    def get_wng_subgraph_in_region(self, spatial_filtering: dict) -> None:
+        """
+        Gets the subgraph of the WNG induced by the stations of the region.
+        :param dict spatial_filtering: spatial filtering dictionary described in the docstring
+        of get_wng_subgraph
+        """
+        station_grid_index = StationGridIndex.get_station_grid_index(data_if=self.data_if)
+        if 'bounding_box' in spatial_filtering:
+            min_x, min_y, max_x, max_y = spatial_filtering['bounding_box']
+            stations = station_grid_index.get_stations_in_box(
+                min_x=min_x, min_y=min_y, max_x=max_x, max_y=max_y
+            )
+        elif 'polygon' in spatial_filtering:
+            stations = station_grid_index.get_stations_in_polygon(
+                polygon=spatial_filtering['polygon']
+            )
+        else:
+            raise ValueError("Give a 'bounding_box' or a 'polygon' for spatial filtering.")
+
+        self.wng_subgraph = self.wng.subgraph(
+            [station for station in stations if station in self.wng]
+        ).copy()
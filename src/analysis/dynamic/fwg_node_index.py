@@ -0,0 +1,60 @@
+from bisect import bisect_left, bisect_right
+
+import networkx as nx
+
+from src.fwg_building.fwg_data_interface import FWGDataInterface
+
+
+class FWGNodeIndex:
+    """
+    Class for indexing the nodes of the Flood Wave Graph by station and time. For every station
+    the nodes are sorted by their time keys, hence the nodes of a station in a time window are
+    found by binary search instead of scanning the whole graph.
+    """
+    def __init__(self, fwg: nx.DiGraph):
+        """
+        Constructor.
+        :param nx.DiGraph fwg: the Flood Wave Graph
+        """
+        station_nodes = {}
+        for node in fwg.nodes:
+            station_nodes.setdefault(node[0], []).append(node)
+
+        self.station_nodes = {}
+        self.station_time_keys = {}
+        for station, nodes in station_nodes.items():
+            nodes.sort(key=lambda x: x[1])
+            self.station_nodes[station] = nodes
+            self.station_time_keys[station] = [node[1] for node in nodes]
+
+    @staticmethod
+    def get_node_index(fwg_data_if: FWGDataInterface) -> 'FWGNodeIndex':
+        """
+        Returns the node index of the Flood Wave Graph, builds it at the first call.
+        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance
+        :return FWGNodeIndex: the node index stored in fwg_data_if
+        """
+        if fwg_data_if.node_index is None:
+            fwg_data_if.node_index = FWGNodeIndex(fwg=fwg_data_if.flood_wave_graph)
+
+        return fwg_data_if.node_index
+
+    def get_nodes(self, stations, start_key, end_key) -> list:
+        """
+        Collects the nodes of the given stations with time keys between the bounds.
+        :param stations: iterable of reg-numbers
+        :param start_key: the first time key (inclusive)
+        :param end_key: the last time key (inclusive)
+        :return list: the nodes station by station, sorted by time within a station
+        """
+        nodes = []
+        for station in stations:
+            time_keys = self.station_time_keys.get(station)
+            if time_keys is None:
+                continue
+
+            start = bisect_left(time_keys, start_key)
+            end = bisect_right(time_keys, end_key)
+            nodes.extend(self.station_nodes[station][start:end])
+
+        return nodes
@@ -0,0 +1,144 @@
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import networkx as nx
+
+
+class FWGQueryCache:
+    """
+    Class for memoizing the results of the selectors and the extractor. The results are stored
+    under keys made of the identity and the version of the input graphs and the normalized
+    parameters, the least recently used results are evicted when the number of entries or their
+    estimated size in bytes exceeds the limit. The cached graphs and flood waves are shared
+    between the hits, they must not be modified.
+    """
+    def __init__(self, max_entries: int = 128, max_bytes: int = None):
+        """
+        Constructor.
+        :param int max_entries: maximal number of cached results
+        :param int max_bytes: maximal estimated size of the cached results, None if unbounded
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.entries = OrderedDict()
+        self.entry_sizes = {}
+        self.number_of_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(*parts) -> tuple:
+        """
+        Creates a hashable key. Dictionaries and lists are serialized with sorted keys, hence
+        equal parameters give equal keys regardless of the order of the keys.
+        :param parts: hashable values, dictionaries or lists
+        :return tuple: the key
+        """
+        return tuple(
+            json.dumps(part, sort_keys=True, default=str) if isinstance(part, (dict, list))
+            else part
+            for part in parts
+        )
+
+    def get(self, key: tuple, identities: tuple = ()):
+        """
+        Returns a cached result and marks it as recently used.
+        :param tuple key: the key
+        :param tuple identities: objects the result was computed from, the result is only
+        returned if they are the same objects (keys containing id() values cannot be confused
+        after an object is freed)
+        :return: the result, None if it is not cached
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or len(entry[0]) != len(identities) or \
+                    any(x is not y for x, y in zip(entry[0], identities)):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+            return entry[1]
+
+    def put(self, key: tuple, value, identities: tuple = ()) -> None:
+        """
+        Stores a result and evicts the least recently used results if the cache is full.
+        :param tuple key: the key
+        :param value: the result, not None
+        :param tuple identities: objects the result was computed from, kept alive by the cache
+        """
+        size = self.get_size(value)
+        with self.lock:
+            if key in self.entries:
+                self.number_of_bytes -= self.entry_sizes.pop(key)
+            self.entries[key] = (identities, value)
+            self.entries.move_to_end(key)
+            self.entry_sizes[key] = size
+            self.number_of_bytes += size
+
+            while len(self.entries) > self.max_entries or \
+                    (self.max_bytes is not None and self.number_of_bytes > self.max_bytes
+                     and len(self.entries) > 1):
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.number_of_bytes -= self.entry_sizes.pop(evicted_key)
+
+    def clear(self) -> None:
+        """
+        Removes every result, the counters are kept.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.entry_sizes.clear()
+            self.number_of_bytes = 0
+
+    def get_stats(self) -> dict:
+        """
+        :return dict: the counters and the size of the cache
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.entries),
+            'bytes': self.number_of_bytes
+        }
+
+    @staticmethod
+    def get_size(value) -> int:
+        """
+        Estimates the memory used by a result: the containers and their items are counted
+        recursively, a graph is counted by its node and adjacency dictionaries. Tuples of nodes
+        and strings shared with the original graph are counted too, hence the estimate is an
+        upper bound.
+        :param value: the result
+        :return int: estimated size in bytes
+        """
+        size = 0
+        seen = set()
+        stack = [value]
+        while stack:
+            item = stack.pop()
+            if id(item) in seen:
+                continue
+            seen.add(id(item))
+
+            if isinstance(item, nx.Graph):
+                stack.extend([item._node, item._adj])
+                if item.is_directed():
+                    stack.append(item._pred)
+                continue
+
+            size += sys.getsizeof(item)
+            if isinstance(item, dict):
+                stack.extend(item.keys())
+                stack.extend(item.values())
+            elif isinstance(item, (list, tuple, set, frozenset)):
+                stack.extend(item)
+            elif hasattr(item, '__dict__'):
+                stack.append(vars(item))
+
+        return size
@@ -1,67 +1,182 @@
-import copy
 from abc import ABC, abstractmethod
 
 import networkx as nx
 
+from src.analysis.dynamic.fwg_node_index import FWGNodeIndex
+from src.analysis.dynamic.fwg_query_cache import FWGQueryCache
 from src.fwg_building.fwg_data_interface import FWGDataInterface
+from src.fwg_building.fwg_shard_store import FWGShardStore
+from src.profiling.stage_profiler import StageProfiler
 from src.wng_building.wng_data_interface import WNGDataInterface
 
 
 class FWGSelectorBase(ABC):
     """
-    Class for spatial and temporal filtering of the Flood Wave Graph.
+    Class for spatial and temporal filtering of the Flood Wave Graph. The child classes select
+    the subgraph of the WNG in get_wng_subgraph, the other steps of run are shared.
     """
     def __init__(self, data_folder_path: str,
                  fwg_data_if: FWGDataInterface, wng_data_if: WNGDataInterface,
-                 do_remove_water_levels: bool):
+                 do_remove_water_levels: bool, cache: FWGQueryCache = None,
+                 shard_store: FWGShardStore = None):
         """
         Constructor.
         :param str data_folder_path: path of the data folder
-        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance
+        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance, not used (can be None)
+        if shard_store is given
         :param WNGDataInterface wng_data_if: a WNGDataInterface instance
         :param bool do_remove_water_levels: True if remove water levels from nodes, hence turning
         three-tuple nodes into two-tuples, False if not
+        :param FWGQueryCache cache: cache of the selected subgraphs, None if the subgraphs are
+        always computed
+        :param FWGShardStore shard_store: store of the FWG shards, the shards overlapping the time
+        window are loaded before filtering, None if the whole FWG is in fwg_data_if
         """
+        if shard_store is not None:
+            shard_store.read_manifest()
+            fwg_data_if = shard_store.fwg_data_if
+
+        self.shard_store = shard_store
+        self.fwg_data_if = fwg_data_if
+        self.wng_data_if = wng_data_if
         self.fwg = fwg_data_if.flood_wave_graph
         self.wng = wng_data_if.water_network_graph
+        self.time_resolution = fwg_data_if.time_resolution
         self.data_folder_path = data_folder_path
         self.do_remove_water_levels = do_remove_water_levels
+        self.cache = cache
 
         self.wng_subgraph = nx.DiGraph()
         self.fwg_subgraph = nx.DiGraph()
 
-    @abstractmethod
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'nodes': self.fwg_subgraph.number_of_nodes(),
+        'edges': self.fwg_subgraph.number_of_edges()
+    })
     def run(self, temporal_filtering: dict, spatial_filtering: dict) -> None:
         """
-        Abstract run function.
-        :param dict temporal_filtering: {'start_date': start_date, 'end_date': end_date}
+        Run function. Gets the subgraph of the WNG and then filters the FWG by this subgraph.
+        If a shard store is given, the FWG shards overlapping the time window are loaded first.
+        If a cache is given, the subgraphs of a repeated selection are taken from the cache.
+        :param dict temporal_filtering: dictionary containing the start date and end date,
+        for example
+        {
+            'start_date': '2000-01-01',
+            'end_date': '2000-02-01'
+        }
+        :param dict spatial_filtering: spatial filtering dictionary described in the child class
+        """
+        self.load_shards(temporal_filtering=temporal_filtering)
+
+        cache_key = self.get_cache_key(
+            temporal_filtering=temporal_filtering, spatial_filtering=spatial_filtering
+        )
+        if self.load_from_cache(cache_key=cache_key):
+            return
+
+        self.get_wng_subgraph(spatial_filtering=spatial_filtering)
+
+        self.get_fwg_subgraph(temporal_filtering=temporal_filtering)
+
+        if self.do_remove_water_levels:
+            self.remove_water_levels()
+
+        self.save_to_cache(cache_key=cache_key)
+
+    @abstractmethod
+    def get_wng_subgraph(self, spatial_filtering: dict) -> None:
+        """
+        Abstract function for setting self.wng_subgraph.
         :param dict spatial_filtering: spatial filtering dictionary described in the child class
         """
         ...
 
+    def load_shards(self, temporal_filtering: dict) -> None:
+        """
+        Loads the FWG shards overlapping the time window if the selector has a shard store.
+        :param dict temporal_filtering: {'start_date': start_date, 'end_date': end_date}
+        """
+        if self.shard_store is not None:
+            self.shard_store.load(temporal_filtering=temporal_filtering)
+
+    def get_cache_key(self, temporal_filtering: dict, spatial_filtering: dict) -> tuple:
+        """
+        Creates the cache key of a selection: the class, the FWG and the WNG with the version of
+        the FWG, the time keys of the bounds and the spatial filtering, in which the order of the
+        'through' stations does not matter.
+        :param dict temporal_filtering: {'start_date': start_date, 'end_date': end_date}
+        :param dict spatial_filtering: spatial filtering dictionary described in the child class
+        :return tuple: the key
+        """
+        spatial_filtering = dict(spatial_filtering)
+        if 'through' in spatial_filtering:
+            spatial_filtering['through'] = sorted(spatial_filtering['through'])
+
+        return FWGQueryCache.get_key(
+            type(self).__name__, id(self.fwg_data_if), self.fwg_data_if.version,
+            id(self.wng_data_if),
+            self.time_resolution.to_key(temporal_filtering['start_date']),
+            self.time_resolution.to_key(temporal_filtering['end_date']),
+            spatial_filtering, self.do_remove_water_levels
+        )
+
+    def load_from_cache(self, cache_key: tuple) -> bool:
+        """
+        Sets the subgraphs from the cache.
+        :param tuple cache_key: key created by get_cache_key
+        :return bool: True if the selection was cached, False if it has to be computed
+        """
+        if self.cache is None:
+            return False
+
+        subgraphs = self.cache.get(key=cache_key, identities=(self.fwg_data_if, self.wng_data_if))
+        if subgraphs is None:
+            return False
+
+        self.wng_subgraph, self.fwg_subgraph = subgraphs
+        return True
+
+    def save_to_cache(self, cache_key: tuple) -> None:
+        """
+        Stores the subgraphs in the cache.
+        :param tuple cache_key: key created by get_cache_key
+        """
+        if self.cache is not None:
+            self.cache.put(
+                key=cache_key, value=(self.wng_subgraph, self.fwg_subgraph),
+                identities=(self.fwg_data_if, self.wng_data_if)
+            )
+
     def remove_water_levels(self) -> None:
-        relabel_mapping = {node: (node[0], node[1]) for node in self.fwg.nodes}
-        nx.relabel_nodes(G=self.fwg, mapping=relabel_mapping, copy=False)
+        """
+        Removes the water levels from the nodes of the FWG subgraph. The original FWG is not
+        modified.
+        """
+        relabel_mapping = {node: (node[0], node[1]) for node in self.fwg_subgraph.nodes}
+        nx.relabel_nodes(G=self.fwg_subgraph, mapping=relabel_mapping, copy=False)
 
     def get_fwg_subgraph(self, temporal_filtering: dict) -> None:
         """
         Gets the subgraph by keeping only those (reg_num, date) nodes for which reg_num is
-        a node of the WNG and date is between start_date and end_date.
-        :param dict temporal_filtering: {'start_date': start_date, 'end_date': end_date}
+        a node of the WNG and date is between start_date and end_date. The nodes are looked up
+        in the node index of the FWG and only the kept part of the graph is copied. Isolated
+        nodes are not kept.
+        :param dict temporal_filtering: {'start_date': start_date, 'end_date': end_date}, the
+        bounds can be date strings, timestamps or node time keys
         """
-        nodes_to_keep = []
-        for node in self.fwg.nodes:
-            is_node_in_subgraph = node[0] in self.wng_subgraph.nodes
-            is_date_between_bounds = (
-                    temporal_filtering['start_date'] <= node[1] <= temporal_filtering['end_date'])
-
-            if is_node_in_subgraph and is_date_between_bounds:
-                nodes_to_keep.append(node)
+        start_key = self.time_resolution.to_key(temporal_filtering['start_date'])
+        end_key = self.time_resolution.to_key(temporal_filtering['end_date'])
 
-        self.fwg_subgraph = copy.deepcopy(self.fwg)
-        self.fwg_subgraph.remove_nodes_from(
-            [n for n in self.fwg if n not in nodes_to_keep]
+        node_index = FWGNodeIndex.get_node_index(fwg_data_if=self.fwg_data_if)
+        nodes_to_keep = node_index.get_nodes(
+            stations=self.wng_subgraph.nodes, start_key=start_key, end_key=end_key
         )
-        self.fwg_subgraph.remove_nodes_from(
-            list(nx.isolates(self.fwg_subgraph))
+        node_set = set(nodes_to_keep)
+
+        self.fwg_subgraph = nx.DiGraph()
+        self.fwg_subgraph.add_edges_from(
+            (node, successor, data)
+            for node in nodes_to_keep
+            for successor, data in self.fwg.succ[node].items()
+            if successor in node_set
         )
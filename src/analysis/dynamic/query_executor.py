@@ -0,0 +1,210 @@
+import threading
+from contextlib import nullcontext
+
+from src.analysis.dynamic.bounding_box_fwg_selector import BoundingBoxFWGSelector
+from src.analysis.dynamic.fwg_query_cache import FWGQueryCache
+from src.analysis.dynamic.wng_path_fwg_selector import WNGPathFWGSelector
+from src.analysis.dynamic.wng_sink_fwg_selector import WNGSinkFWGSelector
+from src.analysis.static.flood_wave_analyser import FloodWaveAnalyser
+from src.analysis.static.flood_wave_extractor import FloodWaveExtractor
+from src.analysis.static.flood_wave_extractor_interface import FloodWaveExtractorInterface
+from src.analysis.utils.wng_path_fwg_plot_preparer import WNGPathFWGPlotPreparer
+from src.analysis.utils.wng_sink_fwg_plot_preparer import WNGSinkFWGPlotPreparer
+from src.data_handling.data_interface import DataInterface
+from src.fwg_building.fwg_data_interface import FWGDataInterface
+from src.fwg_building.fwg_shard_store import FWGShardStore
+from src.wng_building.wng_data_interface import WNGDataInterface
+
+
+class QueryExecutor:
+    """
+    Class for running a query, i.e. a selection of the FWG followed by the extraction and
+    the analysis of the flood waves, on graphs that are loaded only once. A query is a dictionary
+    like
+    {
+        'selector': 'wng_path',
+        'temporal_filtering': {'start_date': '2016-02-01', 'end_date': '2016-02-15'},
+        'spatial_filtering': {'source': '1514', 'target': '1520', 'through': []},
+        'is_equivalence_applied': True,
+        'do_remove_water_levels': False,
+        'do_analyse': True
+    }
+    The selector is 'wng_path' (WNGPathFWGSelector), 'wng_sink' (WNGSinkFWGSelector) or
+    'bounding_box' (BoundingBoxFWGSelector), the last three keys are optional.
+
+    With a shard store, the selectors load only the FWG shards overlapping the time windows of
+    the queries (see FWGShardStore). The shards are merged into the FWG in place, hence the
+    selections are run one at a time then.
+    """
+    selector_classes = {
+        'wng_path': WNGPathFWGSelector,
+        'wng_sink': WNGSinkFWGSelector,
+        'bounding_box': BoundingBoxFWGSelector
+    }
+
+    def __init__(self, data_if: DataInterface, fwg_data_if: FWGDataInterface,
+                 wng_data_if: WNGDataInterface, cache: FWGQueryCache = None,
+                 shard_store: FWGShardStore = None):
+        """
+        Constructor.
+        :param DataInterface data_if: a DataInterface instance
+        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance, not used (can be None)
+        if shard_store is given
+        :param WNGDataInterface wng_data_if: a WNGDataInterface instance
+        :param FWGQueryCache cache: cache shared by the selectors and the extractors of the
+        queries, None if nothing is cached
+        :param FWGShardStore shard_store: store of the FWG shards passed to the selectors, None if
+        the whole FWG is in fwg_data_if
+        """
+        if shard_store is not None:
+            shard_store.read_manifest()
+            fwg_data_if = shard_store.fwg_data_if
+
+        self.data_if = data_if
+        self.fwg_data_if = fwg_data_if
+        self.wng_data_if = wng_data_if
+        self.cache = cache
+        self.shard_store = shard_store
+        self.selection_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        """
+        Leaves out the lock, which is not picklable, e.g. when the executor is sent to the
+        workers of BatchQueryRunner.
+        :return dict: the attributes of the executor
+        """
+        state = dict(self.__dict__)
+        del state['selection_lock']
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Restores the attributes and creates a new lock.
+        :param dict state: the attributes of the executor
+        """
+        self.__dict__.update(state)
+        self.selection_lock = threading.Lock()
+
+    def select(self, query: dict):
+        """
+        Runs the selector of the query.
+        :param dict query: the query
+        :return: the selector after running it
+        """
+        selector_class = self.selector_classes[query['selector']]
+        selector_kwargs = {}
+        if 'do_remove_water_levels' in query:
+            selector_kwargs['do_remove_water_levels'] = query['do_remove_water_levels']
+        if selector_class is BoundingBoxFWGSelector:
+            selector_kwargs['data_if'] = self.data_if
+
+        selector = selector_class(
+            data_folder_path=None,
+            fwg_data_if=self.fwg_data_if,
+            wng_data_if=self.wng_data_if,
+            cache=self.cache,
+            shard_store=self.shard_store,
+            **selector_kwargs
+        )
+        with self.selection_lock if self.shard_store is not None else nullcontext():
+            selector.run(
+                temporal_filtering=query['temporal_filtering'],
+                spatial_filtering=query['spatial_filtering']
+            )
+
+        return selector
+
+    def extract(self, query: dict, selector) -> list:
+        """
+        Extracts the flood waves from the subgraphs of a selector.
+        :param dict query: the query
+        :param selector: the selector after running it
+        :return list: the flood waves
+        """
+        extractor = FloodWaveExtractor(
+            fwg=selector.fwg_subgraph, wng=selector.wng_subgraph,
+            data_if=self.data_if,
+            is_equivalence_applied=query.get('is_equivalence_applied', True),
+            cache=self.cache
+        )
+        extractor.run()
+
+        return extractor.extractor_if.flood_waves
+
+    def analyse(self, query: dict, flood_waves: list) -> dict:
+        """
+        Analyses the flood waves.
+        :param dict query: the query
+        :param list flood_waves: the flood waves
+        :return dict: the statistical results, only the number of flood waves if there is none
+        """
+        if not flood_waves:
+            return {'number_of_flood_waves': 0}
+
+        extractor_if = FloodWaveExtractorInterface()
+        extractor_if.flood_waves = flood_waves
+        analyser = FloodWaveAnalyser(
+            extractor_if=extractor_if, data_if=self.data_if,
+            is_equivalence_applied=query.get('is_equivalence_applied', True)
+        )
+
+        return analyser.run()
+
+    def prepare_plot(self, query: dict, selector) -> dict:
+        """
+        Prepares the subgraphs of a selector for plotting with WNGPathFWGPlotPreparer
+        ('wng_path' queries, optional 'start_date' and 'end_date' keys for cutting the graph and
+        'max_time_steps' key for aggregating long periods) or WNGSinkFWGPlotPreparer ('wng_sink'
+        and 'bounding_box' queries).
+        :param dict query: the query
+        :param selector: the selector after running it
+        :return dict: the nodes, the edges and the positions of the nodes, for the other queries
+        also the time keys of the nodes of every station
+        """
+        if query['selector'] == 'wng_path':
+            plot_preparer = WNGPathFWGPlotPreparer(
+                fwg_subgraph=selector.fwg_subgraph, wng_path=selector.wng_subgraph,
+                time_resolution=self.fwg_data_if.time_resolution
+            )
+            plot_preparer.run(
+                start_date=query.get('start_date'), end_date=query.get('end_date'),
+                max_time_steps=query.get('max_time_steps')
+            )
+
+            return {
+                'nodes': list(plot_preparer.graph_to_plot.nodes),
+                'edges': list(plot_preparer.graph_to_plot.edges),
+                'positions': [[node, position] for node, position
+                              in plot_preparer.positions.items()]
+            }
+
+        plot_preparer = WNGSinkFWGPlotPreparer(
+            data_if=self.data_if,
+            fwg_subgraph=selector.fwg_subgraph, wng_subgraph=selector.wng_subgraph
+        )
+        plot_preparer.run()
+
+        return {
+            'nodes': list(selector.fwg_subgraph.nodes),
+            'edges': list(selector.fwg_subgraph.edges),
+            'positions': [[node, position] for node, position
+                          in plot_preparer.node_positions.items()],
+            'dates': plot_preparer.dates_dict
+        }
+
+    def run(self, query: dict) -> dict:
+        """
+        Run function. Runs the whole query.
+        :param dict query: the query
+        :return dict: dictionary with keys 'flood_waves' and 'statistical_results' (None if the
+        query does not ask for analysis)
+        """
+        selector = self.select(query=query)
+        flood_waves = self.extract(query=query, selector=selector)
+
+        statistical_results = None
+        if query.get('do_analyse', True):
+            statistical_results = self.analyse(query=query, flood_waves=flood_waves)
+
+        return {'flood_waves': flood_waves, 'statistical_results': statistical_results}
@@ -0,0 +1,145 @@
+import numpy as np
+
+from src.data_handling.data_interface import DataInterface
+
+
+class StationGridIndex:
+    """
+    Class for indexing the stations by their EOV coordinates. The plane is divided into square
+    cells, every cell stores the stations in it, hence the stations in a region are found by
+    checking only the cells overlapping the region.
+    """
+    def __init__(self, reg_numbers: np.ndarray, coordinates: np.ndarray, cell_size: float = None):
+        """
+        Constructor.
+        :param np.ndarray reg_numbers: reg-numbers of the stations
+        :param np.ndarray coordinates: array of shape (number of stations, 2), the EOVx and EOVy
+        coordinates of the stations, the stations with missing coordinates are not indexed
+        :param float cell_size: side length of the cells, chosen so that a cell holds about one
+        station on average if None
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        # a single NaN would make the origin and the cell size NaN
+        is_located = ~np.isnan(coordinates).any(axis=1)
+        self.reg_numbers = np.asarray(reg_numbers)[is_located]
+        self.coordinates = coordinates[is_located]
+
+        if len(self.coordinates) > 0:
+            self.origin = self.coordinates.min(axis=0)
+            self.corner = self.coordinates.max(axis=0)
+        else:
+            self.origin = np.zeros(2)
+            self.corner = np.zeros(2)
+        extent = self.corner - self.origin
+        if cell_size is None:
+            area = max(extent[0], 1.0) * max(extent[1], 1.0)
+            cell_size = np.sqrt(area / max(len(self.coordinates), 1))
+        self.cell_size = float(cell_size)
+
+        # keys are (column, row) cells, values are integer arrays of station indices
+        self.cells = {}
+        cell_coordinates = self.get_cells(self.coordinates)
+        for i, cell in enumerate(map(tuple, cell_coordinates.tolist())):
+            self.cells.setdefault(cell, []).append(i)
+        self.cells = {cell: np.array(indices) for cell, indices in self.cells.items()}
+
+    @staticmethod
+    def get_station_grid_index(data_if: DataInterface) -> 'StationGridIndex':
+        """
+        Returns the station grid index of the data, builds it at the first call.
+        :param DataInterface data_if: a DataInterface instance
+        :return StationGridIndex: the index stored in data_if
+        """
+        if data_if.station_grid_index is None:
+            data_if.station_grid_index = StationGridIndex(
+                reg_numbers=data_if.reg_numbers,
+                coordinates=data_if.station_coordinate_array[:, :2]
+            )
+
+        return data_if.station_grid_index
+
+    def get_cells(self, coordinates: np.ndarray) -> np.ndarray:
+        """
+        :param np.ndarray coordinates: array of shape (number of points, 2)
+        :return np.ndarray: the (column, row) cells of the points
+        """
+        return np.floor((coordinates - self.origin) / self.cell_size).astype(np.int64)
+
+    def get_candidates(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """
+        Collects the stations of the cells overlapping a bounding box.
+        :param float min_x: the lower bound of EOVx
+        :param float min_y: the lower bound of EOVy
+        :param float max_x: the upper bound of EOVx
+        :param float max_y: the upper bound of EOVy
+        :return np.ndarray: indices of the stations, a superset of the stations in the box
+        """
+        # open or huge sides would overflow the integer cells, the stations are inside the
+        # bounding box of the grid anyway
+        bounds = np.clip(np.array([[min_x, min_y], [max_x, max_y]], dtype=np.float64),
+                         self.origin, self.corner)
+        (min_column, min_row), (max_column, max_row) = self.get_cells(bounds)
+        number_of_cells = (max_column - min_column + 1) * (max_row - min_row + 1)
+
+        if number_of_cells > len(self.cells):
+            # a box larger than the grid is answered by the occupied cells
+            candidates = [
+                indices for (column, row), indices in self.cells.items()
+                if min_column <= column <= max_column and min_row <= row <= max_row
+            ]
+        else:
+            candidates = [
+                self.cells[(column, row)]
+                for column in range(min_column, max_column + 1)
+                for row in range(min_row, max_row + 1)
+                if (column, row) in self.cells
+            ]
+
+        if not candidates:
+            return np.array([], dtype=np.int64)
+
+        return np.concatenate(candidates)
+
+    def get_stations_in_box(self, min_x: float, min_y: float,
+                            max_x: float, max_y: float) -> list:
+        """
+        Finds the stations in a bounding box (boundary included).
+        :param float min_x: the lower bound of EOVx
+        :param float min_y: the lower bound of EOVy
+        :param float max_x: the upper bound of EOVx
+        :param float max_y: the upper bound of EOVy
+        :return list: reg-numbers of the stations in the order of the reg-numbers
+        """
+        candidates = np.sort(self.get_candidates(min_x=min_x, min_y=min_y, max_x=max_x,
+                                                 max_y=max_y))
+        x = self.coordinates[candidates, 0]
+        y = self.coordinates[candidates, 1]
+        is_inside = (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)
+
+        return self.reg_numbers[candidates[is_inside]].tolist()
+
+    def get_stations_in_polygon(self, polygon: list) -> list:
+        """
+        Finds the stations in a polygon by ray casting, the cells are filtered by the bounding
+        box of the polygon first.
+        :param list polygon: the (EOVx, EOVy) vertices of the polygon
+        :return list: reg-numbers of the stations in the order of the reg-numbers
+        """
+        vertices = np.asarray(polygon, dtype=np.float64)
+        if len(vertices) < 3:
+            raise ValueError('A polygon needs at least three vertices.')
+
+        (min_x, min_y), (max_x, max_y) = vertices.min(axis=0), vertices.max(axis=0)
+        candidates = np.sort(self.get_candidates(min_x=min_x, min_y=min_y, max_x=max_x,
+                                                 max_y=max_y))
+        x = self.coordinates[candidates, 0]
+        y = self.coordinates[candidates, 1]
+
+        is_inside = np.zeros(len(candidates), dtype=bool)
+        for (x_1, y_1), (x_2, y_2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            is_crossing = (y_1 > y) != (y_2 > y)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                crossing_x = x_1 + (y - y_1) * (x_2 - x_1) / (y_2 - y_1)
+            is_inside ^= is_crossing & (x < crossing_x)
+
+        return self.reg_numbers[candidates[is_inside]].tolist()
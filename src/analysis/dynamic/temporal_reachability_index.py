@@ -0,0 +1,249 @@
+import networkx as nx
+import numpy as np
+
+from src.data_handling.time_resolution import TimeResolution
+
+
+class TemporalReachabilityIndex:
+    """
+    Class for answering time-bounded reachability queries on the Flood Wave Graph without
+    extracting the flood waves. For every node and every station downstream of it the index
+    stores the earliest and the latest time step of the nodes of the station reachable from the
+    node. The FWG edges connect a peak to the peaks of the next station at most beta time steps
+    later (see FloodWaveGraphPreparer), hence the labels are computed in one pass in reverse
+    topological order.
+
+    The reachable time steps of a station may have gaps between the earliest and the latest one,
+    therefore a node whose [earliest, latest] range contains the queried window but has no end
+    point in it is checked by a search pruned with the labels, every other answer comes directly
+    from the labels.
+    """
+    def __init__(self, fwg: nx.DiGraph, time_resolution: TimeResolution = None):
+        """
+        Constructor. Builds the labels.
+        :param nx.DiGraph fwg: the Flood Wave Graph (or a subgraph of it)
+        :param TimeResolution time_resolution: the time resolution of the nodes, daily if None
+        """
+        self.fwg = fwg
+        self.time_resolution = TimeResolution() if time_resolution is None else time_resolution
+
+        self.nodes = list(nx.topological_sort(fwg))
+        self.node_positions = {node: i for i, node in enumerate(self.nodes)}
+        self.node_steps = self.time_resolution.decode([node[1] for node in self.nodes]) \
+            if self.nodes else np.array([], dtype=np.int64)
+        self.stations = sorted(set(node[0] for node in self.nodes))
+        self.station_positions = {station: i for i, station in enumerate(self.stations)}
+        self.node_stations = np.fromiter(
+            (self.station_positions[node[0]] for node in self.nodes), dtype=np.int64,
+            count=len(self.nodes)
+        )
+
+        # labels of the i-th node are label_*[label_offsets[i]:label_offsets[i + 1]], sorted by
+        # station
+        self.label_offsets = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        self.label_stations = np.array([], dtype=np.int64)
+        self.label_earliest = np.array([], dtype=np.int64)
+        self.label_latest = np.array([], dtype=np.int64)
+        # labels of the i-th station are station_order[station_offsets[i]:station_offsets[i + 1]]
+        # (indices into the label arrays), sorted by the earliest time step
+        self.station_order = np.array([], dtype=np.int64)
+        self.station_offsets = np.zeros(len(self.stations) + 1, dtype=np.int64)
+        # the largest latest - earliest difference of the labels of every station
+        self.station_spreads = np.zeros(len(self.stations), dtype=np.int64)
+
+        self.build_labels()
+
+    def build_labels(self) -> None:
+        """
+        Computes the labels of the nodes from the labels of their successors in reverse
+        topological order and stores them in the label arrays.
+        """
+        node_labels = [None] * len(self.nodes)
+        steps = self.node_steps.tolist()
+        stations = self.node_stations.tolist()
+        for i in range(len(self.nodes) - 1, -1, -1):
+            labels = {}
+            for successor in self.fwg.successors(self.nodes[i]):
+                j = self.node_positions[successor]
+                successor_labels = [(stations[j], (steps[j], steps[j]))]
+                successor_labels.extend(node_labels[j].items())
+                for station, (earliest, latest) in successor_labels:
+                    if station in labels:
+                        labels[station] = (min(labels[station][0], earliest),
+                                           max(labels[station][1], latest))
+                    else:
+                        labels[station] = (earliest, latest)
+            node_labels[i] = labels
+
+        counts = np.fromiter((len(labels) for labels in node_labels), dtype=np.int64,
+                             count=len(self.nodes))
+        self.label_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        flat_labels = [
+            (station, earliest, latest)
+            for labels in node_labels
+            for station, (earliest, latest) in sorted(labels.items())
+        ]
+        label_array = np.array(flat_labels, dtype=np.int64).reshape(-1, 3)
+        self.label_stations = label_array[:, 0]
+        self.label_earliest = label_array[:, 1]
+        self.label_latest = label_array[:, 2]
+
+        self.station_order = np.lexsort((self.label_earliest, self.label_stations))
+        self.station_offsets = np.searchsorted(
+            self.label_stations[self.station_order], np.arange(len(self.stations) + 1)
+        )
+        np.maximum.at(self.station_spreads, self.label_stations,
+                      self.label_latest - self.label_earliest)
+
+    def to_step(self, value) -> int:
+        """
+        :param value: a node time key, a date string or a timestamp
+        :return int: the time step
+        """
+        return int(self.time_resolution.decode([self.time_resolution.to_key(value)])[0])
+
+    def get_label(self, node_index: int, station_index: int) -> tuple:
+        """
+        :param int node_index: position of the node in self.nodes
+        :param int station_index: position of the station in self.stations
+        :return tuple: the earliest and latest reachable time steps, None if the station is not
+        reachable
+        """
+        start, end = self.label_offsets[node_index], self.label_offsets[node_index + 1]
+        position = start + np.searchsorted(self.label_stations[start:end], station_index)
+        if position < end and self.label_stations[position] == station_index:
+            return int(self.label_earliest[position]), int(self.label_latest[position])
+
+        return None
+
+    def get_downstream(self, node: tuple, max_steps: int = None) -> dict:
+        """
+        Finds the stations reachable from a node.
+        :param tuple node: a node of the FWG
+        :param int max_steps: only arrivals at most max_steps time steps after the node are
+        considered, every arrival if None
+        :return dict: keys are reg-numbers, values are the earliest and latest reachable time
+        keys (the latest within max_steps)
+        """
+        i = self.node_positions[node]
+        start, end = self.label_offsets[i], self.label_offsets[i + 1]
+        last_step = None if max_steps is None else int(self.node_steps[i]) + max_steps
+
+        downstream = {}
+        for station_index, earliest, latest in zip(self.label_stations[start:end].tolist(),
+                                                   self.label_earliest[start:end].tolist(),
+                                                   self.label_latest[start:end].tolist()):
+            if last_step is not None:
+                if earliest > last_step:
+                    continue
+                if latest > last_step:
+                    latest = self.get_latest_arrival(
+                        node_index=i, station_index=station_index, last_step=last_step
+                    )
+            earliest_key, latest_key = self.time_resolution.encode([earliest, latest]).tolist()
+            downstream[self.stations[station_index]] = (earliest_key, latest_key)
+
+        return downstream
+
+    def get_upstream(self, station: str, start_date, end_date) -> list:
+        """
+        Finds the nodes from which a node of the station between two points in time is reachable,
+        e.g. the upstream peaks arriving at the station within the next k days.
+        :param str station: reg-number of the station
+        :param start_date: the first point in time (inclusive), a node time key, a date string or
+        a timestamp
+        :param end_date: the last point in time (inclusive)
+        :return list: the upstream nodes sorted by time
+        """
+        if station not in self.station_positions:
+            return []
+
+        station_index = self.station_positions[station]
+        start_step, end_step = self.to_step(start_date), self.to_step(end_date)
+
+        # labels with earliest in [start - spread, end] are the only ones that can intersect
+        order = self.station_order[self.station_offsets[station_index]:
+                                   self.station_offsets[station_index + 1]]
+        earliest = self.label_earliest[order]
+        lower = np.searchsorted(earliest, start_step - self.station_spreads[station_index])
+        upper = np.searchsorted(earliest, end_step, side='right')
+        candidates = order[lower:upper]
+        earliest = earliest[lower:upper]
+        latest = self.label_latest[candidates]
+
+        is_certain = ((earliest >= start_step) | (latest <= end_step)) & (latest >= start_step)
+        is_ambiguous = (earliest < start_step) & (latest > end_step)
+
+        node_indices = np.searchsorted(self.label_offsets, candidates, side='right') - 1
+        upstream_indices = node_indices[is_certain].tolist()
+        for node_index in node_indices[is_ambiguous].tolist():
+            if self.reaches_window(node_index=node_index, station_index=station_index,
+                                   start_step=start_step, end_step=end_step):
+                upstream_indices.append(node_index)
+
+        upstream_indices.sort(key=lambda x: (self.node_steps[x], x))
+
+        return [self.nodes[i] for i in upstream_indices]
+
+    def reaches_window(self, node_index: int, station_index: int,
+                       start_step: int, end_step: int) -> bool:
+        """
+        Checks whether a node of a station between two time steps is reachable from a node. The
+        successors whose labels do not intersect the window are not visited.
+        :param int node_index: position of the start node in self.nodes
+        :param int station_index: position of the station in self.stations
+        :param int start_step: the first time step (inclusive)
+        :param int end_step: the last time step (inclusive)
+        :return bool: True if the window is reachable
+        """
+        stack = [node_index]
+        visited = {node_index}
+        while stack:
+            i = stack.pop()
+            for successor in self.fwg.successors(self.nodes[i]):
+                j = self.node_positions[successor]
+                if j in visited:
+                    continue
+                visited.add(j)
+
+                if self.node_stations[j] == station_index:
+                    if start_step <= self.node_steps[j] <= end_step:
+                        return True
+                    continue
+
+                label = self.get_label(node_index=j, station_index=station_index)
+                if label is not None and label[0] <= end_step and label[1] >= start_step:
+                    stack.append(j)
+
+        return False
+
+    def get_latest_arrival(self, node_index: int, station_index: int, last_step: int) -> int:
+        """
+        Finds the latest reachable time step of a station not later than last_step.
+        :param int node_index: position of the start node in self.nodes
+        :param int station_index: position of the station in self.stations
+        :param int last_step: the last allowed time step
+        :return int: the latest reachable time step
+        """
+        latest = None
+        stack = [node_index]
+        visited = {node_index}
+        while stack:
+            i = stack.pop()
+            for successor in self.fwg.successors(self.nodes[i]):
+                j = self.node_positions[successor]
+                if j in visited or self.node_steps[j] > last_step:
+                    continue
+                visited.add(j)
+
+                if self.node_stations[j] == station_index:
+                    step = int(self.node_steps[j])
+                    latest = step if latest is None else max(latest, step)
+                    continue
+
+                label = self.get_label(node_index=j, station_index=station_index)
+                if label is not None and label[0] <= last_step and \
+                        (latest is None or label[1] > latest):
+                    stack.append(j)
+
+        return latest
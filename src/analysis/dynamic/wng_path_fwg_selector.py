@@ -2,8 +2,10 @@ import copy
 
 import networkx as nx
 
+from src.analysis.dynamic.fwg_query_cache import FWGQueryCache
 from src.analysis.dynamic.fwg_selector_base import FWGSelectorBase
 from src.fwg_building.fwg_data_interface import FWGDataInterface
+from src.fwg_building.fwg_shard_store import FWGShardStore
 from src.wng_building.wng_data_interface import WNGDataInterface
 
 
@@ -14,30 +16,31 @@ class WNGPathFWGSelector(FWGSelectorBase):
     """
     def __init__(self, data_folder_path: str,
                  fwg_data_if: FWGDataInterface, wng_data_if: WNGDataInterface,
-                 do_remove_water_levels: bool = False):
+                 do_remove_water_levels: bool = False, cache: FWGQueryCache = None,
+                 shard_store: FWGShardStore = None):
         """
         Constructor.
         :param str data_folder_path: path of the data folder
-        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance
+        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance, not used (can be None)
+        if shard_store is given
         :param WNGDataInterface wng_data_if: a WNGDataInterface instance
         :param bool do_remove_water_levels: True if remove water levels from nodes, hence turning
         three-tuple nodes into two-tuples, False if not
+        :param FWGQueryCache cache: cache of the selected subgraphs, None if the subgraphs are
+        always computed
+        :param FWGShardStore shard_store: store of the FWG shards, the shards overlapping the time
+        window are loaded before filtering, None if the whole FWG is in fwg_data_if
         """
         super().__init__(
             data_folder_path=data_folder_path,
             fwg_data_if=fwg_data_if, wng_data_if=wng_data_if,
-            do_remove_water_levels=do_remove_water_levels
+            do_remove_water_levels=do_remove_water_levels, cache=cache,
+            shard_store=shard_store
         )
 
-    def run(self, temporal_filtering: dict, spatial_filtering: dict) -> None:
+    def get_wng_subgraph(self, spatial_filtering: dict) -> None:
         """
-        Run function. Gets the desired path in the WNG and then filters the FWG along this path.
-        :param dict temporal_filtering: dictionary containing the start date and end date,
-        for example
-        {
-            'start_date': '2000-01-01',
-            'end_date': '2000-02-01'
-        }
+        Gets the subgraph of the WNG, see get_wng_path.
         :param dict spatial_filtering: Dictionary containing parameters for spatial filtering,
         keys are 'source', 'target' and 'through'. 'through' is a list of additional nodes that
         specify which nodes we would like the path to go through. For example
@@ -49,17 +52,12 @@ class WNGPathFWGSelector(FWGSelectorBase):
         """
         self.get_wng_path(spatial_filtering=spatial_filtering)
 
-        if self.do_remove_water_levels:
-            self.remove_water_levels()
-
-        self.get_fwg_subgraph(temporal_filtering=temporal_filtering)
-
     def get_wng_path(self, spatial_filtering: dict) -> None:
         """
         Gets the only path between spatial_filtering['source'] and spatial_filtering['target']
         that goes through all stations in spatial_filtering['through'].
         :param dict spatial_filtering: spatial filtering dictionary described in the docstring
-        of the run function
+        of get_wng_subgraph
         """
         all_paths = list(nx.all_simple_paths(
             self.wng,
@@ -2,8 +2,10 @@ import copy
 
 import networkx as nx
 
+from src.analysis.dynamic.fwg_query_cache import FWGQueryCache
 from src.analysis.dynamic.fwg_selector_base import FWGSelectorBase
 from src.fwg_building.fwg_data_interface import FWGDataInterface
+from src.fwg_building.fwg_shard_store import FWGShardStore
 from src.wng_building.wng_data_interface import WNGDataInterface
 
 
@@ -14,29 +16,31 @@ class WNGSinkFWGSelector(FWGSelectorBase):
     """
     def __init__(self, data_folder_path: str,
                  fwg_data_if: FWGDataInterface, wng_data_if: WNGDataInterface,
-                 do_remove_water_levels: bool = True):
+                 do_remove_water_levels: bool = True, cache: FWGQueryCache = None,
+                 shard_store: FWGShardStore = None):
         """
         Constructor.
         :param str data_folder_path: path of the data folder
-        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance
+        :param FWGDataInterface fwg_data_if: an FWGDataInterface instance, not used (can be None)
+        if shard_store is given
         :param WNGDataInterface wng_data_if: a WNGDataInterface instance
+        :param bool do_remove_water_levels: True if remove water levels from nodes, hence turning
+        three-tuple nodes into two-tuples, False if not
+        :param FWGQueryCache cache: cache of the selected subgraphs, None if the subgraphs are
+        always computed
+        :param FWGShardStore shard_store: store of the FWG shards, the shards overlapping the time
+        window are loaded before filtering, None if the whole FWG is in fwg_data_if
         """
         super().__init__(
             data_folder_path=data_folder_path,
             fwg_data_if=fwg_data_if, wng_data_if=wng_data_if,
-            do_remove_water_levels=do_remove_water_levels
+            do_remove_water_levels=do_remove_water_levels, cache=cache,
+            shard_store=shard_store
         )
 
-    def run(self, temporal_filtering: dict, spatial_filtering: dict) -> None:
+    def get_wng_subgraph(self, spatial_filtering: dict) -> None:
         """
-        Run function. Gets the desired subgraph in the WNG and then filters the FWG by
-        this subgraph.
-        :param dict temporal_filtering: dictionary containing the start date and end date,
-        for example
-        {
-            'start_date': '2000-01-01',
-            'end_date': '2000-02-01'
-        }
+        Gets the subgraph of the WNG, see get_wng_subgraph_with_sink.
         :param dict spatial_filtering: Dictionary containing the reg-number of the desired sink,
         for example
         {
@@ -45,11 +49,6 @@ class WNGSinkFWGSelector(FWGSelectorBase):
         """
         self.get_wng_subgraph_with_sink(spatial_filtering=spatial_filtering)
 
-        if self.do_remove_water_levels:
-            self.remove_water_levels()
-
-        self.get_fwg_subgraph(temporal_filtering=temporal_filtering)
-
     def get_wng_subgraph_with_sink(self, spatial_filtering: dict) -> None:
         """
         Gets the largest subgraph of the WNG with the given sink.
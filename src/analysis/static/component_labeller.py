@@ -0,0 +1,123 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+
+class ComponentLabeller:
+    """
+    Class for finding the weakly connected components of the Flood Wave Graph with array
+    operations. The nodes are ranked in their natural (tuple) order, the edges are converted into
+    integer arrays of ranks and the components are labelled by union-find with pointer jumping.
+    The nodes are then grouped component by component, hence a component is a range of node
+    indices.
+    """
+    def __init__(self, graph: nx.DiGraph):
+        """
+        Constructor.
+        :param nx.DiGraph graph: the graph, the nodes are tuples of the same length
+        """
+        self.graph = graph
+
+        self.nodes = []
+        self.labels = np.array([], dtype=np.int64)
+        self.component_offsets = np.zeros(1, dtype=np.int64)
+
+    def run(self) -> None:
+        """
+        Run function. Ranks the nodes, labels the components and sorts the nodes by component.
+        """
+        nodes = list(self.graph.nodes())
+        if not nodes:
+            return
+
+        ranks = self.get_ranks(nodes=nodes)
+        sorted_nodes = [None] * len(nodes)
+        for node, rank in zip(nodes, ranks.tolist()):
+            sorted_nodes[rank] = node
+
+        node_positions = {node: position for position, node in enumerate(nodes)}
+        edges = np.array(
+            [(node_positions[u], node_positions[v]) for u, v in self.graph.edges()],
+            dtype=np.int64
+        ).reshape(-1, 2)
+        roots = self.label_components(
+            number_of_nodes=len(nodes), sources=ranks[edges[:, 0]], targets=ranks[edges[:, 1]]
+        )
+
+        # the root of a component is its smallest node, stable sorting keeps the node order
+        order = np.argsort(roots, kind='stable')
+        self.nodes = [sorted_nodes[i] for i in order.tolist()]
+        sorted_roots = roots[order]
+        is_new_component = np.concatenate([[True], sorted_roots[1:] != sorted_roots[:-1]])
+        self.labels = np.cumsum(is_new_component) - 1
+        self.component_offsets = np.append(np.flatnonzero(is_new_component), len(nodes))
+
+    @staticmethod
+    def get_ranks(nodes: list) -> np.ndarray:
+        """
+        Computes the position of every node in the sorted order of the nodes without comparing
+        tuples: each field is replaced by its integer code in sorted order.
+        :param list nodes: nodes of the same length, e.g. (reg_number, time_key, level) tuples or
+        (reg_number, time_key) tuples if the water levels were removed
+        :return np.ndarray: rank of each node
+        """
+        field_codes = [
+            pd.factorize(pd.Series(field, dtype=object), sort=True)[0] for field in zip(*nodes)
+        ]
+
+        order = np.lexsort(field_codes[::-1])
+        ranks = np.empty(len(nodes), dtype=np.int64)
+        ranks[order] = np.arange(len(nodes))
+
+        return ranks
+
+    @staticmethod
+    def label_components(number_of_nodes: int, sources: np.ndarray,
+                         targets: np.ndarray) -> np.ndarray:
+        """
+        Labels the weakly connected components by union-find: the roots of the two ends of every
+        edge are hooked to the smaller one, then the paths are compressed by pointer jumping until
+        no edge connects different roots.
+        :param int number_of_nodes: the number of nodes
+        :param np.ndarray sources: integer start nodes of the edges
+        :param np.ndarray targets: integer end nodes of the edges
+        :return np.ndarray: the smallest node of the component of every node
+        """
+        roots = np.arange(number_of_nodes, dtype=np.int64)
+        while True:
+            source_roots = roots[sources]
+            target_roots = roots[targets]
+            is_crossing = source_roots != target_roots
+            if not is_crossing.any():
+                return roots
+
+            lower_roots = np.minimum(source_roots[is_crossing], target_roots[is_crossing])
+            upper_roots = np.maximum(source_roots[is_crossing], target_roots[is_crossing])
+            np.minimum.at(roots, upper_roots, lower_roots)
+
+            while True:
+                next_roots = roots[roots]
+                if np.array_equal(next_roots, roots):
+                    break
+                roots = next_roots
+
+    def get_number_of_components(self) -> int:
+        """
+        :return int: the number of components
+        """
+        return len(self.component_offsets) - 1
+
+    def get_component(self, index: int) -> list:
+        """
+        :param int index: index of the component
+        :return list: the sorted nodes of the component
+        """
+        return self.nodes[self.component_offsets[index]:self.component_offsets[index + 1]]
+
+    def iter_components(self):
+        """
+        Iterates over the components in the order of sorted(map(sorted, components)).
+        :return: iterator of sorted node lists
+        """
+        for index in range(self.get_number_of_components()):
+            yield self.get_component(index=index)
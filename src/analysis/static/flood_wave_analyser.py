@@ -1,11 +1,11 @@
-from datetime import datetime
-
 import numpy as np
 import pandas as pd
 
 from src.analysis.static.flood_wave_extractor_interface import FloodWaveExtractorInterface
+from src.analysis.static.flood_wave_path_dag import FloodWavePathDAG
 from src.data_handling.data_interface import DataInterface
 from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.profiling.stage_profiler import StageProfiler
 
 
 class FloodWaveAnalyser:
@@ -18,34 +18,37 @@ class FloodWaveAnalyser:
                  do_save_results: bool = False, data_folder_path: str = None):
         self.flood_waves = extractor_if.flood_waves
         self.reg_rkm_mapping = data_if.reg_rkm_mapping
+        self.time_resolution = data_if.time_resolution
         self.is_equivalence_applied = is_equivalence_applied
         self.do_save_results = do_save_results
         self.data_folder_path = data_folder_path
         self.timestamp_folder_name = extractor_if.timestamp_folder_name
 
-        if self.is_equivalence_applied:
-            self.flood_waves_to_analyse = self.flood_waves
-        else:
-            self.flood_waves_to_analyse = [wave for paths in self.flood_waves for wave in paths]
+        # one entry per flood wave or per equivalence class, weights are the numbers of paths
+        self.start_nodes, self.end_nodes, self.weights = self.get_start_and_end_nodes()
 
         self.distances = []
         self.durations = []
         self.statistical_results = {}
 
+    @StageProfiler.profile_stage(get_counts=lambda self: {'waves': int(self.weights.sum())})
     def run(self) -> dict:
         """
         Run function. Gets the number of flood waves total, gets distances and durations
         of flood waves. Optionally saves results.
         :return dict: dictionary containing the results
         """
-        number_of_flood_waves = len(self.flood_waves_to_analyse)
+        number_of_flood_waves = int(self.weights.sum())
         self.distances = self.get_distances()
         self.durations = self.get_durations()
 
+        weights = None if self.is_equivalence_applied else self.weights
         self.statistical_results = {
             'number_of_flood_waves': number_of_flood_waves,
-            'spatial_statistics': self.get_statistics(data=np.array(self.distances)),
-            'temporal_statistics': self.get_statistics(data=np.array(self.durations))
+            'spatial_statistics': self.get_statistics(data=np.array(self.distances),
+                                                      weights=weights),
+            'temporal_statistics': self.get_statistics(data=np.array(self.durations),
+                                                       weights=weights)
         }
 
         if self.do_save_results:
@@ -53,55 +56,113 @@ class FloodWaveAnalyser:
 
         return self.statistical_results
 
+    def get_start_and_end_nodes(self) -> tuple:
+        """
+        Collects the first and last nodes of all flood waves. Only these are needed for the
+        analysis, hence an equivalence class (all of its paths share the end nodes) is kept once
+        with its number of paths as weight, the paths of a FloodWavePathDAG are counted, not
+        listed.
+        :return tuple: list of first nodes, list of last nodes, array of the weights
+        """
+        if self.is_equivalence_applied:
+            return [wave[0] for wave in self.flood_waves], \
+                [wave[-1] for wave in self.flood_waves], \
+                np.ones(len(self.flood_waves), dtype=np.int64)
+
+        start_nodes = []
+        end_nodes = []
+        for paths in self.flood_waves:
+            start_node, end_node = FloodWavePathDAG.get_end_nodes(paths=paths)
+            start_nodes.append(start_node)
+            end_nodes.append(end_node)
+        weights = np.fromiter((len(paths) for paths in self.flood_waves), dtype=np.int64,
+                              count=len(self.flood_waves))
+
+        return start_nodes, end_nodes, weights
+
     def get_distances(self) -> list:
         """
-        Collects distances of all flood waves in a list.
+        Collects distances of all flood waves (or equivalence classes) in a list.
         :return list: distances of all flood waves
         """
         distances = []
-        for wave in self.flood_waves_to_analyse:
-            start_station = wave[0][0]
-            end_station = wave[-1][0]
-            distance = self.reg_rkm_mapping[start_station] - self.reg_rkm_mapping[end_station]
+        for start_node, end_node in zip(self.start_nodes, self.end_nodes):
+            distance = self.reg_rkm_mapping[start_node[0]] - self.reg_rkm_mapping[end_node[0]]
             distances.append(distance)
 
         return distances
 
     def get_durations(self) -> list:
         """
-        Collects temporal lengths of all flood waves in a list.
+        Collects temporal lengths of all flood waves (or equivalence classes) in a list. The
+        lengths are given in time steps of the time resolution, i.e. in days for daily data.
         :return list: temporal lengths of all flood waves
         """
-        temporal_lengths = []
-        for wave in self.flood_waves_to_analyse:
-            date1 = datetime.strptime(wave[0][1], "%Y-%m-%d")
-            date2 = datetime.strptime(wave[-1][1], "%Y-%m-%d")
-            days_diff = (date2 - date1).days
-            temporal_lengths.append(days_diff)
+        start_steps = self.time_resolution.decode([node[1] for node in self.start_nodes])
+        end_steps = self.time_resolution.decode([node[1] for node in self.end_nodes])
 
-        return temporal_lengths
+        return (end_steps - start_steps).tolist()
 
     @staticmethod
-    def get_statistics(data: np.ndarray) -> dict:
+    def get_statistics(data: np.ndarray, weights: np.ndarray = None) -> dict:
         """
         Gathers basic statistics of some numerical data.
         :param np.array data: distances or durations
+        :param np.ndarray weights: integer multiplicities of the values (numbers of paths of the
+        equivalence classes), every value is counted once if None
         :return dict: dictionary of basic statistics
         """
+        if weights is None:
+            mean = np.mean(data)
+            median = np.median(data)
+        else:
+            mean = np.average(data, weights=weights)
+            median = FloodWaveAnalyser.get_weighted_medians(
+                values=data, weights=weights, groups=np.zeros(len(data), dtype=np.int64)
+            )[0]
+
         stats = {
-            'mean': float(np.mean(data)),
-            'median': float(np.median(data)),
+            'mean': float(mean),
+            'median': float(median),
             'max': float(np.max(data)),
             'min': float(np.min(data))
         }
 
         return stats
 
+    @staticmethod
+    def get_weighted_medians(values: np.ndarray, weights: np.ndarray,
+                             groups: np.ndarray) -> np.ndarray:
+        """
+        Computes the median of every group as if every value was repeated by its weight (as
+        numpy.median of the repeated values), without repeating the values.
+        :param np.ndarray values: numerical values
+        :param np.ndarray weights: positive integer weights of the values
+        :param np.ndarray groups: integer group ids of the values
+        :return np.ndarray: the medians of the groups in increasing order of the group ids
+        """
+        order = np.lexsort((values, groups))
+        values = np.asarray(values, dtype=np.float64)[order]
+        weights = np.asarray(weights, dtype=np.int64)[order]
+        _, group_starts = np.unique(np.asarray(groups)[order], return_index=True)
+
+        cumulative_weights = np.cumsum(weights)
+        totals = np.add.reduceat(weights, group_starts)
+        offsets = cumulative_weights[group_starts] - weights[group_starts]
+        # positions of the middle one or two values in the repeated sorted values
+        lower = np.searchsorted(cumulative_weights, offsets + (totals - 1) // 2, side='right')
+        upper = np.searchsorted(cumulative_weights, offsets + totals // 2, side='right')
+
+        return (values[lower] + values[upper]) / 2
+
     def save_results(self) -> None:
         """
-        Saves results into the desired folder.
+        Saves results into the desired folder. The lengths and durations are saved per path,
+        hence the values of an equivalence class are repeated by its number of paths.
         """
-        lengths_and_durations = np.array([self.distances, self.durations]).T
+        lengths_and_durations = np.repeat(
+            np.array([self.distances, self.durations]).T.reshape(-1, 2), self.weights, axis=0
+        )
         df = pd.DataFrame(
             data=lengths_and_durations,
             columns=['distances', 'durations'],
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+
+from src.analysis.static.flood_wave_extractor_interface import FloodWaveExtractorInterface
+from src.analysis.static.flood_wave_path_dag import FloodWavePathDAG
+from src.data_handling.data_interface import DataInterface
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.profiling.stage_profiler import StageProfiler
+
+
+class FloodWaveEventTable:
+    """
+    Class for turning the extracted flood waves into columnar tables of propagation metrics. The
+    nodes of all waves are flattened once into arrays with wave offsets, every metric is then
+    computed by array operations:
+    - events: one row per flood wave with the start and end stations, rivers and times, the
+    duration (in time steps), the distance (in river kilometres), the celerity (river kilometres
+    per time step, NaN for waves within one time step), the water levels at the ends and their
+    difference (attenuation, NaN if the water levels were removed from the nodes)
+    - segments: one row per consecutive node pair of a wave with the lag, the distance and the
+    water level difference
+    If the equivalence is not applied, an equivalence class is represented by one of its paths
+    and the number of its paths is given in the 'number_of_paths' column.
+    """
+    event_columns = [
+        'start_station', 'end_station', 'start_river', 'end_river', 'start_time', 'end_time',
+        'year', 'number_of_nodes', 'number_of_paths', 'duration', 'distance', 'celerity',
+        'start_level', 'end_level', 'attenuation'
+    ]
+    segment_columns = [
+        'wave', 'upstream_station', 'downstream_station', 'river', 'lag', 'distance',
+        'level_difference'
+    ]
+
+    def __init__(self, extractor_if: FloodWaveExtractorInterface, data_if: DataInterface,
+                 is_equivalence_applied: bool, do_save_tables: bool = False,
+                 data_folder_path: str = None):
+        """
+        Constructor.
+        :param FloodWaveExtractorInterface extractor_if: a FloodWaveExtractorInterface instance
+        :param DataInterface data_if: a DataInterface instance
+        :param bool is_equivalence_applied: True if the flood waves are paths, False if they are
+        equivalence classes (lists of paths or FloodWavePathDAG instances)
+        :param bool do_save_tables: whether to save the tables as csv files next to the flood waves
+        :param str data_folder_path: path of the data folder
+        """
+        self.flood_waves = extractor_if.flood_waves
+        self.timestamp_folder_name = extractor_if.timestamp_folder_name
+        self.time_resolution = data_if.time_resolution
+        self.is_equivalence_applied = is_equivalence_applied
+        self.do_save_tables = do_save_tables
+        self.data_folder_path = data_folder_path
+
+        self.reg_numbers = np.asarray(data_if.reg_numbers)
+        self.reg_index_mapping = data_if.reg_index_mapping
+        self.station_rkms = np.array(
+            [data_if.reg_rkm_mapping.get(reg_number, np.nan) for reg_number in self.reg_numbers],
+            dtype=np.float64
+        )
+        self.station_rivers = np.array([
+            data_if.station_river_mapping.get(data_if.reg_station_mapping.get(reg_number))
+            for reg_number in self.reg_numbers
+        ], dtype=object)
+
+        self.events = pd.DataFrame(columns=self.event_columns)
+        self.segments = pd.DataFrame(columns=self.segment_columns)
+
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'waves': len(self.events),
+        'segments': len(self.segments)
+    })
+    def run(self) -> None:
+        """
+        Run function. Creates the event and segment tables and saves them if needed.
+        """
+        paths, number_of_paths = self.get_paths()
+        wave_offsets, stations, steps, levels = self.flatten_paths(paths=paths)
+
+        self.events = self.create_events(
+            wave_offsets=wave_offsets, stations=stations, steps=steps, levels=levels,
+            number_of_paths=number_of_paths
+        )
+        self.segments = self.create_segments(
+            wave_offsets=wave_offsets, stations=stations, steps=steps, levels=levels
+        )
+
+        if self.do_save_tables:
+            self.save_tables()
+
+    def get_paths(self) -> tuple:
+        """
+        Collects one path per flood wave.
+        :return tuple: list of paths, array of the number of paths of the flood waves
+        """
+        if self.is_equivalence_applied:
+            return self.flood_waves, np.ones(len(self.flood_waves), dtype=np.int64)
+
+        paths = []
+        number_of_paths = []
+        for wave in self.flood_waves:
+            if isinstance(wave, FloodWavePathDAG):
+                paths.append(next(iter(wave)))
+                number_of_paths.append(wave.number_of_paths)
+            else:
+                paths.append(wave[0])
+                number_of_paths.append(len(wave))
+
+        return paths, np.array(number_of_paths, dtype=np.int64)
+
+    def flatten_paths(self, paths: list) -> tuple:
+        """
+        Flattens the nodes of the paths into arrays.
+        :param list paths: list of paths
+        :return tuple: wave offsets (the nodes of the i-th wave are at
+        [wave_offsets[i], wave_offsets[i + 1])), station indices in reg_numbers, time steps and
+        water levels (NaN for two-tuple nodes)
+        """
+        lengths = np.fromiter((len(path) for path in paths), dtype=np.int64, count=len(paths))
+        wave_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        nodes = [node for path in paths for node in path]
+
+        stations = np.fromiter(
+            (self.reg_index_mapping[node[0]] for node in nodes), dtype=np.int64, count=len(nodes)
+        )
+        steps = self.time_resolution.decode([node[1] for node in nodes]) if nodes \
+            else np.array([], dtype=np.int64)
+        levels = np.fromiter(
+            (node[2] if len(node) > 2 else np.nan for node in nodes), dtype=np.float64,
+            count=len(nodes)
+        )
+
+        return wave_offsets, stations, steps, levels
+
+    def create_events(self, wave_offsets: np.ndarray, stations: np.ndarray, steps: np.ndarray,
+                      levels: np.ndarray, number_of_paths: np.ndarray) -> pd.DataFrame:
+        """
+        Creates the event table.
+        :param np.ndarray wave_offsets: offsets of the waves in the node arrays
+        :param np.ndarray stations: station indices of the nodes
+        :param np.ndarray steps: time steps of the nodes
+        :param np.ndarray levels: water levels of the nodes
+        :param np.ndarray number_of_paths: number of paths of the waves
+        :return pd.DataFrame: the event table
+        """
+        first = wave_offsets[:-1]
+        last = wave_offsets[1:] - 1
+
+        duration = steps[last] - steps[first]
+        distance = self.station_rkms[stations[first]] - self.station_rkms[stations[last]]
+        celerity = np.full(len(first), np.nan)
+        np.divide(distance, duration, out=celerity, where=duration > 0)
+        start_times = self.time_resolution.to_timestamps(steps[first])
+
+        return pd.DataFrame({
+            'start_station': self.reg_numbers[stations[first]],
+            'end_station': self.reg_numbers[stations[last]],
+            'start_river': self.station_rivers[stations[first]],
+            'end_river': self.station_rivers[stations[last]],
+            'start_time': start_times,
+            'end_time': self.time_resolution.to_timestamps(steps[last]),
+            'year': start_times.year,
+            'number_of_nodes': last - first + 1,
+            'number_of_paths': number_of_paths,
+            'duration': duration,
+            'distance': distance,
+            'celerity': celerity,
+            'start_level': levels[first],
+            'end_level': levels[last],
+            'attenuation': levels[first] - levels[last]
+        }, columns=self.event_columns)
+
+    def create_segments(self, wave_offsets: np.ndarray, stations: np.ndarray, steps: np.ndarray,
+                        levels: np.ndarray) -> pd.DataFrame:
+        """
+        Creates the segment table.
+        :param np.ndarray wave_offsets: offsets of the waves in the node arrays
+        :param np.ndarray stations: station indices of the nodes
+        :param np.ndarray steps: time steps of the nodes
+        :param np.ndarray levels: water levels of the nodes
+        :return pd.DataFrame: the segment table
+        """
+        # a segment starts at every node except the last node of a wave
+        is_segment_start = np.ones(len(stations), dtype=bool)
+        is_segment_start[wave_offsets[1:] - 1] = False
+        upstream = np.flatnonzero(is_segment_start)
+        downstream = upstream + 1
+        waves = np.searchsorted(wave_offsets, upstream, side='right') - 1
+
+        return pd.DataFrame({
+            'wave': waves,
+            'upstream_station': self.reg_numbers[stations[upstream]],
+            'downstream_station': self.reg_numbers[stations[downstream]],
+            'river': self.station_rivers[stations[downstream]],
+            'lag': steps[downstream] - steps[upstream],
+            'distance': self.station_rkms[stations[upstream]] -
+            self.station_rkms[stations[downstream]],
+            'level_difference': levels[upstream] - levels[downstream]
+        }, columns=self.segment_columns)
+
+    def aggregate(self, by, table: str = 'events', metrics: list = None,
+                  functions: list = None) -> pd.DataFrame:
+        """
+        Aggregates the metrics of a table by groups, e.g. by 'start_station', 'start_river' and
+        'year' for events or by 'upstream_station' and 'river' for segments.
+        :param by: a column name or a list of column names
+        :param str table: 'events' or 'segments'
+        :param list metrics: the aggregated columns, the numerical metrics of the table if None
+        :param list functions: aggregation functions, count, mean, median, min and max if None
+        :return pd.DataFrame: the aggregated table with (metric, function) columns
+        """
+        if table == 'events':
+            data = self.events
+            default_metrics = ['duration', 'distance', 'celerity', 'attenuation']
+        elif table == 'segments':
+            data = self.segments
+            default_metrics = ['lag', 'distance', 'level_difference']
+        else:
+            raise ValueError(f'Unknown table: {table}')
+
+        metrics = default_metrics if metrics is None else metrics
+        functions = ['count', 'mean', 'median', 'min', 'max'] if functions is None else functions
+
+        return data.groupby(by, dropna=False)[metrics].agg(functions)
+
+    def save_tables(self) -> None:
+        """
+        Saves the tables into the folder of the flood waves.
+        """
+        for file_name, data in [('wave_events', self.events), ('wave_segments', self.segments)]:
+            GeneratedDataLoader.save_csv(
+                data=data,
+                data_folder_path=self.data_folder_path,
+                subfolder_names=['flood_waves', self.timestamp_folder_name],
+                file_name=file_name
+            )
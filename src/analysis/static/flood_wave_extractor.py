@@ -3,9 +3,14 @@ from datetime import datetime
 
 import networkx as nx
 
+from src.analysis.dynamic.fwg_query_cache import FWGQueryCache
+from src.analysis.static.component_labeller import ComponentLabeller
 from src.analysis.static.flood_wave_extractor_interface import FloodWaveExtractorInterface
+from src.analysis.static.flood_wave_path_dag import FloodWavePathDAG
 from src.data_handling.data_interface import DataInterface
+from src.data_handling.flood_wave_file import FloodWaveFile
 from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.profiling.stage_profiler import StageProfiler
 
 
 class FloodWaveExtractor:
@@ -14,7 +19,9 @@ class FloodWaveExtractor:
     """
     def __init__(self, fwg: nx.DiGraph, wng: nx.DiGraph,
                  data_if: DataInterface, is_equivalence_applied: bool,
-                 do_save_flood_waves: bool = False, data_folder_path: str = None):
+                 do_save_flood_waves: bool = False, data_folder_path: str = None,
+                 wave_file_format: str = 'json', do_share_paths: bool = False,
+                 cache: FWGQueryCache = None):
         """
         Constructor.
         :param nx.DiGraph fwg: the filtered Flood Wave Graph
@@ -24,41 +31,87 @@ class FloodWaveExtractor:
         classes, False otherwise
         :param bool do_save_flood_waves: whether to save extracted flood waves or not
         :param str data_folder_path: path of the data folder
+        :param str wave_file_format: format of the saved flood waves: 'json' (one json file),
+        'compact' (flat node table with offsets, see FloodWaveFile) or 'jsonl' (JSON Lines)
+        :param bool do_share_paths: if the equivalence is not applied, True if the equivalence
+        classes are returned as FloodWavePathDAG instances storing every node once, False if they
+        are returned as lists of paths
+        :param FWGQueryCache cache: cache of the flood waves, keyed on the identity of the graphs
+        and the flags of the extraction, None if the flood waves are always extracted
         """
+        if wave_file_format not in ['json', 'compact', 'jsonl']:
+            raise ValueError(f'Unknown wave file format: {wave_file_format}')
+
         self.fwg = fwg
         self.wng = wng
         self.station_coordinates = data_if.station_coordinates
+        self.time_resolution = data_if.time_resolution
         self.is_equivalence_applied = is_equivalence_applied
         self.do_save_flood_waves = do_save_flood_waves
         self.data_folder_path = data_folder_path
+        self.wave_file_format = wave_file_format
+        self.do_share_paths = do_share_paths
+        self.cache = cache
+        self.number_of_components = 0
 
         self.extractor_if = FloodWaveExtractorInterface()
 
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'components': self.number_of_components,
+        'waves': len(self.extractor_if.flood_waves)
+    })
     def run(self) -> None:
         """
-        Run function. Gets flood waves.
+        Run function. Gets flood waves, from the cache if the same graphs were already extracted
+        with the same flags.
         """
-        self.extractor_if.flood_waves = self.get_flood_waves()
+        if self.cache is None:
+            self.extractor_if.flood_waves = self.get_flood_waves()
+        else:
+            self.extractor_if.flood_waves = self.get_cached_flood_waves()
 
         if self.do_save_flood_waves:
             self.save_flood_waves()
 
+    def get_cached_flood_waves(self) -> list:
+        """
+        Looks up the flood waves in the cache, extracts and stores them if they are not cached.
+        :return list: list of extracted flood waves
+        """
+        cache_key = FWGQueryCache.get_key(
+            type(self).__name__, id(self.fwg), id(self.wng), id(self.station_coordinates),
+            self.is_equivalence_applied, self.do_share_paths
+        )
+        identities = (self.fwg, self.wng, self.station_coordinates)
+
+        cached = self.cache.get(key=cache_key, identities=identities)
+        if cached is None:
+            cached = (self.get_flood_waves(), self.number_of_components)
+            self.cache.put(key=cache_key, value=cached, identities=identities)
+
+        flood_waves, self.number_of_components = cached
+        return list(flood_waves)
+
     def get_flood_waves(self) -> list:
         """
         This function returns the actual flood waves in the FWG with equivalence.
         :return list: list of extracted flood waves
         """
-        components_unsorted = list(nx.weakly_connected_components(self.fwg))
-        components = sorted(map(sorted, components_unsorted))
+        component_labeller = ComponentLabeller(graph=self.fwg)
+        component_labeller.run()
+        self.number_of_components = component_labeller.get_number_of_components()
 
         waves = []
-        for comp in components:
-            possible_pairs = self.get_possible_pairs(comp=list(comp))
+        for comp in component_labeller.iter_components():
+            possible_pairs = self.get_possible_pairs(comp=comp)
 
             for start, end in possible_pairs:
                 try:
                     if self.is_equivalence_applied:
                         wave = nx.shortest_path(G=self.fwg, source=start, target=end)
+                    elif self.do_share_paths:
+                        waves.append(FloodWavePathDAG(fwg=self.fwg, source=start, target=end))
+                        continue
                     else:
                         wave = nx.all_shortest_paths(G=self.fwg, source=start, target=end)
                     waves.append(list(wave))
@@ -107,12 +160,17 @@ class FloodWaveExtractor:
         - key 1: 'is_equivalence_applied' -> bool whether we applied equivalence or not
         - key 2: 'stations' -> list of stations in the filtered WNG
         - key 3: 'flood_waves' -> list of all flood waves
+        With the 'compact' format the same data is saved by FloodWaveFile, with the 'jsonl'
+        format the first line contains keys 1 and 2 and every further line is a flood wave.
         """
         stations = list(self.wng.nodes())
+        flood_waves = self.extractor_if.flood_waves
+        if self.do_share_paths and self.wave_file_format != 'compact':
+            flood_waves = [list(paths) for paths in flood_waves]
         extracted_flood_waves = {
             'is_equivalence_applied': self.is_equivalence_applied,
             'stations': stations,
-            'flood_waves': self.extractor_if.flood_waves
+            'flood_waves': flood_waves
         }
 
         current_date_and_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -120,9 +178,29 @@ class FloodWaveExtractor:
 
         subfolder_names = ['flood_waves', current_date_and_time]
 
-        GeneratedDataLoader.save_json(
-            data=extracted_flood_waves,
-            data_folder_path=self.data_folder_path,
-            subfolder_names=subfolder_names,
-            file_name='waves'
-        )
+        if self.wave_file_format == 'compact':
+            FloodWaveFile.save(
+                flood_waves=self.extractor_if.flood_waves,
+                is_equivalence_applied=self.is_equivalence_applied,
+                stations=stations,
+                data_folder_path=self.data_folder_path,
+                subfolder_names=subfolder_names,
+                file_name='waves',
+                time_resolution=self.time_resolution
+            )
+        elif self.wave_file_format == 'jsonl':
+            GeneratedDataLoader.save_jsonl(
+                header={'is_equivalence_applied': self.is_equivalence_applied,
+                        'stations': stations},
+                lines=flood_waves,
+                data_folder_path=self.data_folder_path,
+                subfolder_names=subfolder_names,
+                file_name='waves'
+            )
+        else:
+            GeneratedDataLoader.save_json(
+                data=extracted_flood_waves,
+                data_folder_path=self.data_folder_path,
+                subfolder_names=subfolder_names,
+                file_name='waves'
+            )
@@ -0,0 +1,113 @@
+import networkx as nx
+
+
+class FloodWavePathDAG:
+    """
+    Class for storing all shortest paths between two nodes of the Flood Wave Graph, i.e. an
+    equivalence class of flood waves, without storing every path separately. The shortest paths
+    form a directed acyclic graph in which every node is stored only once. Iterating over an
+    instance yields the individual paths (flood waves) one by one.
+    """
+    def __init__(self, fwg: nx.DiGraph, source: tuple, target: tuple):
+        """
+        Constructor.
+        :param nx.DiGraph fwg: the (filtered) Flood Wave Graph
+        :param tuple source: the first node of the flood waves
+        :param tuple target: the last node of the flood waves
+        """
+        distances_from_source = nx.single_source_shortest_path_length(G=fwg, source=source)
+        if target not in distances_from_source:
+            raise nx.NetworkXNoPath(f'Target {target} cannot be reached from {source}.')
+        distances_to_target = nx.single_source_shortest_path_length(
+            G=fwg.reverse(copy=False), source=target
+        )
+
+        path_length = distances_from_source[target]
+        nodes_on_paths = [
+            node for node, distance in distances_from_source.items()
+            if distance + distances_to_target.get(node, path_length + 1) == path_length
+        ]
+        # BFS order: sorted by the distance from the source
+        self.nodes = nodes_on_paths
+        node_indices = {node: index for index, node in enumerate(self.nodes)}
+
+        self.successors = []
+        for node in self.nodes:
+            self.successors.append([
+                node_indices[successor] for successor in fwg.successors(node)
+                if successor in node_indices and
+                distances_from_source[successor] == distances_from_source[node] + 1
+            ])
+
+        self.number_of_paths = self.count_paths()
+
+    @property
+    def source(self) -> tuple:
+        """
+        :return tuple: the first node of every path
+        """
+        return self.nodes[0]
+
+    @property
+    def target(self) -> tuple:
+        """
+        :return tuple: the last node of every path
+        """
+        return self.nodes[-1]
+
+    def count_paths(self) -> int:
+        """
+        Counts the paths from the source to the target with dynamic programming.
+        :return int: the number of paths
+        """
+        path_counts = [0] * len(self.nodes)
+        path_counts[-1] = 1
+        for index in range(len(self.nodes) - 2, -1, -1):
+            path_counts[index] = sum(path_counts[successor] for successor in self.successors[index])
+
+        return path_counts[0]
+
+    def get_stations(self) -> set:
+        """
+        :return set: the reg-numbers of the stations touched by at least one of the paths
+        """
+        return {node[0] for node in self.nodes}
+
+    def __len__(self) -> int:
+        """
+        :return int: the number of paths
+        """
+        return self.number_of_paths
+
+    def __iter__(self):
+        """
+        Iterates over the paths with depth-first search. Only the current path is kept in memory.
+        :return: iterator of paths, a path is a list of nodes
+        """
+        path = [0]
+        stack = [iter(self.successors[0])]
+        while stack:
+            successor = next(stack[-1], None)
+            if successor is None:
+                stack.pop()
+                path.pop()
+            elif successor == len(self.nodes) - 1:
+                yield [self.nodes[index] for index in path + [successor]]
+            else:
+                path.append(successor)
+                stack.append(iter(self.successors[successor]))
+
+        if len(self.nodes) == 1:
+            yield [self.nodes[0]]
+
+    @staticmethod
+    def get_end_nodes(paths) -> tuple:
+        """
+        Returns the first and last nodes of an equivalence class. All paths of a class share them.
+        :param paths: a FloodWavePathDAG instance or a list of paths
+        :return tuple: the first node and the last node
+        """
+        if isinstance(paths, FloodWavePathDAG):
+            return paths.source, paths.target
+
+        return paths[0][0], paths[0][-1]
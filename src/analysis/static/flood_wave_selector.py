@@ -1,4 +1,5 @@
-from datetime import datetime
+from src.analysis.static.flood_wave_path_dag import FloodWavePathDAG
+from src.data_handling.time_resolution import TimeResolution
 
 
 class FloodWaveSelector:
@@ -11,7 +12,8 @@ class FloodWaveSelector:
         :param list waves: list of all the flood waves
         :param list impacted_stations: stations the flood waves should go through
         :param bool is_equivalence_applied: True if we only consider one element of the equivalence
-        classes, False otherwise
+        classes, False otherwise. In the latter case an equivalence class can be a list of paths or
+        a FloodWavePathDAG instance.
         :return list: full flood waves
         """
         if is_equivalence_applied:
@@ -24,6 +26,9 @@ class FloodWaveSelector:
         else:
             final_waves = []
             for paths in waves:
+                if isinstance(paths, FloodWavePathDAG) and \
+                        not set(impacted_stations).issubset(paths.get_stations()):
+                    continue
                 filtered_paths = []
                 for path in paths:
                     stations_in_flood_wave = [path[i][0] for i in range(len(path))]
@@ -35,33 +40,33 @@ class FloodWaveSelector:
         return final_waves
 
     @staticmethod
-    def get_flood_waves_by_duration(waves: list, max_duration_days: int,
-                                    is_equivalence_applied: bool) -> list:
+    def get_flood_waves_by_duration(waves: list, max_duration_days,
+                                    is_equivalence_applied: bool,
+                                    time_resolution: TimeResolution = None) -> list:
         """
         Gets flood waves for which the time difference between the first and last nodes
         are at most max_duration_days.
         :param list waves: list of all the flood waves
-        :param int max_duration_days: maximal allowed time duration of a flood wave
+        :param max_duration_days: maximal allowed time duration of a flood wave, either a number
+        of time steps (days for daily data) or a duration like '2D' or '36h'
         :param bool is_equivalence_applied: True if we only consider one element of the equivalence
-        classes, False otherwise
+        classes, False otherwise (a class is a list of paths or a FloodWavePathDAG instance)
+        :param TimeResolution time_resolution: the time resolution of the nodes, daily if None
         :return: flood waves that lasted for at most max_duration_days days
         """
-        if is_equivalence_applied:
-            final_waves = []
-            for wave in waves:
-                date1 = datetime.strptime(wave[0][1], "%Y-%m-%d")
-                date2 = datetime.strptime(wave[-1][1], "%Y-%m-%d")
-                days_diff = (date2 - date1).days
-                if days_diff <= max_duration_days:
-                    final_waves.append(wave)
+        if time_resolution is None:
+            time_resolution = TimeResolution()
+        max_duration = time_resolution.to_steps(max_duration_days)
 
+        if is_equivalence_applied:
+            end_nodes = [(wave[0], wave[-1]) for wave in waves]
         else:
-            final_waves = []
-            for paths in waves:
-                date1 = datetime.strptime(paths[0][0][1], "%Y-%m-%d")
-                date2 = datetime.strptime(paths[0][-1][1], "%Y-%m-%d")
-                days_diff = (date2 - date1).days
-                if days_diff <= max_duration_days:
-                    final_waves.append(paths)
+            end_nodes = [FloodWavePathDAG.get_end_nodes(paths=paths) for paths in waves]
+
+        start_steps = time_resolution.decode([start[1] for start, _ in end_nodes])
+        end_steps = time_resolution.decode([end[1] for _, end in end_nodes])
+        is_short_enough = (end_steps - start_steps) <= max_duration
+
+        final_waves = [wave for wave, is_kept in zip(waves, is_short_enough) if is_kept]
 
         return final_waves
@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+
+from src.analysis.static.flood_wave_analyser import FloodWaveAnalyser
+from src.analysis.static.flood_wave_extractor_interface import FloodWaveExtractorInterface
+from src.data_handling.data_interface import DataInterface
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.profiling.stage_profiler import StageProfiler
+
+
+class PeriodicFloodWaveAnalyser(FloodWaveAnalyser):
+    """
+    Class for analysing the flood waves of one extraction per time bucket. Every wave is assigned
+    to a range of buckets, the rows are repeated for the buckets and the statistics of all buckets
+    are computed in one grouped pass, hence the selection and the extraction run once for the
+    whole period. The bucket types are
+    - 'year': calendar years
+    - 'hydrological_year': from 1 November to 31 October, named after the year in which it ends
+    - 'season': winter (December to February, named after the year of January), spring, summer
+    and autumn
+    - 'window': sliding windows of window_length time steps starting every window_step time steps
+    from origin
+    The boundary policy decides the buckets of a wave:
+    - 'start': the buckets containing its first node
+    - 'end': the buckets containing its last node
+    - 'overlap': every bucket overlapping the wave
+    - 'contained': the buckets containing the whole wave, a wave crossing a boundary of
+    non-overlapping buckets is left out
+    """
+    bucket_types = ['year', 'hydrological_year', 'season', 'window']
+    boundary_policies = ['start', 'end', 'overlap', 'contained']
+    season_names = ['winter', 'spring', 'summer', 'autumn']
+
+    def __init__(self, extractor_if: FloodWaveExtractorInterface,
+                 data_if: DataInterface,
+                 is_equivalence_applied: bool,
+                 bucket_type: str = 'year', boundary_policy: str = 'start',
+                 window_length=None, window_step=None, origin=None,
+                 do_save_results: bool = False, data_folder_path: str = None):
+        """
+        Constructor.
+        :param FloodWaveExtractorInterface extractor_if: a FloodWaveExtractorInterface instance
+        :param DataInterface data_if: a DataInterface instance
+        :param bool is_equivalence_applied: True if the flood waves are paths, False if they are
+        equivalence classes
+        :param str bucket_type: 'year', 'hydrological_year', 'season' or 'window'
+        :param str boundary_policy: 'start', 'end', 'overlap' or 'contained'
+        :param window_length: length of the windows, a number of time steps or a duration like
+        '30D', only for 'window'
+        :param window_step: time between the starts of consecutive windows, window_length if None
+        :param origin: start of the first window, a node time key, a date string or a timestamp,
+        the first node of the flood waves if None
+        :param bool do_save_results: whether to save the results
+        :param str data_folder_path: path of the data folder
+        """
+        if bucket_type not in self.bucket_types:
+            raise ValueError(f'Unknown bucket type: {bucket_type}')
+        if boundary_policy not in self.boundary_policies:
+            raise ValueError(f'Unknown boundary policy: {boundary_policy}')
+        if bucket_type == 'window' and window_length is None:
+            raise ValueError("Give the window_length for the 'window' bucket type.")
+
+        super().__init__(
+            extractor_if=extractor_if, data_if=data_if,
+            is_equivalence_applied=is_equivalence_applied,
+            do_save_results=do_save_results, data_folder_path=data_folder_path
+        )
+        self.bucket_type = bucket_type
+        self.boundary_policy = boundary_policy
+        if bucket_type == 'window':
+            self.window_length = self.time_resolution.to_steps(window_length)
+            self.window_step = self.window_length if window_step is None \
+                else self.time_resolution.to_steps(window_step)
+            if self.window_length < 1 or self.window_step < 1:
+                raise ValueError('window_length and window_step have to be positive.')
+        self.origin = origin
+
+        self.bucket_statistics = pd.DataFrame()
+
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'waves': int(self.weights.sum()),
+        'buckets': len(self.bucket_statistics)
+    })
+    def run(self) -> dict:
+        """
+        Run function. Gets the distances and durations of the flood waves, assigns the waves to
+        the buckets and gets the statistics of every bucket. Optionally saves results.
+        :return dict: keys are the bucket labels, values are dictionaries in the format of
+        FloodWaveAnalyser.run
+        """
+        self.distances = self.get_distances()
+        self.durations = self.get_durations()
+
+        start_steps = self.time_resolution.decode([node[1] for node in self.start_nodes]) \
+            if self.start_nodes else np.array([], dtype=np.int64)
+        end_steps = self.time_resolution.decode([node[1] for node in self.end_nodes]) \
+            if self.end_nodes else np.array([], dtype=np.int64)
+        first_buckets, last_buckets = self.get_bucket_ranges(
+            start_steps=start_steps, end_steps=end_steps
+        )
+
+        self.bucket_statistics = self.get_bucket_statistics(
+            first_buckets=first_buckets, last_buckets=last_buckets
+        )
+        self.statistical_results = self.get_statistical_results()
+
+        if self.do_save_results:
+            self.save_results()
+
+        return self.statistical_results
+
+    def get_bucket_ranges(self, start_steps: np.ndarray, end_steps: np.ndarray) -> tuple:
+        """
+        Gets the buckets of the flood waves according to the boundary policy.
+        :param np.ndarray start_steps: time steps of the first nodes
+        :param np.ndarray end_steps: time steps of the last nodes
+        :return tuple: arrays of the first and last bucket ids of the waves, a wave without a
+        bucket has a last bucket id smaller than its first one
+        """
+        if self.bucket_type == 'window':
+            return self.get_window_ranges(start_steps=start_steps, end_steps=end_steps)
+
+        start_buckets = self.get_calendar_buckets(steps=start_steps)
+        end_buckets = self.get_calendar_buckets(steps=end_steps)
+        if self.boundary_policy == 'start':
+            return start_buckets, start_buckets
+        if self.boundary_policy == 'end':
+            return end_buckets, end_buckets
+        if self.boundary_policy == 'overlap':
+            return start_buckets, end_buckets
+
+        return start_buckets, np.where(start_buckets == end_buckets, start_buckets,
+                                       start_buckets - 1)
+
+    def get_calendar_buckets(self, steps: np.ndarray) -> np.ndarray:
+        """
+        :param np.ndarray steps: time steps
+        :return np.ndarray: consecutive integer ids of the calendar buckets of the time steps
+        (the year, or 4 * year + season index for seasons)
+        """
+        timestamps = self.time_resolution.to_timestamps(steps)
+        years = timestamps.year.to_numpy().astype(np.int64)
+        months = timestamps.month.to_numpy().astype(np.int64)
+
+        if self.bucket_type == 'year':
+            return years
+        if self.bucket_type == 'hydrological_year':
+            return years + (months >= 11)
+
+        return 4 * (years + (months == 12)) + (months % 12) // 3
+
+    def get_origin_step(self) -> int:
+        """
+        :return int: the time step of the start of the first window
+        """
+        if self.origin is not None:
+            return int(self.time_resolution.decode([self.time_resolution.to_key(self.origin)])[0])
+        if not self.start_nodes:
+            return 0
+
+        return int(self.time_resolution.decode([node[1] for node in self.start_nodes]).min())
+
+    def get_window_ranges(self, start_steps: np.ndarray, end_steps: np.ndarray) -> tuple:
+        """
+        Gets the windows of the flood waves according to the boundary policy. The k-th window
+        covers the time steps [origin + k * window_step, origin + k * window_step + window_length).
+        :param np.ndarray start_steps: time steps of the first nodes
+        :param np.ndarray end_steps: time steps of the last nodes
+        :return tuple: arrays of the first and last window indices of the waves
+        """
+        origin_step = self.get_origin_step()
+
+        def get_first_window(steps: np.ndarray) -> np.ndarray:
+            # the first window ending after the time steps
+            first_windows = -((origin_step + self.window_length - 1 - steps) // self.window_step)
+            return np.maximum(first_windows, 0)
+
+        def get_last_window(steps: np.ndarray) -> np.ndarray:
+            # the last window starting at or before the time steps
+            return (steps - origin_step) // self.window_step
+
+        if self.boundary_policy == 'start':
+            return get_first_window(start_steps), get_last_window(start_steps)
+        if self.boundary_policy == 'end':
+            return get_first_window(end_steps), get_last_window(end_steps)
+        if self.boundary_policy == 'overlap':
+            return get_first_window(start_steps), get_last_window(end_steps)
+
+        return get_first_window(end_steps), get_last_window(start_steps)
+
+    def get_bucket_statistics(self, first_buckets: np.ndarray,
+                              last_buckets: np.ndarray) -> pd.DataFrame:
+        """
+        Repeats the distances and durations for the buckets of the waves and aggregates them by
+        bucket, the waves are weighted by their numbers of paths.
+        :param np.ndarray first_buckets: the first bucket ids of the waves
+        :param np.ndarray last_buckets: the last bucket ids of the waves
+        :return pd.DataFrame: one row per non-empty bucket (sorted by bucket id) with the bucket
+        label, the number of flood waves and the (statistic, function) columns
+        """
+        number_of_buckets = np.maximum(last_buckets - first_buckets + 1, 0)
+        wave_indices = np.repeat(np.arange(len(first_buckets)), number_of_buckets)
+        offsets = np.cumsum(number_of_buckets) - number_of_buckets
+        bucket_ids = first_buckets[wave_indices] + \
+            (np.arange(len(wave_indices)) - offsets[wave_indices])
+
+        weights = self.weights[wave_indices]
+        data = pd.DataFrame({
+            'bucket': bucket_ids,
+            'weight': weights,
+            'spatial_statistics': np.asarray(self.distances, dtype=np.float64)[wave_indices],
+            'temporal_statistics': np.asarray(self.durations, dtype=np.float64)[wave_indices]
+        })
+        grouped_data = data.groupby('bucket', sort=True)
+        number_of_flood_waves = grouped_data['weight'].sum()
+
+        # an equivalence class is weighted by its number of paths instead of being repeated
+        statistics = {('number_of_flood_waves', ''): number_of_flood_waves}
+        for key in ['spatial_statistics', 'temporal_statistics']:
+            weighted_sums = (data[key] * data['weight']).groupby(data['bucket'], sort=True).sum()
+            statistics[(key, 'mean')] = weighted_sums / number_of_flood_waves
+            statistics[(key, 'median')] = FloodWaveAnalyser.get_weighted_medians(
+                values=data[key].to_numpy(), weights=weights, groups=bucket_ids
+            )
+            statistics[(key, 'max')] = grouped_data[key].max()
+            statistics[(key, 'min')] = grouped_data[key].min()
+        bucket_statistics = pd.DataFrame(statistics, index=number_of_flood_waves.index)
+
+        bucket_statistics.insert(0, 'label', self.get_bucket_labels(
+            bucket_ids=bucket_statistics.index.to_numpy()
+        ))
+
+        return bucket_statistics
+
+    def get_bucket_labels(self, bucket_ids: np.ndarray) -> list:
+        """
+        :param np.ndarray bucket_ids: bucket ids
+        :return list: labels of the buckets, e.g. '1990' for years, '1990-winter' for seasons and
+        the time key of the first time step for windows
+        """
+        bucket_ids = np.asarray(bucket_ids, dtype=np.int64)
+        if self.bucket_type == 'window':
+            return [str(key) for key in self.time_resolution.encode(
+                self.get_origin_step() + bucket_ids * self.window_step
+            ).tolist()]
+        if self.bucket_type == 'season':
+            return [f'{bucket_id // 4}-{self.season_names[bucket_id % 4]}'
+                    for bucket_id in bucket_ids.tolist()]
+
+        return [str(bucket_id) for bucket_id in bucket_ids.tolist()]
+
+    def get_statistical_results(self) -> dict:
+        """
+        Converts the bucket statistics into the format of FloodWaveAnalyser.
+        :return dict: keys are the bucket labels, values are dictionaries of the number of flood
+        waves and the spatial and temporal statistics
+        """
+        results = {}
+        for _, row in self.bucket_statistics.iterrows():
+            results[row['label'].iloc[0]] = {
+                'number_of_flood_waves': int(row['number_of_flood_waves'].iloc[0]),
+                **{
+                    key: {function: float(row[(key, function)])
+                          for function in ['mean', 'median', 'max', 'min']}
+                    for key in ['spatial_statistics', 'temporal_statistics']
+                }
+            }
+
+        return results
+
+    def save_results(self) -> None:
+        """
+        Saves the results of the buckets into the folder of the flood waves.
+        """
+        GeneratedDataLoader.save_json(
+            data=self.statistical_results,
+            data_folder_path=self.data_folder_path,
+            subfolder_names=['flood_waves', self.timestamp_folder_name],
+            file_name=f'statistical_results_by_{self.bucket_type}'
+        )
+
+        table = self.bucket_statistics.copy()
+        table.columns = ['_'.join(column).strip('_') if isinstance(column, tuple) else column
+                         for column in table.columns]
+        GeneratedDataLoader.save_csv(
+            data=table,
+            data_folder_path=self.data_folder_path,
+            subfolder_names=['flood_waves', self.timestamp_folder_name],
+            file_name=f'statistics_by_{self.bucket_type}'
+        )
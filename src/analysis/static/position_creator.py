@@ -1,6 +1,7 @@
-from datetime import datetime
-
 import networkx as nx
+import numpy as np
+
+from src.data_handling.time_resolution import TimeResolution
 
 
 class PositionCreator:
@@ -8,22 +9,99 @@ class PositionCreator:
     Class for creating positions of nodes for plotting.
     """
     @staticmethod
-    def create_positions(graph: nx.DiGraph, reg_numbers: list) -> dict:
+    def create_positions(graph: nx.DiGraph, reg_numbers: list,
+                         time_resolution: TimeResolution = None) -> dict:
         """
-        Creates positions. x coordinates are dates with a frequency of 1 day, y coordinates
-        are reg-numbers in order
+        Creates positions. x coordinates are time steps (dates with a frequency of 1 day for daily
+        data), y coordinates are reg-numbers in order
         :param nx.DiGraph graph: graph to plot
         :param list reg_numbers: the reg-numbers of the stations
+        :param TimeResolution time_resolution: the time resolution of the nodes, daily if None
         :return dict: the positions in a dictionary, keys are the nodes and values are
         the positions
         """
-        min_date_temp = min([node[1] for node in graph.nodes()])
-        min_date = datetime.strptime(min_date_temp, '%Y-%m-%d')
+        nodes = list(graph.nodes())
+        x_coords, y_coords = PositionCreator.create_coordinates(
+            nodes=nodes, reg_numbers=reg_numbers, time_resolution=time_resolution
+        )
+
+        return dict(zip(nodes, zip(x_coords.tolist(), y_coords.tolist())))
+
+    @staticmethod
+    def create_coordinates(nodes: list, reg_numbers: list,
+                           time_resolution: TimeResolution = None) -> tuple:
+        """
+        Creates the coordinates of create_positions as arrays aligned with the nodes.
+        :param list nodes: the nodes
+        :param list reg_numbers: the reg-numbers of the stations
+        :param TimeResolution time_resolution: the time resolution of the nodes, daily if None
+        :return tuple: x coordinates and y coordinates as integer arrays
+        """
+        if time_resolution is None:
+            time_resolution = TimeResolution()
+        if not nodes:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+        steps = time_resolution.decode([node[1] for node in nodes])
+        x_coords = steps - steps.min() - 1
+
+        y_coord_mapping = {reg_number: len(reg_numbers) - i
+                           for i, reg_number in enumerate(reg_numbers)}
+        y_coords = np.fromiter(
+            (y_coord_mapping[node[0]] for node in nodes), dtype=np.int64, count=len(nodes)
+        )
+
+        return x_coords, y_coords
+
+    @staticmethod
+    def aggregate_time_buckets(graph: nx.DiGraph, max_time_steps: int,
+                               time_resolution: TimeResolution = None) -> nx.DiGraph:
+        """
+        Level of detail for plotting long periods: if the graph spans more than max_time_steps
+        time steps, the time axis is divided into at most max_time_steps buckets of equal length
+        and the nodes of a station in a bucket are merged into one (reg_number, time_key) node,
+        the time key being the start of the bucket. The edges are merged accordingly, edges within
+        a bucket are dropped. The 'weight' attribute of the nodes and the edges is the number of
+        merged nodes and edges.
+        :param nx.DiGraph graph: graph to plot
+        :param int max_time_steps: maximal number of time steps that can be shown
+        :param TimeResolution time_resolution: the time resolution of the nodes, daily if None
+        :return nx.DiGraph: the graph itself if it is short enough, the aggregated graph otherwise
+        """
+        if time_resolution is None:
+            time_resolution = TimeResolution()
+
+        nodes = list(graph.nodes())
+        if not nodes:
+            return graph
+
+        steps = time_resolution.decode([node[1] for node in nodes])
+        first_step = steps.min()
+        number_of_steps = steps.max() - first_step + 1
+        if number_of_steps <= max_time_steps:
+            return graph
+
+        bucket_length = -(-number_of_steps // max_time_steps)
+        bucket_steps = first_step + (steps - first_step) // bucket_length * bucket_length
+        bucket_keys = time_resolution.encode(bucket_steps).tolist()
+        bucket_nodes = [(node[0], key) for node, key in zip(nodes, bucket_keys)]
+        bucket_node_mapping = dict(zip(nodes, bucket_nodes))
+
+        aggregated_graph = nx.DiGraph()
+        for node in bucket_nodes:
+            if node in aggregated_graph:
+                aggregated_graph.nodes[node]['weight'] += 1
+            else:
+                aggregated_graph.add_node(node, weight=1)
 
-        positions = dict()
-        for node in graph.nodes():
-            x_coord = (datetime.strptime(node[1], '%Y-%m-%d') - min_date).days - 1
-            y_coord = len(reg_numbers) - reg_numbers.index(node[0])
-            positions[node] = (x_coord, y_coord)
+        for u, v in graph.edges():
+            bucket_u = bucket_node_mapping[u]
+            bucket_v = bucket_node_mapping[v]
+            if bucket_u == bucket_v:
+                continue
+            if aggregated_graph.has_edge(bucket_u, bucket_v):
+                aggregated_graph.edges[bucket_u, bucket_v]['weight'] += 1
+            else:
+                aggregated_graph.add_edge(bucket_u, bucket_v, weight=1)
 
-        return positions
+        return aggregated_graph
@@ -0,0 +1,203 @@
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Class for estimating the quantiles of a stream of numbers in bounded memory. The values are
+    counted in logarithmic buckets (as in DDSketch): the bucket i of the positive values is
+    (gamma^(i - 1), gamma^i] with gamma = (1 + a) / (1 - a), hence every estimated quantile is
+    within a relative error a of the exact one. Negative values are counted by their magnitude in
+    separate buckets, zeros in a single counter. The count, sum, minimum and maximum are exact.
+
+    If a store has more than max_buckets buckets, its buckets of the smallest magnitudes are
+    collapsed into one, so only the quantiles close to zero lose accuracy. Two sketches with the
+    same relative accuracy are merged by adding their bucket counts, hence the sketches of
+    parallel workers can be combined.
+    """
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        Constructor.
+        :param float relative_accuracy: the relative error a of the estimated quantiles
+        :param int max_buckets: the maximal number of buckets of the positive and of the negative
+        values
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy has to be between 0 and 1.')
+        if max_buckets < 1:
+            raise ValueError('max_buckets has to be a positive integer.')
+
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+
+        # keys are bucket indices, values are counts
+        self.positive_counts = {}
+        self.negative_counts = {}
+        self.zero_count = 0
+
+        self.count = 0
+        self.sum = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values, weights=None) -> None:
+        """
+        Adds values to the sketch.
+        :param values: a number or an array of numbers
+        :param weights: the integer multiplicities of the values, every value is added once
+        if None
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if weights is None:
+            weights = np.ones(len(values), dtype=np.int64)
+        else:
+            weights = np.broadcast_to(np.asarray(weights, dtype=np.int64), values.shape)
+        if np.isnan(values).any():
+            raise ValueError('The sketch does not accept NaN values.')
+        if len(values) == 0:
+            return
+
+        self.count += int(weights.sum())
+        self.sum += float(np.dot(values, weights))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        self.zero_count += int(weights[values == 0].sum())
+        is_positive = values > 0
+        is_negative = values < 0
+        self.add_to_store(store=self.positive_counts,
+                          magnitudes=values[is_positive], weights=weights[is_positive])
+        self.add_to_store(store=self.negative_counts,
+                          magnitudes=-values[is_negative], weights=weights[is_negative])
+
+    def get_indices(self, magnitudes: np.ndarray) -> np.ndarray:
+        """
+        :param np.ndarray magnitudes: positive numbers
+        :return np.ndarray: bucket indices of the numbers
+        """
+        return np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64)
+
+    def get_values(self, indices: np.ndarray) -> np.ndarray:
+        """
+        :param np.ndarray indices: bucket indices
+        :return np.ndarray: the representative values of the buckets, within the relative error
+        from every number of the bucket
+        """
+        return 2 * np.power(self.gamma, indices) / (self.gamma + 1)
+
+    def add_to_store(self, store: dict, magnitudes: np.ndarray, weights: np.ndarray) -> None:
+        """
+        Adds the counts of positive numbers to a bucket store.
+        :param dict store: the positive or the negative store
+        :param np.ndarray magnitudes: positive numbers
+        :param np.ndarray weights: multiplicities of the numbers
+        """
+        if len(magnitudes) == 0:
+            return
+
+        indices, inverse = np.unique(self.get_indices(magnitudes), return_inverse=True)
+        counts = np.bincount(inverse, weights=weights).astype(np.int64)
+        for index, count in zip(indices.tolist(), counts.tolist()):
+            store[index] = store.get(index, 0) + count
+
+        self.collapse(store=store)
+
+    def collapse(self, store: dict) -> None:
+        """
+        Collapses the buckets of the smallest magnitudes if the store has too many buckets.
+        :param dict store: the positive or the negative store
+        """
+        number_of_extra_buckets = len(store) - self.max_buckets
+        if number_of_extra_buckets <= 0:
+            return
+
+        indices = sorted(store)
+        collapsed_count = sum(store.pop(index) for index in indices[:number_of_extra_buckets])
+        store[indices[number_of_extra_buckets]] += collapsed_count
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """
+        Merges another sketch into this one.
+        :param QuantileSketch other: a sketch with the same relative accuracy
+        :return QuantileSketch: self
+        """
+        if not np.isclose(self.gamma, other.gamma):
+            raise ValueError('Only sketches with the same relative accuracy can be merged.')
+
+        for store, other_store in [(self.positive_counts, other.positive_counts),
+                                   (self.negative_counts, other.negative_counts)]:
+            for index, count in other_store.items():
+                store[index] = store.get(index, 0) + count
+            self.collapse(store=store)
+        self.zero_count += other.zero_count
+
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+        return self
+
+    def get_quantiles(self, quantiles) -> list:
+        """
+        Estimates quantiles. The q-quantile is interpolated linearly between the values of the
+        ranks floor(q * (count - 1)) and ceil(q * (count - 1)) in the sorted values (as
+        numpy.quantile with the default method), hence the median of an even number of values is
+        the mean of the two middle values (as numpy.median).
+        :param quantiles: a list of numbers between 0 and 1
+        :return list: the estimated quantiles, NaN if the sketch is empty
+        """
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+        if ((quantiles < 0) | (quantiles > 1)).any():
+            raise ValueError('Quantiles have to be between 0 and 1.')
+        if self.count == 0:
+            return [float('nan')] * len(quantiles)
+
+        negative_indices = np.array(sorted(self.negative_counts, reverse=True), dtype=np.int64)
+        positive_indices = np.array(sorted(self.positive_counts), dtype=np.int64)
+        values = np.concatenate([
+            -self.get_values(negative_indices), [0.0], self.get_values(positive_indices)
+        ])
+        counts = np.concatenate([
+            [self.negative_counts[index] for index in negative_indices.tolist()],
+            [self.zero_count],
+            [self.positive_counts[index] for index in positive_indices.tolist()]
+        ]).astype(np.int64)
+
+        ranks = quantiles * (self.count - 1)
+        lower_ranks = np.floor(ranks)
+        cumulative_counts = np.cumsum(counts)
+        lower_values, upper_values = (
+            np.clip(values[np.searchsorted(cumulative_counts, rank, side='right')],
+                    self.min, self.max)
+            for rank in (lower_ranks, np.ceil(ranks))
+        )
+
+        return (lower_values + (ranks - lower_ranks) * (upper_values - lower_values)).tolist()
+
+    def get_quantile(self, quantile: float) -> float:
+        """
+        :param float quantile: a number between 0 and 1
+        :return float: the estimated quantile
+        """
+        return self.get_quantiles([quantile])[0]
+
+    def get_statistics(self, quantiles=()) -> dict:
+        """
+        Gathers the statistics of the values in the format of FloodWaveAnalyser.get_statistics.
+        :param quantiles: further quantiles to estimate
+        :return dict: the exact mean, max and min, the estimated median and the estimated
+        quantiles under the 'quantiles' key (keys are the quantiles as strings)
+        """
+        median, *estimates = self.get_quantiles([0.5, *quantiles])
+        stats = {
+            'mean': self.sum / self.count if self.count else float('nan'),
+            'median': median,
+            'max': self.max if self.count else float('nan'),
+            'min': self.min if self.count else float('nan')
+        }
+        if quantiles:
+            stats['quantiles'] = {str(q): estimate for q, estimate in zip(quantiles, estimates)}
+
+        return stats
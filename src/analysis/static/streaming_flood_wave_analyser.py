@@ -0,0 +1,138 @@
+import numpy as np
+
+from src.analysis.static.flood_wave_extractor_interface import FloodWaveExtractorInterface
+from src.analysis.static.flood_wave_path_dag import FloodWavePathDAG
+from src.analysis.static.quantile_sketch import QuantileSketch
+from src.data_handling.data_interface import DataInterface
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.profiling.stage_profiler import StageProfiler
+
+
+class StreamingFloodWaveAnalyser:
+    """
+    Class for analysing flood waves incrementally in bounded memory. The flood waves are added in
+    batches and only the distances and durations of the current batch are kept: the number of
+    waves, the mean, the minimum and the maximum are exact, the median and further quantiles are
+    estimated by QuantileSketch within the given relative accuracy. The analysers of parallel
+    extraction workers are combined with merge.
+
+    The statistical results have the format of FloodWaveAnalyser, but the distances and durations
+    are not saved one by one.
+    """
+    def __init__(self, data_if: DataInterface, is_equivalence_applied: bool,
+                 relative_accuracy: float = 0.01, quantiles: list = None,
+                 do_save_results: bool = False, data_folder_path: str = None):
+        """
+        Constructor.
+        :param DataInterface data_if: a DataInterface instance
+        :param bool is_equivalence_applied: True if the flood waves are paths, False if they are
+        equivalence classes (lists of paths or FloodWavePathDAG instances)
+        :param float relative_accuracy: the relative error of the estimated quantiles
+        :param list quantiles: further quantiles to estimate besides the median, e.g.
+        [0.1, 0.9], none if None
+        :param bool do_save_results: whether to save the statistical results
+        :param str data_folder_path: path of the data folder
+        """
+        self.reg_rkm_mapping = data_if.reg_rkm_mapping
+        self.time_resolution = data_if.time_resolution
+        self.is_equivalence_applied = is_equivalence_applied
+        self.quantiles = [] if quantiles is None else list(quantiles)
+        self.do_save_results = do_save_results
+        self.data_folder_path = data_folder_path
+
+        self.number_of_flood_waves = 0
+        self.distance_sketch = QuantileSketch(relative_accuracy=relative_accuracy)
+        self.duration_sketch = QuantileSketch(relative_accuracy=relative_accuracy)
+        self.statistical_results = {}
+
+    @StageProfiler.profile_stage(get_counts=lambda self: {'waves': self.number_of_flood_waves})
+    def run(self, extractor_if: FloodWaveExtractorInterface) -> dict:
+        """
+        Run function. Adds the flood waves of an extraction, then gets the statistics and saves
+        them if needed.
+        :param FloodWaveExtractorInterface extractor_if: a FloodWaveExtractorInterface instance
+        :return dict: dictionary containing the results
+        """
+        self.add_flood_waves(flood_waves=extractor_if.flood_waves)
+        self.statistical_results = self.get_statistical_results()
+
+        if self.do_save_results:
+            self.save_results(timestamp_folder_name=extractor_if.timestamp_folder_name)
+
+        return self.statistical_results
+
+    def add_flood_waves(self, flood_waves: list) -> None:
+        """
+        Adds a batch of flood waves to the sketches.
+        :param list flood_waves: flood waves in the format of FloodWaveExtractorInterface
+        """
+        start_nodes, end_nodes, weights = self.get_start_and_end_nodes(flood_waves=flood_waves)
+        if not start_nodes:
+            return
+
+        distances = np.array([
+            self.reg_rkm_mapping[start_node[0]] - self.reg_rkm_mapping[end_node[0]]
+            for start_node, end_node in zip(start_nodes, end_nodes)
+        ], dtype=np.float64)
+        durations = self.time_resolution.decode([node[1] for node in end_nodes]) - \
+            self.time_resolution.decode([node[1] for node in start_nodes])
+
+        self.number_of_flood_waves += int(weights.sum())
+        self.distance_sketch.add(values=distances, weights=weights)
+        self.duration_sketch.add(values=durations, weights=weights)
+
+    def get_start_and_end_nodes(self, flood_waves: list) -> tuple:
+        """
+        Collects the first and last nodes of the flood waves. An equivalence class is counted as
+        many times as its number of paths, as in FloodWaveAnalyser.
+        :param list flood_waves: flood waves
+        :return tuple: list of first nodes, list of last nodes, array of the multiplicities
+        """
+        if self.is_equivalence_applied:
+            return [wave[0] for wave in flood_waves], [wave[-1] for wave in flood_waves], \
+                np.ones(len(flood_waves), dtype=np.int64)
+
+        start_nodes = []
+        end_nodes = []
+        for paths in flood_waves:
+            start_node, end_node = FloodWavePathDAG.get_end_nodes(paths=paths)
+            start_nodes.append(start_node)
+            end_nodes.append(end_node)
+        weights = np.fromiter((len(paths) for paths in flood_waves), dtype=np.int64,
+                              count=len(flood_waves))
+
+        return start_nodes, end_nodes, weights
+
+    def merge(self, other: 'StreamingFloodWaveAnalyser') -> 'StreamingFloodWaveAnalyser':
+        """
+        Merges the state of another analyser into this one.
+        :param StreamingFloodWaveAnalyser other: an analyser with the same relative accuracy
+        :return StreamingFloodWaveAnalyser: self
+        """
+        self.number_of_flood_waves += other.number_of_flood_waves
+        self.distance_sketch.merge(other=other.distance_sketch)
+        self.duration_sketch.merge(other=other.duration_sketch)
+
+        return self
+
+    def get_statistical_results(self) -> dict:
+        """
+        :return dict: the number of flood waves and the statistics of the distances and durations
+        """
+        return {
+            'number_of_flood_waves': self.number_of_flood_waves,
+            'spatial_statistics': self.distance_sketch.get_statistics(quantiles=self.quantiles),
+            'temporal_statistics': self.duration_sketch.get_statistics(quantiles=self.quantiles)
+        }
+
+    def save_results(self, timestamp_folder_name: str) -> None:
+        """
+        Saves the statistical results into the folder of the flood waves.
+        :param str timestamp_folder_name: name of the folder of the flood waves
+        """
+        GeneratedDataLoader.save_json(
+            data=self.statistical_results,
+            data_folder_path=self.data_folder_path,
+            subfolder_names=['flood_waves', timestamp_folder_name],
+            file_name='statistical_results'
+        )
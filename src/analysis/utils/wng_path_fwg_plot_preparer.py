@@ -1,31 +1,41 @@
-import copy
-
 import networkx as nx
+import numpy as np
 
 from src.analysis.static.position_creator import PositionCreator
+from src.data_handling.time_resolution import TimeResolution
 
 
 class WNGPathFWGPlotPreparer:
     """
     Class for preparing the Flood Wave Graph subgraph for plotting.
     """
-    def __init__(self, fwg_subgraph: nx.DiGraph, wng_path: nx.DiGraph):
+    def __init__(self, fwg_subgraph: nx.DiGraph, wng_path: nx.DiGraph,
+                 time_resolution: TimeResolution = None):
         """
         Constructor.
         :param nx.DiGraph fwg_subgraph: the FWG subgraph along a path in the WNG
         :param x.DiGraph wng_path: the path in the WNG
+        :param TimeResolution time_resolution: the time resolution of the nodes, daily if None
         """
         self.fwg_subgraph = fwg_subgraph
+        self.time_resolution = TimeResolution() if time_resolution is None else time_resolution
         self.reg_numbers_in_order = nx.dag_longest_path(wng_path)
 
         self.graph_to_plot = nx.DiGraph()
         self.positions = dict()
+        # the nodes of graph_to_plot and their coordinates as aligned arrays
+        self.nodes = []
+        self.x_coords = np.array([], dtype=np.int64)
+        self.y_coords = np.array([], dtype=np.int64)
 
-    def run(self, start_date: str = None, end_date: str = None):
+    def run(self, start_date: str = None, end_date: str = None, max_time_steps: int = None):
         """
         Run function. Filters the graph between two dates if necessary and creates the positions.
         :param str start_date: start date of the plot
         :param str end_date: end date of the plot
+        :param int max_time_steps: if the plotted period is longer than max_time_steps time steps,
+        the nodes are aggregated into time buckets (see PositionCreator.aggregate_time_buckets),
+        None if every node is plotted
         """
         if start_date is None and end_date is None:
             self.graph_to_plot = self.fwg_subgraph
@@ -34,29 +44,46 @@ class WNGPathFWGPlotPreparer:
         else:
             raise Exception('Either give a start date and an end date, or do not give either.')
 
-        self.positions = PositionCreator.create_positions(
-            graph=self.graph_to_plot, reg_numbers=self.reg_numbers_in_order
+        if max_time_steps is not None:
+            self.graph_to_plot = PositionCreator.aggregate_time_buckets(
+                graph=self.graph_to_plot, max_time_steps=max_time_steps,
+                time_resolution=self.time_resolution
+            )
+
+        self.nodes = list(self.graph_to_plot.nodes())
+        self.x_coords, self.y_coords = PositionCreator.create_coordinates(
+            nodes=self.nodes, reg_numbers=self.reg_numbers_in_order,
+            time_resolution=self.time_resolution
         )
+        self.positions = dict(zip(self.nodes, zip(self.x_coords.tolist(),
+                                                  self.y_coords.tolist())))
 
     def cut_graph(self, start_date: str, end_date: str) -> nx.DiGraph:
         """
-        Function for selecting only nodes between start_date and end_date.
+        Function for selecting only nodes between start_date and end_date. Only the edges between
+        the selected nodes are copied, hence isolated nodes are not kept.
         :param str start_date: start date of the plot
         :param str end_date: end date of the plot
         :return nx.DiGraph: the filtered graph
         """
-        nodes_to_plot = []
-        for node in self.fwg_subgraph.nodes:
-            if start_date <= node[1] <= end_date:
-                nodes_to_plot.append(node)
-
-        graph_to_plot = nx.DiGraph(
-            copy.deepcopy(
-                self.fwg_subgraph.subgraph(nodes_to_plot)
-            )
-        )
-        graph_to_plot.remove_nodes_from(
-            list(nx.isolates(graph_to_plot))
+        start_step = self.time_resolution.decode([self.time_resolution.to_key(start_date)])[0]
+        end_step = self.time_resolution.decode([self.time_resolution.to_key(end_date)])[0]
+
+        nodes = list(self.fwg_subgraph.nodes)
+        graph_to_plot = nx.DiGraph()
+        if not nodes:
+            return graph_to_plot
+
+        steps = self.time_resolution.decode([node[1] for node in nodes])
+        is_kept = (steps >= start_step) & (steps <= end_step)
+        nodes_to_plot = [node for node, kept in zip(nodes, is_kept.tolist()) if kept]
+        node_set = set(nodes_to_plot)
+
+        graph_to_plot.add_edges_from(
+            (node, successor, data)
+            for node in nodes_to_plot
+            for successor, data in self.fwg_subgraph.succ[node].items()
+            if successor in node_set
         )
 
         return graph_to_plot
@@ -1,11 +1,14 @@
 import networkx as nx
+import numpy as np
 
 from src.data_handling.data_interface import DataInterface
 
 
 class WNGSinkFWGPlotPreparer:
     """
-    Class for preparing the FWG subgraph with sink(s) for interactive plotting.
+    Class for preparing the FWG subgraph with sink(s) for interactive plotting. The time steps of
+    the nodes of every station are stored as sorted integer arrays, hence the stations active at
+    a time or within a time window are found by binary search for all stations at once.
     """
     def __init__(self, data_if: DataInterface,
                  fwg_subgraph: nx.DiGraph, wng_subgraph: nx.DiGraph):
@@ -16,12 +19,27 @@ class WNGSinkFWGPlotPreparer:
         :param nx.DiGraph wng_subgraph: the WNG subgraph with a sink
         """
         self.station_coordinates = data_if.station_coordinates
+        self.reg_index_mapping = data_if.reg_index_mapping
+        self.all_station_coordinates = data_if.station_coordinate_array
+        self.time_resolution = data_if.time_resolution
         self.fwg_subgraph = fwg_subgraph
         self.wng_subgraph = wng_subgraph
 
         self.node_positions = {}
         self.dates_dict = {node: [] for node in self.wng_subgraph.nodes}
 
+        # the stations of the WNG subgraph and their (EOVy, EOVx) coordinates
+        self.stations = list(self.wng_subgraph.nodes)
+        self.station_coordinate_array = np.empty((0, 2))
+        # sorted time steps of the nodes station by station, the steps of the i-th station are
+        # station_steps[station_offsets[i]:station_offsets[i + 1]]
+        self.station_steps = np.array([], dtype=np.int64)
+        self.station_offsets = np.zeros(len(self.stations) + 1, dtype=np.int64)
+        # station_steps shifted station by station into disjoint ranges, hence globally sorted
+        self.search_keys = np.array([], dtype=np.int64)
+        self.first_step = 0
+        self.step_span = 1
+
     def run(self) -> None:
         """
         Gets positions and creates a dictionary containing the dates for each node.
@@ -31,13 +49,71 @@ class WNGSinkFWGPlotPreparer:
     def create_positions_and_get_dates_dict(self) -> None:
         """
         Stores the coordinates of each node in a dictionary. Moreover, creates a dictionary
-        containing the dates for each node.
+        containing the dates for each node, the sorted time step arrays of the stations and the
+        coordinate array of the stations.
         """
-        for node in self.fwg_subgraph.nodes:
-            # the definition of EOV coordinates suggests that x should be EOVy and
-            # y should be EOVx
-            base_x = self.station_coordinates[node[0]]['EOVy']
-            base_y = self.station_coordinates[node[0]]['EOVx']
-            self.node_positions[node] = (base_x, base_y)
+        # the definition of EOV coordinates suggests that x should be EOVy and
+        # y should be EOVx
+        rows = [self.reg_index_mapping[station] for station in self.stations]
+        self.station_coordinate_array = self.all_station_coordinates[rows][:, [1, 0]]
+
+        nodes = list(self.fwg_subgraph.nodes)
+        if not nodes:
+            return
+
+        station_index_mapping = {station: i for i, station in enumerate(self.stations)}
+        station_indices = np.fromiter(
+            (station_index_mapping[node[0]] for node in nodes), dtype=np.int64, count=len(nodes)
+        )
+        node_coordinates = self.station_coordinate_array[station_indices].tolist()
+        self.node_positions = dict(zip(nodes, map(tuple, node_coordinates)))
+
+        steps = self.time_resolution.decode([node[1] for node in nodes])
+        self.first_step = int(steps.min())
+        self.step_span = int(steps.max()) - self.first_step + 1
 
-            self.dates_dict[node[0]].append(node[1])
+        # nodes of a station at the same time step (different water levels) are counted once
+        search_keys = np.unique(station_indices * self.step_span + (steps - self.first_step))
+        self.search_keys = search_keys
+        self.station_steps = search_keys % self.step_span + self.first_step
+        self.station_offsets = np.searchsorted(
+            search_keys, np.arange(len(self.stations) + 1) * self.step_span
+        )
+
+        keys = self.time_resolution.encode(self.station_steps).tolist()
+        for i, station in enumerate(self.stations):
+            self.dates_dict[station] = keys[self.station_offsets[i]:self.station_offsets[i + 1]]
+
+    def get_node_counts(self, start_date, end_date=None) -> np.ndarray:
+        """
+        Counts the time steps with a node of every station between two points in time.
+        :param start_date: the first point in time (inclusive), a date string, a timestamp or a
+        node time key
+        :param end_date: the last point in time (inclusive), start_date if None
+        :return np.ndarray: the counts aligned with self.stations
+        """
+        start_step, end_step = self.time_resolution.decode([
+            self.time_resolution.to_key(start_date),
+            self.time_resolution.to_key(start_date if end_date is None else end_date)
+        ])
+        start_step = min(max(start_step, self.first_step), self.first_step + self.step_span)
+        end_step = max(min(end_step, self.first_step + self.step_span - 1), self.first_step - 1)
+
+        station_bases = np.arange(len(self.stations), dtype=np.int64) * self.step_span
+        lower = np.searchsorted(self.search_keys, station_bases + (start_step - self.first_step),
+                                side='left')
+        upper = np.searchsorted(self.search_keys, station_bases + (end_step - self.first_step),
+                                side='right')
+
+        return np.maximum(upper - lower, 0)
+
+    def get_active_stations(self, start_date, end_date=None) -> np.ndarray:
+        """
+        Finds the stations having a node at a point in time or within a time window.
+        :param start_date: the first point in time (inclusive), a date string, a timestamp or a
+        node time key
+        :param end_date: the last point in time (inclusive), start_date if None
+        :return np.ndarray: boolean mask aligned with self.stations and
+        self.station_coordinate_array
+        """
+        return self.get_node_counts(start_date=start_date, end_date=end_date) > 0
@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src import PROJECT_PATH
+from src.analysis.dynamic.wng_sink_fwg_selector import WNGSinkFWGSelector
+from src.analysis.static.flood_wave_analyser import FloodWaveAnalyser
+from src.analysis.static.flood_wave_extractor import FloodWaveExtractor
+from src.benchmarks.synthetic_data_generator import SyntheticDataGenerator
+from src.data_handling.data_handler import DataHandler
+from src.data_handling.dataloader import DataLoader
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.fwg_building.flood_wave_graph_builder import FloodWaveGraphBuilder
+from src.fwg_building.flood_wave_graph_preparer import FloodWaveGraphPreparer
+from src.profiling.stage_profiler import StageProfiler
+from src.wng_building.station_river_creator import StationRiverCreator
+from src.wng_building.water_network_graph_builder import WaterNetworkGraphBuilder
+
+
+class BenchmarkRunner:
+    """
+    Class for timing every stage of the pipeline on synthetic data of several sizes, offline.
+    The stages are measured by StageProfiler, the results can be saved as a JSON baseline and
+    compared with an earlier baseline.
+
+    The import of the main modules is measured as well, each in a fresh interpreter with
+    python -X importtime, and checked against import_time_budget: the time spent in the modules
+    of src itself (the third-party dependencies excluded) and the optional dependencies that must
+    not be loaded at import.
+    """
+    import_time_budget = {
+        'modules': [
+            'src.pipeline.pipeline_runner',
+            'src.fwg_building.fwg_shard_store',
+            'src.analysis.dynamic.query_executor',
+            'src.service.query_service'
+        ],
+        'max_own_time': 0.05,
+        'lazy_dependencies': ['gdown', 'requests', 'bs4']
+    }
+    default_sizes = [
+        {'number_of_stations': 10, 'number_of_years': 30},
+        {'number_of_stations': 100, 'number_of_years': 30},
+        {'number_of_stations': 1000, 'number_of_years': 10},
+        {'number_of_stations': 10000, 'number_of_years': 2}
+    ]
+
+    def __init__(self, sizes: list = None, beta: int = 3, delta: int = 2, seed: int = 0,
+                 selection_days: int = 60, do_trace_memory: bool = False):
+        """
+        Constructor.
+        :param list sizes: list of dictionaries with keys 'number_of_stations' and
+        'number_of_years', default_sizes if None
+        :param int beta: beta parameter of FloodWaveGraphPreparer
+        :param int delta: delta parameter of FloodWaveGraphPreparer
+        :param int seed: seed of SyntheticDataGenerator
+        :param int selection_days: length of the time window selected from the FWG before the
+        extraction
+        :param bool do_trace_memory: True if the memory allocations are traced
+        """
+        self.sizes = self.default_sizes if sizes is None else sizes
+        self.beta = beta
+        self.delta = delta
+        self.seed = seed
+        self.selection_days = selection_days
+        self.do_trace_memory = do_trace_memory
+
+        self.results = {}
+
+    def run(self) -> dict:
+        """
+        Run function. Generates the data and runs the pipeline for every size.
+        :return dict: the results
+        """
+        self.results = {
+            'environment': self.get_environment(),
+            'parameters': {'beta': self.beta, 'delta': self.delta, 'seed': self.seed,
+                           'selection_days': self.selection_days},
+            'benchmarks': []
+        }
+
+        for size in self.sizes:
+            with tempfile.TemporaryDirectory() as data_folder_path:
+                generator = SyntheticDataGenerator(seed=self.seed, **size)
+                generator.run()
+                generator.save(data_folder_path=data_folder_path)
+
+                StageProfiler.reset()
+                StageProfiler.enable(do_trace_memory=self.do_trace_memory)
+                try:
+                    self.run_pipeline(data_folder_path=data_folder_path)
+                finally:
+                    StageProfiler.disable()
+
+            report = StageProfiler.get_report()
+            StageProfiler.reset()
+            self.results['benchmarks'].append({**size, **report})
+
+        self.results['import_times'] = [
+            self.measure_import_time(module_name=module_name)
+            for module_name in self.import_time_budget['modules']
+        ]
+
+        return self.results
+
+    def run_pipeline(self, data_folder_path: str) -> None:
+        """
+        Runs every stage of the pipeline once.
+        :param str data_folder_path: path of the data folder containing the synthetic data
+        """
+        dl = DataLoader(data_folder_path=data_folder_path)
+        data_handler = DataHandler(dl=dl)
+
+        station_river_creator = StationRiverCreator(data_if=data_handler.data_if)
+        station_river_creator.run()
+
+        wng_builder = WaterNetworkGraphBuilder(
+            station_river_if=station_river_creator.station_river_if,
+            do_save_all=False, data_folder_path=data_folder_path
+        )
+        wng_builder.run()
+
+        fwg_preparer = FloodWaveGraphPreparer(
+            data_if=data_handler.data_if,
+            station_river_data_if=station_river_creator.station_river_if,
+            beta=self.beta, delta=self.delta
+        )
+        fwg_preparer.run()
+
+        fwg_builder = FloodWaveGraphBuilder(preparer_interface=fwg_preparer.preparer_if)
+        fwg_builder.run()
+
+        wng = wng_builder.wng_if.water_network_graph
+        outlet = [node for node in wng.nodes() if wng.out_degree(node) == 0][0]
+        start_date = dl.time_series_data.index[0]
+        selector = WNGSinkFWGSelector(
+            data_folder_path=data_folder_path,
+            fwg_data_if=fwg_builder.fwg_if,
+            wng_data_if=wng_builder.wng_if
+        )
+        selector.run(
+            temporal_filtering={
+                'start_date': start_date,
+                'end_date': start_date + pd.Timedelta(days=self.selection_days - 1)
+            },
+            spatial_filtering={'sink': outlet}
+        )
+
+        extractor = FloodWaveExtractor(
+            fwg=selector.fwg_subgraph, wng=selector.wng_subgraph,
+            data_if=data_handler.data_if, is_equivalence_applied=True
+        )
+        extractor.run()
+
+        if extractor.extractor_if.flood_waves:
+            analyser = FloodWaveAnalyser(
+                extractor_if=extractor.extractor_if, data_if=data_handler.data_if,
+                is_equivalence_applied=True
+            )
+            analyser.run()
+
+    @staticmethod
+    def measure_import_time(module_name: str) -> dict:
+        """
+        Imports a module in a fresh interpreter with python -X importtime.
+        :param str module_name: name of the module, e.g. 'src.pipeline.pipeline_runner'
+        :return dict: the module, the total import time and the time spent in the modules of src
+        (in seconds), and the loaded lazy dependencies of import_time_budget
+        """
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+            cwd=PROJECT_PATH, capture_output=True, text=True, check=True
+        )
+
+        # keys are module names, values are the self and cumulative times in microseconds
+        import_times = {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_time, cumulative_time, name = line[len('import time:'):].split('|')
+            import_times[name.strip()] = (int(self_time), int(cumulative_time))
+
+        lazy_dependencies = BenchmarkRunner.import_time_budget['lazy_dependencies']
+        return {
+            'module': module_name,
+            'total_time': import_times[module_name][1] / 1e6,
+            'own_time': sum(
+                self_time for name, (self_time, _) in import_times.items()
+                if name == 'src' or name.startswith('src.')
+            ) / 1e6,
+            'loaded_lazy_dependencies': sorted(
+                name for name in import_times if name.split('.')[0] in lazy_dependencies
+            )
+        }
+
+    def check_import_times(self) -> list:
+        """
+        Checks the measured import times against import_time_budget.
+        :return list: the violations, the import time records exceeding the budget
+        """
+        return [
+            record for record in self.results.get('import_times', [])
+            if record['own_time'] > self.import_time_budget['max_own_time'] or
+            record['loaded_lazy_dependencies']
+        ]
+
+    @staticmethod
+    def get_environment() -> dict:
+        """
+        :return dict: versions of Python and the main dependencies
+        """
+        return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'networkx': nx.__version__
+        }
+
+    def save_baseline(self, file_path: str) -> None:
+        """
+        Saves the results as a JSON baseline.
+        :param str file_path: path of the JSON file
+        """
+        folder_path = os.path.dirname(file_path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+
+        with GeneratedDataLoader.atomic_write(file_path) as f:
+            f.write(json.dumps(self.results, indent=2).encode())
+
+    def compare(self, baseline_file_path: str, tolerance: float = 0.2) -> list:
+        """
+        Compares the wall times of the stages with a baseline. Only the sizes and stages present
+        in both are compared.
+        :param str baseline_file_path: path of the JSON baseline
+        :param float tolerance: allowed relative slowdown, e.g. 0.2 for 20%
+        :return list: the regressions, dictionaries with the size, the stage and the wall times
+        """
+        with open(baseline_file_path, 'r') as f:
+            baseline = json.load(f)
+
+        baseline_times = self.get_stage_times(results=baseline)
+        regressions = []
+        for key, wall_time in self.get_stage_times(results=self.results).items():
+            if key in baseline_times and wall_time > baseline_times[key] * (1 + tolerance):
+                number_of_stations, number_of_years, stage = key
+                regressions.append({
+                    'number_of_stations': number_of_stations,
+                    'number_of_years': number_of_years,
+                    'stage': stage,
+                    'baseline_wall_time': baseline_times[key],
+                    'wall_time': wall_time
+                })
+
+        return regressions
+
+    @staticmethod
+    def get_stage_times(results: dict) -> dict:
+        """
+        :param dict results: benchmark results
+        :return dict: keys are (number of stations, number of years, stage), values are the total
+        wall times of the top level stages
+        """
+        stage_times = {}
+        for benchmark in results['benchmarks']:
+            for record in benchmark['stages']:
+                if record['depth'] == 0:
+                    key = (benchmark['number_of_stations'], benchmark['number_of_years'],
+                           record['stage'])
+                    stage_times[key] = stage_times.get(key, 0.0) + record['wall_time']
+
+        return stage_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic data.')
+    parser.add_argument('--sizes', nargs='+', default=None,
+                        help='sizes as stations:years, e.g. 10:30 100:30')
+    parser.add_argument('--output', required=True, help='path of the JSON results')
+    parser.add_argument('--baseline', default=None, help='JSON baseline to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative slowdown compared to the baseline')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true')
+    args = parser.parse_args()
+
+    sizes = None
+    if args.sizes is not None:
+        sizes = []
+        for size in args.sizes:
+            number_of_stations, number_of_years = size.split(':')
+            sizes.append({'number_of_stations': int(number_of_stations),
+                          'number_of_years': int(number_of_years)})
+
+    benchmark_runner = BenchmarkRunner(
+        sizes=sizes, seed=args.seed, do_trace_memory=args.trace_memory
+    )
+    benchmark_runner.run()
+    benchmark_runner.save_baseline(file_path=args.output)
+
+    if args.baseline is not None:
+        regressions = benchmark_runner.compare(
+            baseline_file_path=args.baseline, tolerance=args.tolerance
+        )
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            raise SystemExit(1)
+
+    violations = benchmark_runner.check_import_times()
+    for violation in violations:
+        print(violation)
+    if violations:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class SyntheticDataGenerator:
+    """
+    Class for generating a synthetic river basin with gauge time series in the format of the
+    downloaded data (meta_data.csv, river_connections.json, time_series_data.csv). The river
+    network is a tree: every tributary flows into a station of an already created river. The water
+    levels are seasonal signals with autocorrelated noise, flood waves are injected at random
+    stations and travel downstream to the outlet with random lags and attenuation. The generation
+    is deterministic for a given seed.
+    """
+    meta_columns = ['station_name', 'river', 'EOVx', 'EOVy', 'null_point', 'rkm_relative', 'reg']
+
+    def __init__(self, number_of_stations: int, number_of_years: int = 30, seed: int = 0,
+                 start_date: str = '1990-01-01', stations_per_river: tuple = (3, 20),
+                 flood_waves_per_year: int = 6, missing_rate: float = 0.001):
+        """
+        Constructor.
+        :param int number_of_stations: the number of gauging stations
+        :param int number_of_years: length of the time series in years
+        :param int seed: seed of the random number generator
+        :param str start_date: the first day of the time series
+        :param tuple stations_per_river: minimal and maximal number of stations along a river
+        :param int flood_waves_per_year: number of injected flood waves per year
+        :param float missing_rate: probability of a missing reading
+        """
+        self.number_of_stations = number_of_stations
+        self.number_of_years = number_of_years
+        self.seed = seed
+        self.start_date = start_date
+        self.stations_per_river = stations_per_river
+        self.flood_waves_per_year = flood_waves_per_year
+        self.missing_rate = missing_rate
+
+        self.rng = np.random.default_rng(seed)
+
+        self.meta_data = pd.DataFrame(columns=self.meta_columns)
+        self.river_connections = dict()
+        self.time_series_data = pd.DataFrame()
+        # reg-number of the next station downstream, None for the outlet
+        self.downstream_stations = dict()
+        # list of injected waves: {'start_date': str, 'stations': list of reg-numbers}
+        self.injected_flood_waves = []
+
+    def run(self) -> None:
+        """
+        Run function. Generates the river network and the time series.
+        """
+        self.meta_data = self.create_river_network()
+        self.time_series_data = self.create_time_series()
+
+    def create_river_network(self) -> pd.DataFrame:
+        """
+        Creates the rivers one by one. The first river is the main river, every further river is
+        closed with a randomly chosen station of an existing river (close_ending in
+        river_connections). The null points and the relative river kilometres decrease downstream.
+        :return pd.DataFrame: the meta data
+        """
+        rows = []
+        river_index = 0
+        while len(rows) < self.number_of_stations:
+            number_of_river_stations = min(
+                int(self.rng.integers(self.stations_per_river[0], self.stations_per_river[1] + 1)),
+                self.number_of_stations - len(rows)
+            )
+            river_name = f'river_{river_index}'
+
+            if rows:
+                confluence = rows[int(self.rng.integers(len(rows)))]
+                self.river_connections[river_name] = {
+                    'close_beginning': None, 'close_ending': confluence['reg']
+                }
+                rkm, x, y = confluence['rkm_relative'], confluence['EOVx'], confluence['EOVy']
+            else:
+                confluence = None
+                rkm, x, y = 0.0, 0.0, 0.0
+
+            # stations from the mouth of the river upwards
+            river_rows = []
+            direction = self.rng.uniform(0, 2 * np.pi)
+            for _ in range(number_of_river_stations):
+                distance = float(self.rng.uniform(5.0, 40.0))
+                rkm += distance
+                x += distance * 1000 * np.cos(direction)
+                y += distance * 1000 * np.sin(direction)
+                direction += self.rng.normal(0, 0.3)
+                reg = str(100000 + len(rows) + len(river_rows))
+                river_rows.append({
+                    'station_name': f'station_{reg}', 'river': river_name,
+                    'EOVx': round(x, 1), 'EOVy': round(y, 1),
+                    'null_point': round(50.0 + rkm * 0.1, 2), 'rkm_relative': round(rkm, 1),
+                    'reg': reg
+                })
+
+            downstream = None if confluence is None else confluence['reg']
+            for row in river_rows:
+                self.downstream_stations[row['reg']] = downstream
+                downstream = row['reg']
+
+            rows.extend(river_rows[::-1])
+            river_index += 1
+
+        return pd.DataFrame(rows, columns=self.meta_columns)
+
+    def get_path_to_outlet(self, reg_number: str) -> list:
+        """
+        :param str reg_number: reg-number of a station
+        :return list: reg-numbers of the stations from reg_number to the outlet
+        """
+        path = [reg_number]
+        while self.downstream_stations[path[-1]] is not None:
+            path.append(self.downstream_stations[path[-1]])
+
+        return path
+
+    def create_time_series(self) -> pd.DataFrame:
+        """
+        Creates the daily water levels: a seasonal signal with AR(1) noise for every station,
+        plus the injected flood waves and missing values.
+        :return pd.DataFrame: the time series data, columns are reg-numbers
+        """
+        dates = pd.date_range(
+            start=self.start_date,
+            end=pd.Timestamp(self.start_date) + pd.DateOffset(years=self.number_of_years),
+            freq='D', inclusive='left'
+        )
+        reg_numbers = self.meta_data['reg'].tolist()
+        number_of_days = len(dates)
+        number_of_stations = len(reg_numbers)
+
+        base_levels = self.rng.uniform(100, 400, size=number_of_stations)
+        amplitudes = self.rng.uniform(30, 120, size=number_of_stations)
+        phases = self.rng.normal(0, 0.3, size=number_of_stations)
+        day_angles = 2 * np.pi * dates.dayofyear.to_numpy() / 365.25
+        levels = base_levels + amplitudes * np.sin(day_angles[:, None] + phases)
+
+        noise = np.zeros(number_of_stations)
+        innovations = self.rng.normal(0, 4, size=(number_of_days, number_of_stations))
+        for day in range(number_of_days):
+            noise = 0.9 * noise + innovations[day]
+            levels[day] += noise
+
+        self.inject_flood_waves(levels=levels, reg_numbers=reg_numbers, dates=dates)
+
+        levels = np.round(levels)
+        levels[self.rng.random(size=levels.shape) < self.missing_rate] = np.nan
+
+        return pd.DataFrame(data=levels, index=dates, columns=reg_numbers)
+
+    def inject_flood_waves(self, levels: np.ndarray, reg_numbers: list,
+                           dates: pd.DatetimeIndex) -> None:
+        """
+        Adds flood waves to the levels in place. A wave starts at a random station and travels
+        to the outlet, the peak arrives 0-2 days later at every next station and the amplitude
+        slowly decreases.
+        :param np.ndarray levels: water levels of shape (number of days, number of stations)
+        :param list reg_numbers: reg-numbers of the columns of levels
+        :param pd.DatetimeIndex dates: the days of the rows of levels
+        """
+        reg_index_mapping = {reg_number: i for i, reg_number in enumerate(reg_numbers)}
+        number_of_days = len(dates)
+        offsets = np.arange(-10, 11)
+
+        for _ in range(self.flood_waves_per_year * self.number_of_years):
+            start_station = reg_numbers[int(self.rng.integers(len(reg_numbers)))]
+            path = self.get_path_to_outlet(reg_number=start_station)
+            peak_day = int(self.rng.integers(number_of_days))
+            amplitude = self.rng.uniform(150, 600)
+            width = self.rng.uniform(2, 5)
+            self.injected_flood_waves.append({
+                'start_date': dates[peak_day].strftime('%Y-%m-%d'), 'stations': path
+            })
+
+            for reg_number in path:
+                days = peak_day + offsets
+                is_valid = (days >= 0) & (days < number_of_days)
+                bump = amplitude * np.exp(-(offsets[is_valid] / width) ** 2)
+                levels[days[is_valid], reg_index_mapping[reg_number]] += bump
+
+                peak_day += int(self.rng.integers(0, 3))
+                amplitude *= self.rng.uniform(0.9, 1.0)
+                if peak_day >= number_of_days:
+                    break
+
+    def save(self, data_folder_path: str) -> None:
+        """
+        Saves the generated data in the format read by DataLoader.
+        :param str data_folder_path: path of the data folder
+        """
+        os.makedirs(data_folder_path, exist_ok=True)
+
+        self.meta_data.to_csv(os.path.join(data_folder_path, 'meta_data.csv'), index=False)
+        self.time_series_data.to_csv(
+            os.path.join(data_folder_path, 'time_series_data.csv'), float_format='%.0f'
+        )
+        with open(os.path.join(data_folder_path, 'river_connections.json'), 'w') as f:
+            json.dump(self.river_connections, f)
@@ -1,7 +1,5 @@
 import os
 
-import gdown
-
 from src import PROJECT_PATH
 
 
@@ -26,8 +24,11 @@ class DataDownloader:
 
     def download_data(self) -> None:
         """
-        Downloads all data from Google Drive.
+        Downloads all data from Google Drive. gdown (with requests and BeautifulSoup) is imported
+        here, hence it is loaded only if the data is downloaded.
         """
+        import gdown
+
         gdown.download_folder(url=self.folder_link, output=self.data_folder_path)
 
     def do_all_files_exist(self) -> bool:
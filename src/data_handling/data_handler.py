@@ -1,15 +1,19 @@
+import numpy as np
 import pandas as pd
 
 from src.data_handling.data_interface import DataInterface
 from src.data_handling.dataloader import DataLoader
+from src.data_handling.time_resolution import TimeResolution
+from src.profiling.stage_profiler import StageProfiler
 
 
 class DataHandler:
     """
     Class for collecting and handling all downloaded data.
     """
+    coordinate_columns = ['EOVx', 'EOVy', 'null_point']
 
-    def __init__(self, dl: DataLoader):
+    def __init__(self, dl: DataLoader, time_resolution: TimeResolution = None):
         """
         Constructor. We create the following data structures.
 
@@ -35,13 +39,29 @@ class DataHandler:
 
         - reg_rkm_mapping: Dictionary: keys are reg-numbers, values are relative river kilometres
 
+        - reg_numbers: Numpy array of all station reg-numbers in the order of the meta data
+
+        - reg_index_mapping: Dictionary: keys are reg-numbers, values are their positions
+        in reg_numbers
+
+        - station_coordinate_array: Numpy array of shape (number of stations, 3), the i-th row
+        contains the EOVx, EOVy and null_point values of the station reg_numbers[i]
+
+        - time_resolution: TimeResolution instance describing the time step of the time series
+
         :param DataLoader dl: a DataLoader instance
+        :param TimeResolution time_resolution: the time resolution of the data, daily if None
         """
+        self.time_resolution = TimeResolution() if time_resolution is None else time_resolution
 
         self.data_if = DataInterface()
 
         self.run(dl=dl)
 
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'stations': len(self.data_if.reg_numbers),
+        'time_steps': len(self.data_if.time_series_data)
+    })
     def run(self, dl: DataLoader) -> None:
         """
         Run function. Gets all data structures described in the constructor.
@@ -49,6 +69,7 @@ class DataHandler:
         """
         reg_station_mapping_dict = dict(dl.meta_data['station_name'])
         river_station_mapping_dict = self.get_river_station_mapping(dl=dl)
+        reg_numbers = dl.meta_data.index.to_numpy(dtype=str)
         data = {
             'time_series_data': dl.time_series_data.astype(pd.Int64Dtype()),
             'reg_station_mapping': reg_station_mapping_dict,
@@ -60,7 +81,11 @@ class DataHandler:
                 river_station_mapping=river_station_mapping_dict
             ),
             'river_connections': dl.river_connections,
-            'reg_rkm_mapping': dict(dl.meta_data['rkm_relative'])
+            'reg_rkm_mapping': dict(dl.meta_data['rkm_relative']),
+            'reg_numbers': reg_numbers,
+            'reg_index_mapping': dict(zip(reg_numbers.tolist(), range(len(reg_numbers)))),
+            'station_coordinate_array': self.get_station_coordinate_array(dl=dl),
+            'time_resolution': self.time_resolution
         }
 
         self.data_if = DataInterface(data=data)
@@ -71,32 +96,37 @@ class DataHandler:
         Creates the station_coordinates dictionary described in the constructor.
         :return dict: the station coordinates dictionary
         """
-        station_coordinates_df = dl.meta_data[['EOVx', 'EOVy', 'null_point']]
+        columns = DataHandler.coordinate_columns
+        coordinate_lists = [dl.meta_data[column].tolist() for column in columns]
 
-        station_coordinates_dict = station_coordinates_df.to_dict(orient='index')
+        station_coordinates_dict = {
+            reg_number: dict(zip(columns, coordinates))
+            for reg_number, coordinates in zip(dl.meta_data.index, zip(*coordinate_lists))
+        }
 
         return station_coordinates_dict
 
+    @staticmethod
+    def get_station_coordinate_array(dl: DataLoader) -> np.ndarray:
+        """
+        Creates the station_coordinate_array described in the constructor.
+        :return np.ndarray: the coordinates of the stations, rows are in the order of the meta data
+        """
+        return dl.meta_data[DataHandler.coordinate_columns].to_numpy(dtype=np.float64)
+
     @staticmethod
     def get_river_station_mapping(dl: DataLoader) -> dict:
         """
-        Creates the river-station mapping dictionary described in the constructor.
+        Creates the river-station mapping dictionary described in the constructor. The rivers
+        are in the order of their first appearance in the meta data.
         :return dict: river-station mapping
         """
-        all_river_names = dl.meta_data['river'].values
-
-        river_names_without_duplicates = list(
-            dict.fromkeys(all_river_names)
-        )
+        grouped_station_names = dl.meta_data.groupby('river', sort=False)['station_name']
 
-        river_station_mapping = {}
-        for river_name in river_names_without_duplicates:
-            select_river = dl.meta_data[
-                dl.meta_data['river'] == river_name
-                ]
-            station_names_along_river = list(select_river.station_name.values)
-
-            river_station_mapping[river_name] = station_names_along_river
+        river_station_mapping = {
+            river_name: station_names.tolist()
+            for river_name, station_names in grouped_station_names
+        }
 
         return river_station_mapping
 
@@ -104,16 +134,21 @@ class DataHandler:
     def get_station_river_mapping(reg_station_mapping: dict,
                                   river_station_mapping: dict) -> dict:
         """
-        Creates the station-river mapping described in the constructor.
+        Creates the station-river mapping described in the constructor. If a station name
+        appears along more rivers, the first river is kept.
         :param dict reg_station_mapping: the dictionary of the reg-station mapping
         :param dict river_station_mapping: the dictionary of the river-station mapping
         :return dict: station_river_mapping
         """
-        station_river_mapping = {}
-        for station_name in list(reg_station_mapping.values()):
-            for river_name in list(river_station_mapping.keys()):
-                if station_name in river_station_mapping[river_name]:
-                    station_river_mapping[station_name] = river_name
-                    break
+        first_river_mapping = {}
+        for river_name, station_names in river_station_mapping.items():
+            for station_name in station_names:
+                first_river_mapping.setdefault(station_name, river_name)
+
+        station_river_mapping = {
+            station_name: first_river_mapping[station_name]
+            for station_name in reg_station_mapping.values()
+            if station_name in first_river_mapping
+        }
 
         return station_river_mapping
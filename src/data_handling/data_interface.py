@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 
+from src.data_handling.time_resolution import TimeResolution
+
 
 class DataInterface:
     """
@@ -18,6 +21,11 @@ class DataInterface:
         - 'station_river_mapping'
         - 'river_connections'
         - 'reg_rkm_mapping'
+        - 'reg_numbers'
+        - 'reg_index_mapping'
+        - 'station_coordinate_array'
+        - 'time_resolution'
+        The station grid index (StationGridIndex) is built at the first spatial selection.
         """
         self.time_series_data = pd.DataFrame()
         self.reg_station_mapping = dict()
@@ -27,6 +35,11 @@ class DataInterface:
         self.station_river_mapping = dict()
         self.river_connections = dict()
         self.reg_rkm_mapping = dict()
+        self.reg_numbers = np.array([], dtype=str)
+        self.reg_index_mapping = dict()
+        self.station_coordinate_array = np.empty((0, 3))
+        self.time_resolution = TimeResolution()
+        self.station_grid_index = None
 
         if data is not None:
             for key, value in data.items():
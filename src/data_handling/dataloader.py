@@ -1,39 +1,51 @@
 import json
 import os
+from typing import Iterator
 
 import pandas as pd
 
+from src.profiling.stage_profiler import StageProfiler
+
 
 class DataLoader:
     """
     Class for loading all necessary data.
     """
-    def __init__(self, data_folder_path: str = None):
+    time_series_file_name = 'time_series_data.csv'
+
+    def __init__(self, data_folder_path: str = None, do_load_time_series: bool = True):
         """
         Constructor.
         :param str data_folder_path: the location where we wish to place the data folder
+        :param bool do_load_time_series: whether to load the whole time series data into memory
+        or not. If False, the time series can be read in blocks with iter_time_series_blocks.
         """
         self.data_folder_path = data_folder_path
+        self.do_load_time_series = do_load_time_series
 
         self.time_series_data = pd.DataFrame()
         self.meta_data = pd.DataFrame()
         self.river_connections = dict()
         self.load_data()
 
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'stations': len(self.meta_data),
+        'time_steps': len(self.time_series_data)
+    })
     def load_data(self) -> None:
         """
         Reads downloaded data from the data folder and saves them in member variables.
         """
-        time_series_file_name = 'time_series_data.csv'
         meta_file_name = 'meta_data.csv'
         river_connections_file_name = 'river_connections.json'
 
-        self.time_series_data = pd.read_csv(
-            os.path.join(self.data_folder_path, time_series_file_name),
-            index_col=[0]
-        )
-        self.time_series_data.index = pd.to_datetime(self.time_series_data.index)
-        self.time_series_data.columns = self.time_series_data.columns.map(str)
+        if self.do_load_time_series:
+            self.time_series_data = pd.read_csv(
+                os.path.join(self.data_folder_path, self.time_series_file_name),
+                index_col=[0]
+            )
+            self.time_series_data.index = pd.to_datetime(self.time_series_data.index)
+            self.time_series_data.columns = self.time_series_data.columns.map(str)
 
         self.meta_data = pd.read_csv(
             os.path.join(self.data_folder_path, meta_file_name),
@@ -45,3 +57,21 @@ class DataLoader:
                 os.path.join(self.data_folder_path, river_connections_file_name)
         ) as f:
             self.river_connections = json.load(f)
+
+    def iter_time_series_blocks(self, block_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Reads the time series data lazily in blocks of consecutive rows.
+        :param int block_size: number of rows (time steps) in a block
+        :return Iterator[pd.DataFrame]: iterator of time series blocks with the same format
+        as time_series_data
+        """
+        reader = pd.read_csv(
+            os.path.join(self.data_folder_path, self.time_series_file_name),
+            index_col=[0],
+            chunksize=block_size
+        )
+        for block in reader:
+            block.index = pd.to_datetime(block.index)
+            block.columns = block.columns.map(str)
+
+            yield block
@@ -0,0 +1,221 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.data_handling.time_resolution import TimeResolution
+
+
+class FloodWaveFile:
+    """
+    Class for writing and reading extracted flood waves in a compact format. The nodes of all
+    waves are stored in one flat node table (station code, time step and water level arrays) and
+    the waves are given by offsets into this table. If the equivalence is not applied, the waves
+    of the same equivalence class are grouped by class offsets. The arrays are saved as .npy
+    files, hence they can be memory mapped and single waves can be read without reading the rest.
+    """
+    array_names = ['node_stations', 'node_times', 'node_levels', 'wave_offsets', 'class_offsets']
+
+    def __init__(self, data_folder_path: str, subfolder_names: list, file_name: str = 'waves'):
+        """
+        Constructor. Opens a saved flood wave file, the arrays are memory mapped.
+        :param str data_folder_path: path of the data folder
+        :param list subfolder_names: the file is in the rightmost folder of this chain of folders
+        :param str file_name: name of the file (a folder containing the arrays)
+        """
+        self.folder_path = os.path.join(data_folder_path, 'generated', *subfolder_names, file_name)
+
+        with open(os.path.join(self.folder_path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+
+        self.is_equivalence_applied = self.meta['is_equivalence_applied']
+        self.stations = self.meta['stations']
+        self.station_table = np.array(self.meta['station_table'], dtype=object)
+        self.time_resolution = TimeResolution(**self.meta['time_resolution'])
+
+        for array_name in self.array_names:
+            array_path = os.path.join(self.folder_path, f'{array_name}.npy')
+            array = np.load(array_path, mmap_mode='r') if os.path.exists(array_path) else None
+            setattr(self, array_name, array)
+
+    @staticmethod
+    def save(flood_waves: list, is_equivalence_applied: bool, stations: list,
+             data_folder_path: str, subfolder_names: list, file_name: str = 'waves',
+             time_resolution: TimeResolution = None) -> None:
+        """
+        Saves flood waves in the compact format.
+        :param list flood_waves: the flood waves as returned by FloodWaveExtractor
+        :param bool is_equivalence_applied: True if flood_waves is a list of waves, False if it is
+        a list of equivalence classes (lists of waves)
+        :param list stations: list of stations in the filtered WNG
+        :param str data_folder_path: path of the data folder
+        :param list subfolder_names: the file is saved in the rightmost folder of this chain
+        of folders
+        :param str file_name: name of the file (a folder containing the arrays)
+        :param TimeResolution time_resolution: the time resolution of the nodes, daily if None
+        """
+        if time_resolution is None:
+            time_resolution = TimeResolution()
+
+        arrays, station_table = FloodWaveFile.create_arrays(
+            flood_waves=flood_waves,
+            is_equivalence_applied=is_equivalence_applied,
+            time_resolution=time_resolution
+        )
+
+        folder_path = os.path.join(data_folder_path, 'generated', *subfolder_names, file_name)
+        os.makedirs(folder_path, exist_ok=True)
+
+        for array_name, array in arrays.items():
+            with GeneratedDataLoader.atomic_write(
+                    os.path.join(folder_path, f'{array_name}.npy')
+            ) as f:
+                np.save(f, array)
+
+        meta = {
+            'is_equivalence_applied': is_equivalence_applied,
+            'stations': stations,
+            'station_table': station_table,
+            'time_resolution': {
+                'freq': time_resolution.freq,
+                'origin': str(time_resolution.origin),
+                'use_integer_keys': time_resolution.use_integer_keys
+            },
+            'number_of_waves': len(arrays['wave_offsets']) - 1
+        }
+        with GeneratedDataLoader.atomic_write(os.path.join(folder_path, 'meta.json')) as f:
+            f.write(json.dumps(meta).encode())
+
+    @staticmethod
+    def create_arrays(flood_waves: list, is_equivalence_applied: bool,
+                      time_resolution: TimeResolution) -> tuple:
+        """
+        Creates the flat node table and the offsets from the flood waves.
+        :param list flood_waves: the flood waves as returned by FloodWaveExtractor
+        :param bool is_equivalence_applied: True if flood_waves is a list of waves, False if it is
+        a list of equivalence classes (lists of waves)
+        :param TimeResolution time_resolution: the time resolution of the nodes
+        :return tuple: dictionary of arrays and the station table (list of reg-numbers, the
+        node_stations array contains positions in this list)
+        """
+        arrays = {}
+        if is_equivalence_applied:
+            waves = flood_waves
+        else:
+            classes = [list(paths) for paths in flood_waves]
+            waves = [wave for paths in classes for wave in paths]
+            arrays['class_offsets'] = np.concatenate(
+                [[0], np.cumsum([len(paths) for paths in classes])]
+            ).astype(np.int64)
+
+        arrays['wave_offsets'] = np.concatenate(
+            [[0], np.cumsum([len(wave) for wave in waves])]
+        ).astype(np.int64)
+
+        nodes = [node for wave in waves for node in wave]
+        node_stations, station_table = pd.factorize(
+            pd.Series([node[0] for node in nodes], dtype=object)
+        )
+        arrays['node_stations'] = node_stations.astype(np.int32)
+        arrays['node_times'] = time_resolution.decode([node[1] for node in nodes])
+        arrays['node_levels'] = np.array([node[2] for node in nodes], dtype=np.int64)
+
+        return arrays, list(station_table)
+
+    def __len__(self) -> int:
+        """
+        :return int: the number of flood waves (not equivalence classes)
+        """
+        return len(self.wave_offsets) - 1
+
+    def get_number_of_classes(self) -> int:
+        """
+        :return int: the number of equivalence classes, equals to the number of flood waves
+        if the equivalence is applied
+        """
+        if self.class_offsets is None:
+            return len(self)
+
+        return len(self.class_offsets) - 1
+
+    def get_waves(self, start: int = 0, stop: int = None) -> list:
+        """
+        Reads flood waves start, start + 1, ..., stop - 1. Only the needed part of the node table
+        is read.
+        :param int start: index of the first wave
+        :param int stop: index after the last wave, the number of waves if None
+        :return list: list of flood waves, a flood wave is a list of (reg_number, time_key, level)
+        """
+        stop = len(self) if stop is None else stop
+        offsets = np.asarray(self.wave_offsets[start:stop + 1]) - self.wave_offsets[start]
+        node_slice = slice(int(self.wave_offsets[start]), int(self.wave_offsets[stop]))
+
+        nodes = list(zip(
+            self.station_table[np.asarray(self.node_stations[node_slice])].tolist(),
+            self.time_resolution.encode(self.node_times[node_slice]).tolist(),
+            np.asarray(self.node_levels[node_slice]).tolist()
+        ))
+
+        return [nodes[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def get_wave(self, index: int) -> list:
+        """
+        Reads a single flood wave.
+        :param int index: index of the flood wave
+        :return list: the flood wave
+        """
+        return self.get_waves(start=index, stop=index + 1)[0]
+
+    def get_class(self, index: int) -> list:
+        """
+        Reads the flood waves of an equivalence class.
+        :param int index: index of the equivalence class
+        :return list: list of flood waves in the class
+        """
+        if self.class_offsets is None:
+            return [self.get_wave(index=index)]
+
+        return self.get_waves(
+            start=int(self.class_offsets[index]), stop=int(self.class_offsets[index + 1])
+        )
+
+    def iter_classes(self, batch_size: int = 10000):
+        """
+        Iterates over the flood waves (equivalence applied) or the equivalence classes (not
+        applied) in the same structure as FloodWaveExtractor returns them, reading batch_size
+        waves at once.
+        :param int batch_size: number of flood waves read at once
+        :return: iterator of flood waves or equivalence classes
+        """
+        if self.class_offsets is None:
+            for start in range(0, len(self), batch_size):
+                yield from self.get_waves(start=start, stop=min(start + batch_size, len(self)))
+        else:
+            for index in range(self.get_number_of_classes()):
+                yield self.get_class(index=index)
+
+    def to_flood_waves(self) -> list:
+        """
+        Reads all flood waves.
+        :return list: the flood waves in the same structure as FloodWaveExtractor returns them
+        """
+        return list(self.iter_classes())
+
+    def export_jsonl(self, data_folder_path: str, subfolder_names: list, file_name: str) -> None:
+        """
+        Exports the flood waves into a JSON Lines file, see GeneratedDataLoader.save_jsonl.
+        :param str data_folder_path: path of the data folder
+        :param list subfolder_names: the file is saved in the rightmost folder of this chain
+        of folders
+        :param str file_name: name of the JSON Lines file
+        """
+        GeneratedDataLoader.save_jsonl(
+            header={'is_equivalence_applied': self.is_equivalence_applied,
+                    'stations': self.stations},
+            lines=self.iter_classes(),
+            data_folder_path=data_folder_path,
+            subfolder_names=subfolder_names,
+            file_name=file_name
+        )
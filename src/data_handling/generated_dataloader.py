@@ -1,6 +1,10 @@
 import json
 import os
 import pickle
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from typing import Iterator
 
 import networkx as nx
 import pandas as pd
@@ -33,9 +37,9 @@ class GeneratedDataLoader:
             graph.add_nodes_from(vertices)
             graph.add_edges_from(edges)
 
-        with open(os.path.join(
+        with GeneratedDataLoader.atomic_write(os.path.join(
                 data_folder_path, 'generated', folder_name, f'{file_name}.pkl'
-        ), 'wb') as f:
+        )) as f:
             pickle.dump(graph, f)
 
     @staticmethod
@@ -55,6 +59,126 @@ class GeneratedDataLoader:
 
         return graph
 
+    @staticmethod
+    @contextmanager
+    def atomic_write(path: str):
+        """
+        Context manager for writing a file atomically: the data is written into a temporary file
+        in the same folder, which is renamed to path only if writing succeeded. Readers never see
+        a partially written file.
+        :param str path: path of the file
+        :return: the binary file object of the temporary file
+        """
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=f'.{os.path.basename(path)}.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(file_descriptor, 'wb') as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    @staticmethod
+    def save_bundle(data: dict, data_folder_path: str, folder_name: str, file_name: str,
+                    compression_level: int = 6) -> None:
+        """
+        Method for saving many objects into a single compressed zip file. Every object is pickled
+        into its own member, hence a single object can be read without reading the rest. The file
+        is written atomically.
+        :param dict data: keys are member names, values are the objects to save
+        :param str data_folder_path: path of the data folder
+        :param str folder_name: name of the folder inside the generated folder
+        :param str file_name: name of the file
+        :param int compression_level: compression level of zlib (0-9)
+        """
+        os.makedirs(os.path.join(data_folder_path, 'generated', folder_name), exist_ok=True)
+
+        with GeneratedDataLoader.atomic_write(os.path.join(
+                data_folder_path, 'generated', folder_name, f'{file_name}.zip'
+        )) as f:
+            with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_DEFLATED,
+                                 compresslevel=compression_level) as bundle:
+                for member_name, member in data.items():
+                    bundle.writestr(
+                        member_name, pickle.dumps(member, protocol=pickle.HIGHEST_PROTOCOL)
+                    )
+
+    @staticmethod
+    def read_bundle(data_folder_path: str, folder_name: str, file_name: str,
+                    member_names: list = None) -> dict:
+        """
+        Method for reading some (or all) members of a zip file written with save_bundle.
+        :param str data_folder_path: path of the data folder
+        :param str folder_name: name of the folder inside the generated folder
+        :param str file_name: name of the file
+        :param list member_names: names of the members to read, all members are read if None
+        :return dict: keys are member names, values are the loaded objects
+        """
+        with zipfile.ZipFile(os.path.join(
+                data_folder_path, 'generated', folder_name, f'{file_name}.zip'
+        ), 'r') as bundle:
+            if member_names is None:
+                member_names = bundle.namelist()
+
+            loaded_data = {
+                member_name: pickle.loads(bundle.read(member_name))
+                for member_name in member_names
+            }
+
+        return loaded_data
+
+    @staticmethod
+    def append_pickle(data, data_folder_path: str, folder_name: str, file_name: str) -> None:
+        """
+        Method for appending an object to a pickle stream file. The file can hold many
+        consecutively pickled objects, which can be read back one by one with iter_pickle.
+        :param data: the object to append
+        :param str data_folder_path: path of the data folder
+        :param str folder_name: name of the folder inside the generated folder
+        :param str file_name: name of the file
+        """
+        os.makedirs(os.path.join(data_folder_path, 'generated', folder_name), exist_ok=True)
+
+        with open(os.path.join(
+                data_folder_path, 'generated', folder_name, f'{file_name}.pkl'
+        ), 'ab') as f:
+            pickle.dump(data, f)
+
+    @staticmethod
+    def iter_pickle(data_folder_path: str, folder_name: str, file_name: str) -> Iterator:
+        """
+        Method for lazily reading the objects of a pickle stream file written with append_pickle.
+        :param str data_folder_path: path of the data folder
+        :param str folder_name: name of the folder inside the generated folder
+        :param str file_name: name of the file
+        :return Iterator: iterator of the stored objects
+        """
+        with open(os.path.join(
+                data_folder_path, 'generated', folder_name, f'{file_name}.pkl'
+        ), 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    @staticmethod
+    def remove_file(data_folder_path: str, subfolder_names: list, file_name: str) -> None:
+        """
+        Removes a generated file if it exists.
+        :param str data_folder_path: path of the data folder
+        :param list subfolder_names: the file is in the rightmost folder of this chain of folders
+        :param str file_name: name of the file with extension
+        """
+        path = os.path.join(data_folder_path, 'generated', *subfolder_names, file_name)
+        if os.path.exists(path):
+            os.remove(path)
+
     @staticmethod
     def save_json(data: dict, data_folder_path: str,
                   subfolder_names: list, file_name: str) -> None:
@@ -69,8 +193,10 @@ class GeneratedDataLoader:
         folder_names_chain = ['generated'] + subfolder_names
         os.makedirs(os.path.join(data_folder_path, *folder_names_chain), exist_ok=True)
 
-        with open(os.path.join(data_folder_path, *folder_names_chain, f"{file_name}.json"), "w") as f:
-            json.dump(data, f)
+        with GeneratedDataLoader.atomic_write(
+                os.path.join(data_folder_path, *folder_names_chain, f"{file_name}.json")
+        ) as f:
+            f.write(json.dumps(data).encode())
 
     @staticmethod
     def read_json(data_folder_path: str, subfolder_names: list, file_name: str) -> dict:
@@ -88,6 +214,43 @@ class GeneratedDataLoader:
 
         return loaded_data
 
+    @staticmethod
+    def save_jsonl(header: dict, lines: Iterator, data_folder_path: str,
+                   subfolder_names: list, file_name: str) -> None:
+        """
+        Function for saving a stream of objects into a JSON Lines file. The first line is the
+        header, every further line is an element of lines.
+        :param dict header: dictionary written into the first line
+        :param Iterator lines: objects written into the further lines one by one
+        :param str data_folder_path: path of the data folder
+        :param list subfolder_names: there nested folder will be created and the file will be
+        saved in the rightmost folder
+        :param str file_name: name of the jsonl file
+        """
+        folder_names_chain = ['generated'] + subfolder_names
+        os.makedirs(os.path.join(data_folder_path, *folder_names_chain), exist_ok=True)
+
+        path = os.path.join(data_folder_path, *folder_names_chain, f"{file_name}.jsonl")
+        with GeneratedDataLoader.atomic_write(path) as f:
+            f.write((json.dumps(header) + '\n').encode())
+            for line in lines:
+                f.write((json.dumps(line) + '\n').encode())
+
+    @staticmethod
+    def iter_jsonl(data_folder_path: str, subfolder_names: list, file_name: str) -> Iterator:
+        """
+        Function for lazily reading a JSON Lines file written with save_jsonl.
+        :param str data_folder_path: path of the data folder
+        :param list subfolder_names: the file is in the rightmost folder of this chain of folders
+        :param str file_name: name of the jsonl file
+        :return Iterator: iterator of the loaded lines, the first element is the header
+        """
+        folder_names_chain = ['generated'] + subfolder_names
+        path = os.path.join(data_folder_path, *folder_names_chain, f"{file_name}.jsonl")
+        with open(path, "r") as f:
+            for line in f:
+                yield json.loads(line)
+
     @staticmethod
     def save_csv(data: pd.DataFrame, data_folder_path: str,
                   subfolder_names: list, file_name: str) -> None:
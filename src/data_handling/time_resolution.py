@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+class TimeResolution:
+    """
+    Class describing the time resolution of the time series data and the format of the time keys
+    in the nodes of the Flood Wave Graph. Daily data keeps the '%Y-%m-%d' string keys, sub-daily
+    data uses integer time-step keys counted from origin.
+    """
+    def __init__(self, freq: str = 'D', origin: str = '1970-01-01', use_integer_keys: bool = None):
+        """
+        Constructor.
+        :param str freq: length of a time step as a pandas frequency string, e.g. 'D', 'h', '15min'
+        :param str origin: the time of step 0
+        :param bool use_integer_keys: True if the time keys of the nodes are integer time steps,
+        False if they are '%Y-%m-%d' strings. The default is False for daily data and True
+        otherwise.
+        """
+        self.freq = freq
+        self.step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+        self.origin = pd.Timestamp(origin)
+        self.is_daily = self.step == pd.Timedelta(days=1)
+
+        if use_integer_keys is None:
+            use_integer_keys = not self.is_daily
+        if not use_integer_keys and not self.is_daily:
+            raise ValueError('Date string keys can only be used with daily data.')
+        self.use_integer_keys = use_integer_keys
+
+    def to_steps(self, duration) -> int:
+        """
+        Converts a duration into a number of time steps.
+        :param duration: an integer number of time steps or a duration like '3D', '36h'
+        or pd.Timedelta(days=3)
+        :return int: the number of time steps
+        """
+        if isinstance(duration, (int, np.integer)):
+            return int(duration)
+
+        steps = pd.Timedelta(duration) / self.step
+        if steps != int(steps):
+            raise ValueError(f'{duration} is not a multiple of the time step {self.freq}.')
+
+        return int(steps)
+
+    def to_step_array(self, index: pd.DatetimeIndex) -> np.ndarray:
+        """
+        Converts timestamps into time steps.
+        :param pd.DatetimeIndex index: timestamps
+        :return np.ndarray: integer time steps
+        """
+        deltas = pd.DatetimeIndex(index).values - self.origin.to_datetime64()
+
+        return (deltas // self.step.to_timedelta64()).astype(np.int64)
+
+    def encode(self, steps: np.ndarray) -> np.ndarray:
+        """
+        Converts time steps into node time keys.
+        :param np.ndarray steps: integer time steps
+        :return np.ndarray: node time keys
+        """
+        steps = np.asarray(steps, dtype=np.int64)
+        if self.use_integer_keys:
+            return steps
+
+        days = self.origin.to_datetime64().astype('datetime64[D]') + steps
+
+        return np.datetime_as_string(days, unit='D')
+
+    def decode(self, keys) -> np.ndarray:
+        """
+        Converts node time keys into time steps.
+        :param keys: node time keys (list or array)
+        :return np.ndarray: integer time steps
+        """
+        if self.use_integer_keys:
+            return np.asarray(keys, dtype=np.int64)
+
+        days = np.asarray(keys, dtype='datetime64[D]')
+
+        return (days - self.origin.to_datetime64().astype('datetime64[D]')).astype(np.int64)
+
+    def to_key(self, value):
+        """
+        Converts a point in time given by the user into a node time key. Used e.g. for the bounds
+        of the temporal filtering.
+        :param value: a node time key, a date string or a timestamp
+        :return: the node time key
+        """
+        if self.use_integer_keys:
+            if isinstance(value, (int, np.integer)):
+                return int(value)
+            return int(self.to_step_array(pd.DatetimeIndex([pd.Timestamp(value)]))[0])
+
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+    def to_timestamps(self, steps: np.ndarray) -> pd.DatetimeIndex:
+        """
+        Converts time steps into timestamps.
+        :param np.ndarray steps: integer time steps
+        :return pd.DatetimeIndex: the timestamps
+        """
+        steps = np.asarray(steps, dtype=np.int64)
+
+        return pd.DatetimeIndex(self.origin.to_datetime64() + steps * self.step.to_timedelta64())
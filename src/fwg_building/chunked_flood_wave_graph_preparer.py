@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+from src.data_handling.data_interface import DataInterface
+from src.data_handling.dataloader import DataLoader
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.data_handling.time_resolution import TimeResolution
+from src.fwg_building.flood_wave_graph_preparer import FloodWaveGraphPreparer
+from src.fwg_building.fwg_preparer_data_interface import FWGPreparerDataInterface
+from src.profiling.stage_profiler import StageProfiler
+from src.wng_building.station_river_data_interface import StationRiverDataInterface
+
+
+class ChunkedFloodWaveGraphPreparer:
+    """
+    Class for finding the edges of the Flood Wave Graph block by block. The time series data is
+    read lazily from the data folder and the edges are written to disk after each block, hence
+    the memory usage is bounded by the block size instead of the length of the record.
+    """
+    def __init__(self, dl: DataLoader, station_river_data_if: StationRiverDataInterface,
+                 beta, delta, block_size: int, data_folder_path: str,
+                 time_resolution: TimeResolution = None):
+        """
+        Constructor.
+        :param DataLoader dl: a DataLoader instance, it is enough to create it with
+        do_load_time_series=False
+        :param StationRiverDataInterface station_river_data_if: a StationRiverDataInterface instance
+        :param beta: hyperparameter for setting the maximal allowed time difference between two
+        connected nodes, see FloodWaveGraphPreparer
+        :param delta: hyperparameter for setting the lengths of the time intervals in which
+        we are looking for a peak value, see FloodWaveGraphPreparer
+        :param int block_size: number of rows (time steps) read at once
+        :param str data_folder_path: path of the data folder, the edges are written into it
+        :param TimeResolution time_resolution: the time resolution of the data, daily if None
+        """
+        if block_size < 1:
+            raise ValueError('block_size has to be a positive integer.')
+
+        self.dl = dl
+        self.station_river_data_if = station_river_data_if
+        self.time_resolution = TimeResolution() if time_resolution is None else time_resolution
+        self.beta = self.time_resolution.to_steps(beta)
+        self.delta = self.time_resolution.to_steps(delta)
+        self.block_size = block_size
+        self.data_folder_path = data_folder_path
+
+        self.edges_file = {
+            'data_folder_path': self.data_folder_path,
+            'folder_name': 'flood_wave_graph',
+            'file_name': 'fwg_edges'
+        }
+        self.number_of_edges = 0
+
+        self.preparer_if = FWGPreparerDataInterface()
+
+    @StageProfiler.profile_stage(get_counts=lambda self: {'edges': self.number_of_edges})
+    def run(self) -> None:
+        """
+        Run function. Processes the time series block by block. Every window consists of the
+        newly read block and a halo kept from the previous window: the rows whose edges could not
+        be decided yet (at most beta + delta time steps) and delta more rows for the peak detection.
+        """
+        GeneratedDataLoader.remove_file(
+            data_folder_path=self.data_folder_path,
+            subfolder_names=[self.edges_file['folder_name']],
+            file_name=f"{self.edges_file['file_name']}.pkl"
+        )
+
+        halo = None
+        last_cutoff = None
+        blocks = self.dl.iter_time_series_blocks(block_size=self.block_size)
+        block = next(blocks, None)
+        while block is not None:
+            next_block = next(blocks, None)
+            is_last_window = next_block is None
+
+            block = block.astype(pd.Int64Dtype())
+            window = block if halo is None else pd.concat([halo, block])
+
+            halo, last_cutoff = self.process_window(
+                window=window, last_cutoff=last_cutoff, is_last_window=is_last_window
+            )
+
+            block = next_block
+
+        self.preparer_if = FWGPreparerDataInterface(data={
+            'edges_file': self.edges_file,
+            'river_names': list(self.station_river_data_if.completed_rivers),
+            'time_resolution': self.time_resolution
+        })
+
+    def process_window(self, window: pd.DataFrame, last_cutoff: int,
+                       is_last_window: bool) -> tuple:
+        """
+        Finds and saves the edges starting in a window after last_cutoff, for which all the
+        possible end nodes are already known.
+        :param pd.DataFrame window: time series data of the window
+        :param int last_cutoff: edges starting at or before this time step are already saved,
+        None if nothing has been saved yet
+        :param bool is_last_window: True if there is no more data after the window
+        :return tuple: the halo passed to the next window and the new cutoff time step
+        """
+        last_peak_row = len(window) - 1 if is_last_window else len(window) - 1 - self.delta
+        if last_peak_row < 0:
+            return window, last_cutoff
+
+        data_if = DataInterface(data={
+            'time_series_data': window,
+            'time_resolution': self.time_resolution
+        })
+        preparer = FloodWaveGraphPreparer(
+            data_if=data_if, station_river_data_if=self.station_river_data_if,
+            beta=self.beta, delta=self.delta
+        )
+
+        cutoff = int(preparer.time_steps[last_peak_row])
+        if not is_last_window:
+            cutoff -= self.beta
+
+        delta_peak_bools = preparer.find_delta_peaks()
+
+        # peaks whose preceding delta time steps are cut off by the halo are not valid
+        if last_cutoff is not None:
+            delta_peak_bools.iloc[:self.delta] = False
+
+        edges, edge_attributes = preparer.find_edges_and_attributes(
+            delta_peak_bools=delta_peak_bools
+        )
+        start_steps = self.time_resolution.decode([edge[0][1] for edge in edges])
+        is_edge_new = start_steps <= cutoff
+        if last_cutoff is not None:
+            is_edge_new &= last_cutoff < start_steps
+        edges = [edge for edge, is_new in zip(edges, is_edge_new) if is_new]
+        edge_attributes = {name: values[is_edge_new] for name, values in edge_attributes.items()}
+
+        if edges:
+            GeneratedDataLoader.append_pickle(
+                data={'edges': edges, 'edge_attributes': edge_attributes}, **self.edges_file
+            )
+            self.number_of_edges += len(edges)
+
+        first_pending_row = int(np.searchsorted(preparer.time_steps, cutoff, side='right'))
+        halo = window.iloc[max(first_pending_row - self.delta, 0):]
+
+        return halo, cutoff
@@ -1,33 +1,57 @@
 import networkx as nx
+import numpy as np
 
 from src.data_handling.generated_dataloader import GeneratedDataLoader
 from src.fwg_building.fwg_data_interface import FWGDataInterface
 from src.fwg_building.fwg_preparer_data_interface import FWGPreparerDataInterface
+from src.fwg_building.fwg_shard_store import FWGShardStore
+from src.profiling.stage_profiler import StageProfiler
 
 
 class FloodWaveGraphBuilder:
     """
-    Class for building the Flood Wave Graph.
+    Class for building the Flood Wave Graph. The edge attributes computed by the preparer are
+    attached to the edges ('lag' in time steps, 'level_difference' and 'river', the index of the
+    completed river in preparer_interface.river_names), hence the analyses can filter the edges
+    without recomputing them. With max_lag, the FWG of any beta below the beta of the preparation
+    is built from the same preparation.
     """
+    edge_attribute_names = ['lag', 'level_difference', 'river']
+
     def __init__(self, preparer_interface: FWGPreparerDataInterface,
-                 do_save_fwg: bool = False, data_folder_path: str = None):
+                 do_save_fwg: bool = False, data_folder_path: str = None,
+                 shard_partition: str = None, max_lag=None):
         """
         Constructor.
         :param FWGPreparerDataInterface preparer_interface: a FWGPreparerDataInterface instance
         :param bool do_save_fwg: whether to save the Flood Wave Graph or not
         :param str data_folder_path: path of the data folder
+        :param str shard_partition: None if the Flood Wave Graph is saved into one pickle file,
+        'year' or 'hydrological_year' if it is saved in time shards (see FWGShardStore)
+        :param max_lag: edges with a larger lag are left out, a number of time steps or a duration
+        like beta, every edge is kept if None
         """
         self.preparer_if = preparer_interface
         self.do_save_fwg = do_save_fwg
         self.data_folder_path = data_folder_path
+        self.shard_partition = shard_partition
+        self.max_lag = None if max_lag is None \
+            else self.preparer_if.time_resolution.to_steps(max_lag)
 
         self.fwg_if = FWGDataInterface()
 
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'nodes': self.fwg_if.flood_wave_graph.number_of_nodes(),
+        'edges': self.fwg_if.flood_wave_graph.number_of_edges()
+    })
     def run(self) -> None:
         """
         Run function. Builds the Flood Wave Graph and saves it if needed.
         """
         self.fwg_if.flood_wave_graph = self.build_flood_wave_graph()
+        self.fwg_if.time_resolution = self.preparer_if.time_resolution
+        self.fwg_if.node_index = None
+        self.fwg_if.version += 1
 
         if self.do_save_fwg:
             self.save_fwg()
@@ -38,14 +62,58 @@ class FloodWaveGraphBuilder:
         :return nx.DiGraph: the Flood Wave Graph
         """
         fwg = nx.DiGraph()
-        fwg.add_edges_from(self.preparer_if.edges)
+        if self.preparer_if.edges_file is None:
+            fwg.add_edges_from(self.get_edges_with_attributes(
+                edges=self.preparer_if.edges, edge_attributes=self.preparer_if.edge_attributes
+            ))
+        else:
+            for block in GeneratedDataLoader.iter_pickle(**self.preparer_if.edges_file):
+                fwg.add_edges_from(self.get_edges_with_attributes(
+                    edges=block['edges'], edge_attributes=block['edge_attributes']
+                ))
 
         return fwg
 
+    def get_edges_with_attributes(self, edges: list, edge_attributes: dict) -> list:
+        """
+        Attaches the attributes to the edges and leaves out the edges longer than max_lag.
+        :param list edges: list of edges
+        :param dict edge_attributes: dictionary of the attribute arrays aligned with the edges,
+        None if the preparation has no edge attributes
+        :return list: list of (start node, end node, attribute dictionary) tuples, or the edges
+        themselves if there are no attributes
+        """
+        if edge_attributes is None:
+            if self.max_lag is not None:
+                raise ValueError('max_lag needs the edge attributes of the preparation.')
+            return edges
+
+        attribute_names = self.edge_attribute_names
+        if self.max_lag is None:
+            is_kept = np.ones(len(edges), dtype=bool)
+        else:
+            is_kept = edge_attributes['lag'] <= self.max_lag
+        kept_attributes = zip(*(
+            edge_attributes[name][is_kept].tolist() for name in attribute_names
+        ))
+        kept_edges = (edge for edge, is_kept_edge in zip(edges, is_kept.tolist()) if is_kept_edge)
+
+        return [
+            (start, end, dict(zip(attribute_names, attributes)))
+            for (start, end), attributes in zip(kept_edges, kept_attributes)
+        ]
+
     def save_fwg(self) -> None:
         """
         Saves the Flood Wave Graph.
         """
+        if self.shard_partition is not None:
+            FWGShardStore(data_folder_path=self.data_folder_path).save(
+                fwg=self.fwg_if.flood_wave_graph, time_resolution=self.fwg_if.time_resolution,
+                partition=self.shard_partition
+            )
+            return
+
         GeneratedDataLoader.save_pickle(
             graph=self.fwg_if.flood_wave_graph,
             data_folder_path=self.data_folder_path,
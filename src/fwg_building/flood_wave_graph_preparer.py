@@ -1,10 +1,11 @@
-import datetime
-from itertools import product
+from itertools import repeat
 
+import numpy as np
 import pandas as pd
 
 from src.data_handling.data_interface import DataInterface
 from src.fwg_building.fwg_preparer_data_interface import FWGPreparerDataInterface
+from src.profiling.stage_profiler import StageProfiler
 from src.wng_building.station_river_data_interface import StationRiverDataInterface
 
 
@@ -13,112 +14,197 @@ class FloodWaveGraphPreparer:
     Class for finding the nodes and edges of the Flood Wave Graph.
     """
     def __init__(self, data_if: DataInterface , station_river_data_if: StationRiverDataInterface,
-                 beta: int, delta: int):
+                 beta, delta):
         """
         Constructor.
         :param DataInterface data_if: a DataInterface instance
         :param StationRiverDataInterface station_river_data_if: a StationRiverDataInterface instance
-        :param int beta: hyperparameter for setting the maximal allowed time difference (in days)
-        between two connected nodes
-        :param int delta: hyperparameter for setting the lengths of the time intervals in which
-        we are looking for a peak value
+        :param beta: hyperparameter for setting the maximal allowed time difference between two
+        connected nodes. Either a number of time steps (days for daily data) or a duration
+        like '3D' or '36h'.
+        :param delta: hyperparameter for setting the lengths of the time intervals in which
+        we are looking for a peak value. Either a number of time steps or a duration.
         """
         self.time_series_data = data_if.time_series_data
         self.completed_rivers = station_river_data_if.completed_rivers
-        self.beta = beta
-        self.delta = delta
+        self.time_resolution = data_if.time_resolution
+        self.beta = self.time_resolution.to_steps(beta)
+        self.delta = self.time_resolution.to_steps(delta)
+
+        # integer time steps and node time keys of the rows of the time series
+        self.time_steps = self.time_resolution.to_step_array(self.time_series_data.index)
+        self.time_keys = self.time_resolution.encode(self.time_steps)
 
         self.preparer_if = FWGPreparerDataInterface()
 
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'delta_peaks': int(self.preparer_if.delta_peaks.values.sum()),
+        'edges': len(self.preparer_if.edges)
+    })
     def run(self) -> None:
         """
         Run function. Finds delta peaks and edges and saves them into the member variables
         of the interface.
         """
         delta_peak_bools = self.find_delta_peaks()
+        edges, edge_attributes = self.find_edges_and_attributes(delta_peak_bools=delta_peak_bools)
         data = {
             'delta_peaks': delta_peak_bools,
-            'edges': self.find_edges(delta_peak_bools=delta_peak_bools)
+            'edges': edges,
+            'edge_attributes': edge_attributes,
+            'river_names': list(self.completed_rivers),
+            'time_resolution': self.time_resolution
         }
 
         self.preparer_if = FWGPreparerDataInterface(data=data)
 
     def find_delta_peaks(self) -> pd.DataFrame:
         """
-        Finds delta-peaks using pandas.
+        Finds delta-peaks using numpy. A value is a delta-peak if it is greater than the previous
+        delta values and not less than the next delta values. Missing values and the first and last
+        delta rows are never delta-peaks.
         :return pd.DataFrame: Data frame containing True and False values. True means delta-peak,
         False means not delta-peak.
         """
-        peaks = pd.DataFrame(
-            True,
-            index=self.time_series_data.index,
-            columns=self.time_series_data.columns
-        )
+        values = self.time_series_data.to_numpy(dtype=np.float64, na_value=np.nan)
 
-        for i in range(-self.delta, 0):
-            peaks = peaks * (self.time_series_data >= self.time_series_data.shift(i))
+        peaks = np.ones(values.shape, dtype=bool)
         for i in range(1, self.delta + 1):
-            peaks = peaks * (self.time_series_data > self.time_series_data.shift(i))
+            peaks[:-i] &= values[:-i] >= values[i:]
+            peaks[-i:] = False
+            peaks[i:] &= values[i:] > values[:-i]
+            peaks[:i] = False
 
-        peaks.fillna(value=False, inplace=True)
-
-        return peaks
+        return pd.DataFrame(
+            peaks,
+            index=self.time_series_data.index,
+            columns=self.time_series_data.columns
+        )
 
     def find_edges(self, delta_peak_bools: pd.DataFrame) -> list:
         """
-        Finds all edges of the FWG.
+        Finds all edges of the FWG without their attributes.
         :param pd.DataFrame delta_peak_bools: delta-peaks data frame
         :return list: all edges in a list
         """
+        return self.find_edges_and_attributes(
+            delta_peak_bools=delta_peak_bools, do_compute_attributes=False
+        )[0]
+
+    def find_edges_and_attributes(self, delta_peak_bools: pd.DataFrame,
+                                  do_compute_attributes: bool = True) -> tuple:
+        """
+        Finds all edges of the FWG together with their attributes, computed in the same pass as
+        parallel arrays:
+        - 'lag': number of time steps between the start and end nodes (at most beta)
+        - 'level_difference': water level of the end node minus water level of the start node
+        - 'river': index of the completed river of the edge in the list of completed rivers
+        :param pd.DataFrame delta_peak_bools: delta-peaks data frame
+        :param bool do_compute_attributes: False if only the edges are needed
+        :return tuple: all edges in a list, dictionary of the attribute arrays aligned with the
+        edges (None if do_compute_attributes is False)
+        """
         all_edges = []
-        for completed_river_name in self.completed_rivers:
+        lags = []
+        level_differences = []
+        river_ids = []
+        for river_id, completed_river_name in enumerate(self.completed_rivers):
             completed_river = self.completed_rivers[completed_river_name]
             peaks_along_completed_river = delta_peak_bools[completed_river]
 
-            edges_along_completed_river = self.find_edges_along_completed_river(
-                completed_river=completed_river,
-                peaks=peaks_along_completed_river
-            )
-
-            all_edges.extend(edges_along_completed_river)
+            for start, end, start_rows, end_rows in self.find_edge_rows_along_completed_river(
+                    completed_river=completed_river, peaks=peaks_along_completed_river
+            ):
+                start_levels = self.get_levels(station=start, rows=start_rows)
+                end_levels = self.get_levels(station=end, rows=end_rows)
+                start_nodes = self.create_nodes(station=start, rows=start_rows, levels=start_levels)
+                end_nodes = self.create_nodes(station=end, rows=end_rows, levels=end_levels)
+                all_edges.extend(zip(start_nodes, end_nodes))
+
+                if do_compute_attributes:
+                    lags.append(self.time_steps[end_rows] - self.time_steps[start_rows])
+                    level_differences.append(end_levels - start_levels)
+                    river_ids.append(np.full(len(start_rows), river_id, dtype=np.int64))
+
+        if not do_compute_attributes:
+            return all_edges, None
+
+        edge_attributes = {
+            'lag': np.concatenate(lags).astype(np.int64) if lags
+            else np.array([], dtype=np.int64),
+            'level_difference': np.concatenate(level_differences) if level_differences
+            else np.array([], dtype=np.int64),
+            'river': np.concatenate(river_ids) if river_ids else np.array([], dtype=np.int64)
+        }
 
-        return all_edges
+        return all_edges, edge_attributes
 
-    def find_edges_along_completed_river(self, completed_river: list, peaks: pd.DataFrame) -> list:
+    def find_edge_rows_along_completed_river(self, completed_river: list,
+                                             peaks: pd.DataFrame) -> list:
         """
-        Finds edges along a single completed river.
+        Finds the row pairs of the edges between the consecutive stations of a completed river.
         :param list completed_river: sorted list of stations in the completed river
         :param pd.DataFrame peaks: delta-peak data frame
-        :return list: edges along the completed river
+        :return list: list of (start station, end station, start rows, end rows) tuples
         """
-        final_edges = []
+        edge_rows = []
         for start, end in zip(completed_river[:-1], completed_river[1:]):
-            start_dates = peaks[start].loc[peaks[start]].index
-            end_dates = peaks[end].loc[peaks[end]].index
-            for date in start_dates:
-                # condition for being an edge
-                filtered_ends = end_dates[
-                    (date <= end_dates) & \
-                    (end_dates <= date + datetime.timedelta(days=self.beta))
-                    ]
-                filtered_ends_datetime = pd.Series(filtered_ends).apply(
-                    lambda x: datetime.datetime.strftime(x, "%Y-%m-%d")
-                )
-                date_datetime = datetime.datetime.strftime(date, "%Y-%m-%d")
-
-                # final structure of edges
-                water_level_at_start_node = int(self.time_series_data[start].loc[date_datetime])
-                start_node = [(start, date_datetime, water_level_at_start_node)]
-                water_levels_at_end_nodes = list(map(
-                    int,
-                    list(self.time_series_data[end].loc[filtered_ends_datetime].values)
-                ))
-                end_nodes = [(end, bi, ci) for bi, ci in zip(filtered_ends_datetime, water_levels_at_end_nodes)]
-
-                edges = list(product(
-                    start_node, end_nodes
-                ))
-
-                final_edges.extend(edges)
-
-        return final_edges
+            start_rows, end_rows = self.find_edge_rows(
+                start_peaks=peaks[start].to_numpy(dtype=bool),
+                end_peaks=peaks[end].to_numpy(dtype=bool)
+            )
+            edge_rows.append((start, end, start_rows, end_rows))
+
+        return edge_rows
+
+    def find_edge_rows(self, start_peaks: np.ndarray, end_peaks: np.ndarray) -> tuple:
+        """
+        Finds the row pairs of the edges between two stations with binary searches.
+        :param np.ndarray start_peaks: delta-peak booleans of the start station
+        :param np.ndarray end_peaks: delta-peak booleans of the end station
+        :return tuple: rows of the start nodes and rows of the end nodes of the edges
+        """
+        start_peak_rows = np.flatnonzero(start_peaks)
+        end_peak_rows = np.flatnonzero(end_peaks)
+        end_peak_steps = self.time_steps[end_peak_rows]
+        start_peak_steps = self.time_steps[start_peak_rows]
+
+        lower = np.searchsorted(end_peak_steps, start_peak_steps, side='left')
+        upper = np.searchsorted(end_peak_steps, start_peak_steps + self.beta, side='right')
+        counts = upper - lower
+
+        start_rows = np.repeat(start_peak_rows, counts)
+        end_positions = (
+            np.repeat(lower - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        )
+
+        return start_rows, end_peak_rows[end_positions]
+
+    def create_nodes(self, station: str, rows: np.ndarray, levels: np.ndarray = None) -> list:
+        """
+        Creates the (reg_number, time_key, water_level) nodes of a station in the given rows.
+        :param str station: reg-number of the station
+        :param np.ndarray rows: row indices
+        :param np.ndarray levels: water levels of the station in the given rows, read from the
+        time series data if None
+        :return list: list of nodes
+        """
+        if levels is None:
+            levels = self.get_levels(station=station, rows=rows)
+
+        return list(zip(
+            repeat(station),
+            self.time_keys[rows].tolist(),
+            levels.tolist()
+        ))
+
+    def get_levels(self, station: str, rows: np.ndarray) -> np.ndarray:
+        """
+        Returns the water levels of a station in the given rows as in the nodes.
+        :param str station: reg-number of the station
+        :param np.ndarray rows: row indices
+        :return np.ndarray: integer water levels
+        """
+        levels = self.time_series_data[station].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        return levels[rows].astype(np.int64)
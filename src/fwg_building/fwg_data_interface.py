@@ -1,5 +1,7 @@
 import networkx as nx
 
+from src.data_handling.time_resolution import TimeResolution
+
 
 class FWGDataInterface:
     """
@@ -7,6 +9,12 @@ class FWGDataInterface:
     """
     def __init__(self):
         """
-        Constructor. The only member variable is fwg.
+        Constructor. The member variables are the Flood Wave Graph, the time resolution
+        describing the time keys of its nodes, the node index of the graph (FWGNodeIndex, built
+        at the first selection) and the version of the graph, increased whenever the graph is
+        rebuilt (cached selections of older versions are not reused).
         """
         self.flood_wave_graph = nx.DiGraph()
+        self.time_resolution = TimeResolution()
+        self.node_index = None
+        self.version = 0
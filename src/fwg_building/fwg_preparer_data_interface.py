@@ -1,5 +1,7 @@
 import pandas as pd
 
+from src.data_handling.time_resolution import TimeResolution
+
 
 class FWGPreparerDataInterface:
     """
@@ -12,9 +14,20 @@ class FWGPreparerDataInterface:
         represent the data structures. The expected keys are
         - 'delta_peaks'
         - 'edges'
+        - 'edge_attributes': dictionary of the 'lag', 'level_difference' and 'river' arrays
+        aligned with the edges (see FloodWaveGraphPreparer.find_edges_and_attributes)
+        - 'river_names': names of the completed rivers, indexed by the 'river' edge attribute
+        - 'time_resolution'
+        - 'edges_file': keyword arguments of GeneratedDataLoader.iter_pickle if the edges were
+        written to disk in blocks instead of being kept in memory, every block is a dictionary
+        with 'edges' and 'edge_attributes' keys
         """
         self.delta_peaks = pd.DataFrame()
         self.edges = []
+        self.edge_attributes = None
+        self.river_names = []
+        self.edges_file = None
+        self.time_resolution = TimeResolution()
 
         if data is not None:
             for key, value in data.items():
@@ -0,0 +1,154 @@
+import os
+
+import networkx as nx
+import numpy as np
+
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.data_handling.time_resolution import TimeResolution
+from src.fwg_building.fwg_data_interface import FWGDataInterface
+
+
+class FWGShardStore:
+    """
+    Class for storing the Flood Wave Graph in time shards. The nodes are partitioned by calendar
+    year or by hydrological year (from 1 November to 31 October, named after the year in which it
+    ends), every shard holds its nodes with all their outgoing edges, hence an edge crossing two
+    shards is stored in the shard of its source. The shards are members of one zip bundle (see
+    GeneratedDataLoader.save_bundle) together with a manifest of their time ranges, so a shard is
+    read without reading the others.
+
+    The loaded shards are merged into the graph of self.fwg_data_if, which can be passed to the
+    selectors: before filtering, a selector loads the shards overlapping its time window (see
+    FWGSelectorBase), hence a query reads only the part of the record it needs.
+    """
+    partitions = ['year', 'hydrological_year']
+
+    def __init__(self, data_folder_path: str, folder_name: str = 'flood_wave_graph',
+                 file_name: str = 'fwg_shards'):
+        """
+        Constructor.
+        :param str data_folder_path: path of the data folder
+        :param str folder_name: name of the folder inside the generated folder
+        :param str file_name: name of the bundle without extension
+        """
+        self.data_folder_path = data_folder_path
+        self.folder_name = folder_name
+        self.file_name = file_name
+
+        # keys are shard names, values are the first and last time steps of the shard nodes
+        self.manifest = None
+        self.loaded_shard_names = set()
+        self.fwg_data_if = FWGDataInterface()
+
+    def save(self, fwg: nx.DiGraph, time_resolution: TimeResolution,
+             partition: str = 'hydrological_year') -> None:
+        """
+        Partitions the Flood Wave Graph and saves the shards.
+        :param nx.DiGraph fwg: the Flood Wave Graph
+        :param TimeResolution time_resolution: the time resolution of the nodes
+        :param str partition: 'year' or 'hydrological_year'
+        """
+        if partition not in self.partitions:
+            raise ValueError(f'Unknown partition: {partition}')
+
+        nodes = list(fwg.nodes)
+        steps = time_resolution.decode([node[1] for node in nodes])
+        timestamps = time_resolution.to_timestamps(steps)
+        years = timestamps.year.to_numpy()
+        if partition == 'hydrological_year':
+            years = years + (timestamps.month.to_numpy() >= 11)
+
+        shards = {}
+        manifest = {}
+        for year in np.unique(years).tolist():
+            is_in_shard = years == year
+            shard_nodes = [node for node, is_in in zip(nodes, is_in_shard.tolist()) if is_in]
+            shard = nx.DiGraph()
+            shard.add_nodes_from(shard_nodes)
+            shard.add_edges_from(fwg.out_edges(shard_nodes, data=True))
+
+            shards[str(year)] = shard
+            manifest[str(year)] = (int(steps[is_in_shard].min()), int(steps[is_in_shard].max()))
+
+        GeneratedDataLoader.save_bundle(
+            data={
+                'manifest': {'shards': manifest, 'time_resolution': time_resolution,
+                             'partition': partition},
+                **{f'shard_{name}': shard for name, shard in shards.items()}
+            },
+            data_folder_path=self.data_folder_path,
+            folder_name=self.folder_name, file_name=self.file_name
+        )
+
+    def exists(self) -> bool:
+        """
+        :return bool: True if the shards were saved
+        """
+        return os.path.exists(os.path.join(
+            self.data_folder_path, 'generated', self.folder_name, f'{self.file_name}.zip'
+        ))
+
+    def read_manifest(self) -> dict:
+        """
+        Reads the manifest at the first call, sets the time resolution of self.fwg_data_if.
+        :return dict: keys are shard names, values are the first and last time steps
+        """
+        if self.manifest is None:
+            manifest = GeneratedDataLoader.read_bundle(
+                data_folder_path=self.data_folder_path, folder_name=self.folder_name,
+                file_name=self.file_name, member_names=['manifest']
+            )['manifest']
+            self.manifest = manifest['shards']
+            self.fwg_data_if.time_resolution = manifest['time_resolution']
+
+        return self.manifest
+
+    def get_shard_names(self, start_key, end_key) -> list:
+        """
+        :param start_key: the first time key (inclusive)
+        :param end_key: the last time key (inclusive)
+        :return list: names of the shards having nodes between the time keys
+        """
+        manifest = self.read_manifest()
+        start_step, end_step = self.fwg_data_if.time_resolution.decode([start_key, end_key])
+
+        return [name for name, (first_step, last_step) in manifest.items()
+                if first_step <= end_step and start_step <= last_step]
+
+    def load(self, temporal_filtering: dict = None) -> FWGDataInterface:
+        """
+        Loads the shards overlapping a time window which are not loaded yet and merges them into
+        the graph of self.fwg_data_if. If a shard is loaded, the version of the graph is increased
+        and its node index is dropped.
+        :param dict temporal_filtering: {'start_date': start_date, 'end_date': end_date}, every
+        shard is loaded if None
+        :return FWGDataInterface: self.fwg_data_if
+        """
+        manifest = self.read_manifest()
+        if temporal_filtering is None:
+            shard_names = list(manifest)
+        else:
+            time_resolution = self.fwg_data_if.time_resolution
+            shard_names = self.get_shard_names(
+                start_key=time_resolution.to_key(temporal_filtering['start_date']),
+                end_key=time_resolution.to_key(temporal_filtering['end_date'])
+            )
+
+        shard_names = [name for name in shard_names if name not in self.loaded_shard_names]
+        if not shard_names:
+            return self.fwg_data_if
+
+        shards = GeneratedDataLoader.read_bundle(
+            data_folder_path=self.data_folder_path, folder_name=self.folder_name,
+            file_name=self.file_name, member_names=[f'shard_{name}' for name in shard_names]
+        )
+        fwg = self.fwg_data_if.flood_wave_graph
+        for shard in shards.values():
+            fwg.add_nodes_from(shard.nodes(data=True))
+            fwg.add_edges_from(shard.edges(data=True))
+
+        self.loaded_shard_names.update(shard_names)
+        self.fwg_data_if.node_index = None
+        self.fwg_data_if.version += 1
+
+        return self.fwg_data_if
@@ -0,0 +1,431 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from src.analysis.dynamic.wng_path_fwg_selector import WNGPathFWGSelector
+from src.analysis.dynamic.wng_sink_fwg_selector import WNGSinkFWGSelector
+from src.analysis.static.flood_wave_analyser import FloodWaveAnalyser
+from src.analysis.static.flood_wave_extractor import FloodWaveExtractor
+from src.analysis.static.flood_wave_extractor_interface import FloodWaveExtractorInterface
+from src.analysis.static.streaming_flood_wave_analyser import StreamingFloodWaveAnalyser
+from src.data_handling.data_handler import DataHandler
+from src.data_handling.data_interface import DataInterface
+from src.data_handling.dataloader import DataLoader
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.data_handling.time_resolution import TimeResolution
+from src.fwg_building.flood_wave_graph_builder import FloodWaveGraphBuilder
+from src.fwg_building.flood_wave_graph_preparer import FloodWaveGraphPreparer
+from src.fwg_building.fwg_data_interface import FWGDataInterface
+from src.fwg_building.fwg_preparer_data_interface import FWGPreparerDataInterface
+from src.fwg_building.fwg_shard_store import FWGShardStore
+from src.profiling.stage_profiler import StageProfiler
+from src.wng_building.station_river_creator import StationRiverCreator
+from src.wng_building.station_river_data_interface import StationRiverDataInterface
+from src.wng_building.water_network_graph_builder import WaterNetworkGraphBuilder
+from src.wng_building.wng_data_interface import WNGDataInterface
+
+
+def run_pipeline_stage(pipeline_runner_class: type, config: dict, stage: str, inputs: dict,
+                       profiler_settings: tuple) -> tuple:
+    """
+    Runs a stage of the pipeline in a worker process.
+    :param type pipeline_runner_class: PipelineRunner or a child class of it
+    :param dict config: the config of the pipeline
+    :param str stage: name of the stage
+    :param dict inputs: the artifacts of the dependencies of the stage
+    :param tuple profiler_settings: is_enabled and do_trace_memory of StageProfiler in the
+    parent process
+    :return tuple: the artifact and the StageProfiler records of the stage
+    """
+    # a forked worker inherits the records of the parent process
+    StageProfiler.reset()
+    is_enabled, do_trace_memory = profiler_settings
+    if is_enabled:
+        StageProfiler.enable(do_trace_memory=do_trace_memory)
+
+    pipeline_runner = pipeline_runner_class(config=config)
+    artifact = getattr(pipeline_runner, f'run_{stage}')(**inputs)
+
+    return artifact, StageProfiler.records
+
+
+class PipelineRunner:
+    """
+    Class for running the whole pipeline from a config dictionary. The artifact of every stage is
+    checkpointed into the generated/pipeline_checkpoints folder, hence a failed run can be resumed
+    from the last completed stage. Stages whose inputs are ready run concurrently in worker
+    processes, e.g. the building of the Water Network Graph and the preparation of the Flood Wave
+    Graph. The inputs and the artifacts of the stages are sent between the processes as pickles,
+    just like they are checkpointed.
+    """
+    folder_name = 'pipeline_checkpoints'
+    state_file_name = 'pipeline_state'
+    dependencies = {
+        'data': [],
+        'station_rivers': ['data'],
+        'wng': ['station_rivers'],
+        'fwg_preparation': ['data', 'station_rivers'],
+        'fwg': ['fwg_preparation'],
+        'selection': ['fwg', 'wng'],
+        'extraction': ['data', 'selection'],
+        'analysis': ['data', 'extraction']
+    }
+    selector_classes = {
+        'wng_path': WNGPathFWGSelector,
+        'wng_sink': WNGSinkFWGSelector
+    }
+
+    def __init__(self, config: dict, do_restart: bool = False):
+        """
+        Constructor.
+        :param dict config: the config of the pipeline, for example
+        {
+            'data_folder_path': '/path/to/data',
+            'time_resolution': {'freq': 'D'},
+            'beta': 3,
+            'delta': 2,
+            'selector': {
+                'type': 'wng_path',
+                'temporal_filtering': {'start_date': '2016-02-01', 'end_date': '2016-02-15'},
+                'spatial_filtering': {'source': '1514', 'target': '1520', 'through': []},
+                'do_remove_water_levels': False
+            },
+            'is_equivalence_applied': True,
+            'do_save_flood_waves': False,
+            'wave_file_format': 'json',
+            'do_save_results': False,
+            'max_workers': 2
+        }
+        The 'selector' key is optional (type 'wng_sink' needs {'sink': reg_number} as spatial
+        filtering), without it the whole FWG is used. If 'do_save_fwg' is True, the FWG is saved
+        into one pickle file, or in time shards if 'fwg_shard_partition' is 'year' or
+        'hydrological_year' (see FWGShardStore). With 'fwg_max_lag', the edges with a larger lag
+        than it are left out of the FWG (see FloodWaveGraphBuilder).
+        :param bool do_restart: True if the existing checkpoints are ignored
+        """
+        self.config = config
+        self.do_restart = do_restart
+        self.data_folder_path = config['data_folder_path']
+        self.config_hash = hashlib.sha256(
+            json.dumps(config, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+        self.artifacts = {}
+        self.completed_stages = []
+        # stages executed (not loaded from a checkpoint) in this run
+        self.executed_stages = []
+
+    def run(self) -> dict:
+        """
+        Run function. Runs the stages that are not checkpointed yet, at most max_workers
+        at the same time.
+        :return dict: the statistical results of FloodWaveAnalyser
+        """
+        self.completed_stages = [] if self.do_restart else self.read_state()
+        pending_stages = [
+            stage for stage in self.dependencies if stage not in self.completed_stages
+        ]
+
+        # the first exception of a stage, no new stage is started after it
+        error = None
+        start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        profiler_settings = (StageProfiler.is_enabled, StageProfiler.do_trace_memory)
+        with ProcessPoolExecutor(
+                max_workers=self.config.get('max_workers', 2),
+                mp_context=multiprocessing.get_context(start_method)
+        ) as executor:
+            running_stages = {}
+            while (pending_stages and error is None) or running_stages:
+                for stage in list(pending_stages if error is None else []):
+                    if all(dependency in self.completed_stages
+                           for dependency in self.dependencies[stage]):
+                        inputs = {dependency: self.get_artifact(stage=dependency)
+                                  for dependency in self.dependencies[stage]}
+                        future = executor.submit(
+                            run_pipeline_stage, type(self), self.config, stage, inputs,
+                            profiler_settings
+                        )
+                        running_stages[future] = stage
+                        pending_stages.remove(stage)
+
+                done, _ = wait(running_stages, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running_stages.pop(future)
+                    try:
+                        artifact, profiler_records = future.result()
+                    except Exception as exception:
+                        error = exception if error is None else error
+                        continue
+                    StageProfiler.records.extend(profiler_records)
+                    # the stages running besides a failed one are finished and checkpointed too
+                    self.artifacts[stage] = artifact
+                    self.executed_stages.append(stage)
+                    self.save_checkpoint(stage=stage)
+
+        if error is not None:
+            raise error
+
+        return self.get_artifact(stage='analysis')
+
+    def run_data(self) -> DataInterface:
+        """
+        Loads the data and runs DataHandler.
+        :return DataInterface: the DataInterface instance
+        """
+        dl = DataLoader(data_folder_path=self.data_folder_path)
+        data_handler = DataHandler(
+            dl=dl, time_resolution=TimeResolution(**self.config.get('time_resolution', {}))
+        )
+
+        return data_handler.data_if
+
+    @staticmethod
+    def run_station_rivers(data: DataInterface) -> StationRiverDataInterface:
+        """
+        Runs StationRiverCreator.
+        :param DataInterface data: artifact of the 'data' stage
+        :return StationRiverDataInterface: the StationRiverDataInterface instance
+        """
+        station_river_creator = StationRiverCreator(data_if=data)
+        station_river_creator.run()
+
+        return station_river_creator.station_river_if
+
+    def run_wng(self, station_rivers: StationRiverDataInterface) -> WNGDataInterface:
+        """
+        Runs WaterNetworkGraphBuilder.
+        :param StationRiverDataInterface station_rivers: artifact of the 'station_rivers' stage
+        :return WNGDataInterface: the WNGDataInterface instance
+        """
+        wng_builder = WaterNetworkGraphBuilder(
+            station_river_if=station_rivers,
+            do_save_all=self.config.get('do_save_wng', False),
+            data_folder_path=self.data_folder_path
+        )
+        wng_builder.run()
+
+        return wng_builder.wng_if
+
+    def run_fwg_preparation(self, data: DataInterface,
+                            station_rivers: StationRiverDataInterface) -> FWGPreparerDataInterface:
+        """
+        Runs FloodWaveGraphPreparer, i.e. the peak detection and the edge finding.
+        :param DataInterface data: artifact of the 'data' stage
+        :param StationRiverDataInterface station_rivers: artifact of the 'station_rivers' stage
+        :return FWGPreparerDataInterface: the FWGPreparerDataInterface instance
+        """
+        fwg_preparer = FloodWaveGraphPreparer(
+            data_if=data, station_river_data_if=station_rivers,
+            beta=self.config['beta'], delta=self.config['delta']
+        )
+        fwg_preparer.run()
+
+        return fwg_preparer.preparer_if
+
+    def run_fwg(self, fwg_preparation: FWGPreparerDataInterface) -> FWGDataInterface:
+        """
+        Runs FloodWaveGraphBuilder.
+        :param FWGPreparerDataInterface fwg_preparation: artifact of the 'fwg_preparation' stage
+        :return FWGDataInterface: the FWGDataInterface instance
+        """
+        fwg_builder = FloodWaveGraphBuilder(
+            preparer_interface=fwg_preparation,
+            do_save_fwg=self.config.get('do_save_fwg', False),
+            data_folder_path=self.data_folder_path,
+            shard_partition=self.config.get('fwg_shard_partition'),
+            max_lag=self.config.get('fwg_max_lag')
+        )
+        fwg_builder.run()
+
+        return fwg_builder.fwg_if
+
+    def run_selection(self, fwg: FWGDataInterface, wng: WNGDataInterface) -> dict:
+        """
+        Runs the selector given in the config.
+        :param FWGDataInterface fwg: artifact of the 'fwg' stage
+        :param WNGDataInterface wng: artifact of the 'wng' stage
+        :return dict: the filtered FWG and WNG, None if there is no selector in the config (the
+        whole graphs are not checkpointed twice, see run_extraction)
+        """
+        selector_config = self.config.get('selector')
+        if selector_config is None:
+            return None
+
+        selector = self.selector_classes[selector_config['type']](
+            data_folder_path=self.data_folder_path,
+            fwg_data_if=fwg, wng_data_if=wng,
+            do_remove_water_levels=selector_config.get('do_remove_water_levels', False)
+        )
+        selector.run(
+            temporal_filtering=selector_config['temporal_filtering'],
+            spatial_filtering=selector_config['spatial_filtering']
+        )
+
+        return {'fwg_subgraph': selector.fwg_subgraph, 'wng_subgraph': selector.wng_subgraph}
+
+    def run_extraction(self, data: DataInterface,
+                       selection: dict) -> FloodWaveExtractorInterface:
+        """
+        Runs FloodWaveExtractor on the filtered graphs.
+        :param DataInterface data: artifact of the 'data' stage
+        :param dict selection: artifact of the 'selection' stage, the whole FWG and WNG are read
+        from the artifacts of the 'fwg' and 'wng' stages if it is None
+        :return FloodWaveExtractorInterface: the FloodWaveExtractorInterface instance
+        """
+        if selection is None:
+            selection = {
+                'fwg_subgraph': self.get_artifact(stage='fwg').flood_wave_graph,
+                'wng_subgraph': self.get_artifact(stage='wng').water_network_graph
+            }
+
+        extractor = FloodWaveExtractor(
+            fwg=selection['fwg_subgraph'], wng=selection['wng_subgraph'],
+            data_if=data,
+            is_equivalence_applied=self.config.get('is_equivalence_applied', True),
+            do_save_flood_waves=self.config.get('do_save_flood_waves', False),
+            data_folder_path=self.data_folder_path,
+            wave_file_format=self.config.get('wave_file_format', 'json')
+        )
+        extractor.run()
+
+        return extractor.extractor_if
+
+    def run_analysis(self, data: DataInterface, extraction: FloodWaveExtractorInterface) -> dict:
+        """
+        Runs FloodWaveAnalyser, or StreamingFloodWaveAnalyser if 'do_stream_statistics' is True
+        in the config (with the optional 'quantile_relative_accuracy' and 'quantiles' keys).
+        :param DataInterface data: artifact of the 'data' stage
+        :param FloodWaveExtractorInterface extraction: artifact of the 'extraction' stage
+        :return dict: the statistical results
+        """
+        if not extraction.flood_waves:
+            return {'number_of_flood_waves': 0}
+
+        if self.config.get('do_stream_statistics', False):
+            streaming_analyser = StreamingFloodWaveAnalyser(
+                data_if=data,
+                is_equivalence_applied=self.config.get('is_equivalence_applied', True),
+                relative_accuracy=self.config.get('quantile_relative_accuracy', 0.01),
+                quantiles=self.config.get('quantiles'),
+                do_save_results=self.config.get('do_save_results', False),
+                data_folder_path=self.data_folder_path
+            )
+            return streaming_analyser.run(extractor_if=extraction)
+
+        analyser = FloodWaveAnalyser(
+            extractor_if=extraction, data_if=data,
+            is_equivalence_applied=self.config.get('is_equivalence_applied', True),
+            do_save_results=self.config.get('do_save_results', False),
+            data_folder_path=self.data_folder_path
+        )
+
+        return analyser.run()
+
+    def get_query_inputs(self) -> dict:
+        """
+        Collects the inputs of QueryExecutor and BatchQueryRunner after running the pipeline.
+        If the FWG was saved in shards ('do_save_fwg' and 'fwg_shard_partition' in the config),
+        a shard store is returned instead of the FWG, hence the FWG checkpoint is not read.
+        :return dict: the keyword arguments data_if, fwg_data_if, wng_data_if and shard_store
+        """
+        shard_store = None
+        if self.config.get('fwg_shard_partition') is not None:
+            shard_store = FWGShardStore(data_folder_path=self.data_folder_path)
+            if not shard_store.exists():
+                shard_store = None
+
+        return {
+            'data_if': self.get_artifact(stage='data'),
+            'fwg_data_if': None if shard_store is not None else self.get_artifact(stage='fwg'),
+            'wng_data_if': self.get_artifact(stage='wng'),
+            'shard_store': shard_store
+        }
+
+    def get_artifact(self, stage: str):
+        """
+        Returns the artifact of a completed stage, reads it from its checkpoint if needed.
+        :param str stage: name of the stage
+        :return: the artifact
+        """
+        if stage not in self.artifacts:
+            self.artifacts[stage] = GeneratedDataLoader.read_pickle(
+                data_folder_path=self.data_folder_path,
+                folder_name=self.folder_name,
+                file_name=stage
+            )
+
+        return self.artifacts[stage]
+
+    def save_checkpoint(self, stage: str) -> None:
+        """
+        Saves the artifact of a stage, then marks the stage as completed in the state file. Both
+        files are written atomically, hence a crash never leaves a corrupt checkpoint behind.
+        :param str stage: name of the stage
+        """
+        folder_path = os.path.join(self.data_folder_path, 'generated', self.folder_name)
+        os.makedirs(folder_path, exist_ok=True)
+
+        with GeneratedDataLoader.atomic_write(os.path.join(folder_path, f'{stage}.pkl')) as f:
+            pickle.dump(self.artifacts[stage], f)
+
+        self.completed_stages.append(stage)
+        GeneratedDataLoader.save_json(
+            data={'config_hash': self.config_hash, 'completed_stages': self.completed_stages},
+            data_folder_path=self.data_folder_path,
+            subfolder_names=[self.folder_name],
+            file_name=self.state_file_name
+        )
+
+    def read_state(self) -> list:
+        """
+        Reads the completed stages of an earlier run with the same config.
+        :return list: the completed stages, empty if there is no state file or the config changed
+        """
+        state_path = os.path.join(
+            self.data_folder_path, 'generated', self.folder_name, f'{self.state_file_name}.json'
+        )
+        if not os.path.exists(state_path):
+            return []
+
+        state = GeneratedDataLoader.read_json(
+            data_folder_path=self.data_folder_path,
+            subfolder_names=[self.folder_name],
+            file_name=self.state_file_name
+        )
+        if state['config_hash'] != self.config_hash:
+            return []
+
+        return state['completed_stages']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the flood wave pipeline from a config file.')
+    parser.add_argument('config', help='path of the JSON config file')
+    parser.add_argument('--restart', action='store_true',
+                        help='ignore the checkpoints of earlier runs')
+    parser.add_argument('--profile', default=None,
+                        help='path of a JSON file for the timing and memory report of the stages')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+
+    if args.profile is not None:
+        StageProfiler.enable()
+
+    pipeline_runner = PipelineRunner(config=config, do_restart=args.restart)
+    statistical_results = pipeline_runner.run()
+
+    if args.profile is not None:
+        StageProfiler.disable()
+        StageProfiler.save_report(file_path=args.profile)
+
+    print(json.dumps(statistical_results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
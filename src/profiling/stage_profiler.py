@@ -0,0 +1,170 @@
+import functools
+import json
+import threading
+import time
+import tracemalloc
+
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class StageProfiler:
+    """
+    Class for the opt-in instrumentation of the pipeline stages. The run functions of the
+    pipeline classes are decorated with StageProfiler.profile_stage. While the profiler is
+    disabled (default) the decorated functions are called directly. While it is enabled, the wall
+    time, the CPU time, the peak memory allocated during the stage (tracemalloc, optional), the
+    peak RSS of the process and the item counts (nodes, edges, waves, ...) of every stage are
+    recorded. The nesting of the stages is tracked per thread, but tracemalloc and the RSS are
+    process-wide, hence the memory of concurrently running stages overlaps.
+    """
+    is_enabled = False
+    do_trace_memory = False
+    records = []
+    # per thread: the number of running stages and the peak traced memory of the running stages,
+    # used for propagating the peaks of nested stages
+    thread_state = threading.local()
+
+    @classmethod
+    def enable(cls, do_trace_memory: bool = False) -> None:
+        """
+        Enables the profiler.
+        :param bool do_trace_memory: True if the memory allocations are traced with tracemalloc.
+        It slows down the pipeline considerably, hence it is off by default.
+        """
+        cls.is_enabled = True
+        cls.do_trace_memory = do_trace_memory
+
+    @classmethod
+    def disable(cls) -> None:
+        """
+        Disables the profiler. The recorded stages are kept.
+        """
+        cls.is_enabled = False
+        if cls.do_trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Deletes the recorded stages.
+        """
+        cls.records = []
+        cls.thread_state = threading.local()
+
+    @classmethod
+    def get_memory_peak_stack(cls) -> list:
+        """
+        :return list: the peak traced memory of the running stages of the current thread
+        """
+        if not hasattr(cls.thread_state, 'memory_peak_stack'):
+            cls.thread_state.memory_peak_stack = []
+            cls.thread_state.number_of_running_stages = 0
+
+        return cls.thread_state.memory_peak_stack
+
+    @staticmethod
+    def profile_stage(get_counts=None):
+        """
+        Decorator for the run functions of the pipeline classes.
+        :param get_counts: function taking the instance after the stage and returning a dictionary
+        of item counts, e.g. lambda self: {'edges': len(self.edges)}
+        :return: the decorator
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(self, *args, **kwargs):
+                if not StageProfiler.is_enabled:
+                    return function(self, *args, **kwargs)
+
+                return StageProfiler.run_stage(
+                    stage_name=f'{type(self).__name__}.{function.__name__}',
+                    function=functools.partial(function, self, *args, **kwargs),
+                    get_counts=functools.partial(get_counts, self) if get_counts else None
+                )
+
+            return wrapper
+
+        return decorator
+
+    @classmethod
+    def run_stage(cls, stage_name: str, function, get_counts=None):
+        """
+        Runs a stage and records its costs.
+        :param str stage_name: name of the stage
+        :param function: the stage without arguments
+        :param get_counts: function without arguments returning the item counts of the stage
+        :return: the return value of the stage
+        """
+        if cls.do_trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        is_tracing = tracemalloc.is_tracing()
+        memory_peak_stack = cls.get_memory_peak_stack()
+
+        if is_tracing:
+            memory_at_start, memory_peak = tracemalloc.get_traced_memory()
+            if memory_peak_stack:
+                memory_peak_stack[-1] = max(memory_peak_stack[-1], memory_peak)
+            memory_peak_stack.append(memory_at_start)
+            tracemalloc.reset_peak()
+
+        record = {'stage': stage_name, 'depth': cls.thread_state.number_of_running_stages}
+        cls.records.append(record)
+        cls.thread_state.number_of_running_stages += 1
+
+        wall_time_at_start = time.perf_counter()
+        cpu_time_at_start = time.process_time()
+        try:
+            result = function()
+        finally:
+            cls.thread_state.number_of_running_stages -= 1
+            record['wall_time'] = time.perf_counter() - wall_time_at_start
+            record['cpu_time'] = time.process_time() - cpu_time_at_start
+            record['memory_peak'] = None
+            if is_tracing:
+                memory_peak = max(memory_peak_stack.pop(), tracemalloc.get_traced_memory()[1])
+                record['memory_peak'] = memory_peak - memory_at_start
+                if memory_peak_stack:
+                    memory_peak_stack[-1] = max(memory_peak_stack[-1], memory_peak)
+            record['max_rss'] = cls.get_max_rss()
+
+        record['counts'] = get_counts() if get_counts else {}
+
+        return result
+
+    @staticmethod
+    def get_max_rss():
+        """
+        :return int: the peak resident set size of the process in bytes, None if not available
+        """
+        if resource is None:
+            return None
+
+        # kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    @classmethod
+    def get_report(cls) -> dict:
+        """
+        :return dict: the recorded stages and the total wall and CPU time of the top level stages
+        """
+        top_level_records = [record for record in cls.records if record['depth'] == 0]
+
+        return {
+            'stages': cls.records,
+            'total_wall_time': sum(record['wall_time'] for record in top_level_records),
+            'total_cpu_time': sum(record['cpu_time'] for record in top_level_records)
+        }
+
+    @classmethod
+    def save_report(cls, file_path: str) -> None:
+        """
+        Saves the report as JSON.
+        :param str file_path: path of the JSON file
+        """
+        with GeneratedDataLoader.atomic_write(file_path) as f:
+            f.write(json.dumps(cls.get_report(), indent=2).encode())
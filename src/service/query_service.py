@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import networkx as nx
+
+from src.analysis.dynamic.fwg_node_index import FWGNodeIndex
+from src.analysis.dynamic.fwg_query_cache import FWGQueryCache
+from src.analysis.dynamic.query_executor import QueryExecutor
+from src.pipeline.pipeline_runner import PipelineRunner
+
+
+class QueryService:
+    """
+    Class for a local asyncio HTTP service keeping the FWG, the WNG and the node index of the FWG
+    in memory. The endpoints take a query of QueryExecutor as a JSON body:
+    - POST /select: nodes and edges of the selected FWG subgraph and the stations of the WNG
+    subgraph
+    - POST /extract: the flood waves
+    - POST /analyse: the flood waves and the statistical results
+    - POST /plot: the data of the plot preparers
+    - GET /health, GET /stats: status and counters of the service
+    The connections are kept alive (HTTP/1.1), the queries run on a thread pool, so the event loop
+    keeps serving other connections, and the results are kept in an LRU cache. Identical queries
+    arriving at the same time are computed only once.
+    """
+    def __init__(self, query_executor: QueryExecutor, host: str = '127.0.0.1', port: int = 8080,
+                 cache_size: int = 128, cache_bytes: int = None, max_workers: int = 4,
+                 cache: FWGQueryCache = None):
+        """
+        Constructor.
+        :param QueryExecutor query_executor: QueryExecutor of the loaded graphs
+        :param str host: host of the service
+        :param int port: port of the service, 0 for a free port
+        :param int cache_size: maximal number of cached results
+        :param int cache_bytes: maximal estimated size of the cached results, None if unbounded
+        :param int max_workers: number of threads computing the queries
+        :param FWGQueryCache cache: cache of the results, e.g. the cache of query_executor for
+        sharing one budget, None if a new cache is created from cache_size and cache_bytes
+        """
+        self.query_executor = query_executor
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self.operations = {
+            '/select': self.select,
+            '/extract': self.extract,
+            '/analyse': self.analyse,
+            '/plot': self.plot
+        }
+        self.cache = cache if cache is not None else \
+            FWGQueryCache(max_entries=cache_size, max_bytes=cache_bytes)
+        self.pending_results = {}
+        self.stats = {'connections': 0, 'requests': 0}
+        self.server = None
+
+        if query_executor.shard_store is None:
+            # built before serving, the threads only read it
+            FWGNodeIndex.get_node_index(fwg_data_if=query_executor.fwg_data_if)
+
+    def select(self, query: dict) -> dict:
+        selector = self.query_executor.select(query=query)
+
+        return {
+            'nodes': list(selector.fwg_subgraph.nodes),
+            'edges': list(selector.fwg_subgraph.edges),
+            'stations': list(selector.wng_subgraph.nodes)
+        }
+
+    def extract(self, query: dict) -> dict:
+        selector = self.query_executor.select(query=query)
+
+        return {'flood_waves': self.query_executor.extract(query=query, selector=selector)}
+
+    def analyse(self, query: dict) -> dict:
+        return self.query_executor.run(query={**query, 'do_analyse': True})
+
+    def plot(self, query: dict) -> dict:
+        selector = self.query_executor.select(query=query)
+
+        return self.query_executor.prepare_plot(query=query, selector=selector)
+
+    async def start(self) -> None:
+        """
+        Starts listening. If the port was 0, the chosen port is stored in self.port.
+        """
+        self.server = await asyncio.start_server(
+            self.handle_connection, host=self.host, port=self.port
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """
+        Stops listening and waits for the server to close.
+        """
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def serve_forever(self) -> None:
+        """
+        Starts the service and serves until it is cancelled.
+        """
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """
+        Serves the requests of a connection until the client closes it or asks for closing it.
+        :param asyncio.StreamReader reader: reader of the connection
+        :param asyncio.StreamWriter writer: writer of the connection
+        """
+        self.stats['connections'] += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+
+                method, path, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    header_line = await reader.readline()
+                    if header_line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header_line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, payload = await self.handle_request(method=method, path=path, body=body)
+
+                connection = headers.get('connection', '').lower()
+                is_kept_alive = connection == 'keep-alive' or \
+                    (version == 'HTTP/1.1' and connection != 'close')
+                self.write_response(
+                    writer=writer, status=status, payload=payload, is_kept_alive=is_kept_alive
+                )
+                await writer.drain()
+
+                if not is_kept_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def write_response(writer: asyncio.StreamWriter, status: int, payload: dict,
+                       is_kept_alive: bool) -> None:
+        """
+        Writes a JSON response.
+        :param asyncio.StreamWriter writer: writer of the connection
+        :param int status: HTTP status code
+        :param dict payload: the body of the response
+        :param bool is_kept_alive: True if the connection stays open
+        """
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   500: 'Internal Server Error'}
+        body = json.dumps(payload, default=str).encode()
+        head = (
+            f'HTTP/1.1 {status} {reasons[status]}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if is_kept_alive else "close"}\r\n\r\n'
+        )
+        writer.write(head.encode('latin-1') + body)
+
+    async def handle_request(self, method: str, path: str, body: bytes) -> tuple:
+        """
+        Routes a request.
+        :param str method: HTTP method
+        :param str path: path of the request
+        :param bytes body: body of the request
+        :return tuple: HTTP status code and the payload
+        """
+        self.stats['requests'] += 1
+
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            cache_stats = self.cache.get_stats()
+            return 200, {
+                **self.stats,
+                'cache_hits': cache_stats['hits'],
+                'cache_misses': cache_stats['misses'],
+                'cache_entries': cache_stats['entries'],
+                'cache_bytes': cache_stats['bytes']
+            }
+        if path not in self.operations:
+            return 404, {'error': f'Unknown endpoint: {path}'}
+        if method != 'POST':
+            return 405, {'error': 'Queries have to be sent with POST.'}
+
+        try:
+            query = json.loads(body or b'{}')
+            return 200, await self.get_result(path=path, query=query)
+        except (KeyError, ValueError, TypeError, nx.NetworkXException) as error:
+            # unknown selectors or stations, invalid dates and malformed JSON
+            return 400, {'error': f'{type(error).__name__}: {error}'}
+        except Exception as error:
+            # the connection is kept open, the client gets a JSON error as well
+            return 500, {'error': f'{type(error).__name__}: {error}'}
+
+    async def get_result(self, path: str, query: dict) -> dict:
+        """
+        Returns the result of a query from the cache or computes it on the thread pool.
+        :param str path: the endpoint
+        :param dict query: the query
+        :return dict: the result
+        """
+        key = FWGQueryCache.get_key(path, query)
+        result = self.cache.get(key=key)
+        if result is not None:
+            return result
+
+        if key not in self.pending_results:
+            loop = asyncio.get_running_loop()
+            self.pending_results[key] = loop.run_in_executor(
+                self.executor, self.operations[path], query
+            )
+        future = self.pending_results[key]
+        try:
+            result = await future
+        finally:
+            self.pending_results.pop(key, None)
+
+        self.cache.put(key=key, value=result)
+
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve flood wave queries on localhost.')
+    parser.add_argument('config', help='path of the JSON config of the pipeline, see PipelineRunner')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--cache-size', type=int, default=128)
+    parser.add_argument('--cache-bytes', type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+
+    # the graphs are read from the checkpoints of the pipeline if they exist, the FWG is read
+    # shard by shard if it was saved in shards
+    pipeline_runner = PipelineRunner(config=config)
+    pipeline_runner.run()
+    # the selectors, the extractors and the service share one cache, hence one byte budget
+    cache = FWGQueryCache(max_entries=args.cache_size, max_bytes=args.cache_bytes)
+    query_executor = QueryExecutor(**pipeline_runner.get_query_inputs(), cache=cache)
+
+    query_service = QueryService(
+        query_executor=query_executor, host=args.host, port=args.port, cache=cache
+    )
+    asyncio.run(query_service.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+class FloodWaveEvent:
+    """
+    Class for storing an event emitted by the StreamingFloodWaveDetector.
+    """
+    WAVE_STARTED = 'wave_started'
+    WAVE_EXTENDED = 'wave_extended'
+    WAVE_FINISHED = 'wave_finished'
+
+    def __init__(self, event_type: str, wave_id: int, date,
+                 nodes: list = None, edges: list = None,
+                 merged_wave_ids: list = None, flood_waves: list = None):
+        """
+        Constructor.
+        :param str event_type: one of WAVE_STARTED, WAVE_EXTENDED and WAVE_FINISHED
+        :param int wave_id: identifier of the wave the event belongs to
+        :param date: the time key (same format as in the nodes) of the tick that triggered the event
+        :param list nodes: the new nodes of the wave (for finished waves: all nodes)
+        :param list edges: the new edges of the wave (for finished waves: all edges)
+        :param list merged_wave_ids: identifiers of the open waves merged into this wave
+        :param list flood_waves: flood waves extracted from a finished wave
+        """
+        self.event_type = event_type
+        self.wave_id = wave_id
+        self.date = date
+        self.nodes = [] if nodes is None else nodes
+        self.edges = [] if edges is None else edges
+        self.merged_wave_ids = [] if merged_wave_ids is None else merged_wave_ids
+        self.flood_waves = [] if flood_waves is None else flood_waves
+
+    def __repr__(self) -> str:
+        return (f'FloodWaveEvent({self.event_type}, wave_id={self.wave_id}, date={self.date}, '
+                f'nodes={len(self.nodes)}, edges={len(self.edges)})')
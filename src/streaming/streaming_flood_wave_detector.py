@@ -0,0 +1,282 @@
+import heapq
+from collections import deque
+
+import networkx as nx
+import pandas as pd
+
+from src.analysis.static.flood_wave_extractor import FloodWaveExtractor
+from src.data_handling.data_interface import DataInterface
+from src.streaming.flood_wave_event import FloodWaveEvent
+from src.wng_building.station_river_data_interface import StationRiverDataInterface
+from src.wng_building.wng_data_interface import WNGDataInterface
+
+
+class StreamingFloodWaveDetector:
+    """
+    Class for detecting flood waves online. Readings are fed tick by tick, delta-peaks are
+    confirmed as soon as delta future time steps are known, and the edges of the Flood Wave Graph
+    are created with the same beta rule as in FloodWaveGraphPreparer.
+    """
+    def __init__(self, data_if: DataInterface, station_river_data_if: StationRiverDataInterface,
+                 wng_data_if: WNGDataInterface, beta, delta,
+                 is_equivalence_applied: bool = True):
+        """
+        Constructor.
+        :param DataInterface data_if: a DataInterface instance
+        :param StationRiverDataInterface station_river_data_if: a StationRiverDataInterface instance
+        :param WNGDataInterface wng_data_if: a WNGDataInterface instance
+        :param beta: hyperparameter for setting the maximal allowed time difference between two
+        connected nodes, see FloodWaveGraphPreparer
+        :param delta: hyperparameter for setting the lengths of the time intervals in which
+        we are looking for a peak value, see FloodWaveGraphPreparer
+        :param bool is_equivalence_applied: used when extracting the flood waves of a finished
+        wave, see FloodWaveExtractor
+        """
+        self.data_if = data_if
+        self.wng = wng_data_if.water_network_graph
+        self.time_resolution = data_if.time_resolution
+        self.beta = self.time_resolution.to_steps(beta)
+        self.delta = self.time_resolution.to_steps(delta)
+        self.is_equivalence_applied = is_equivalence_applied
+
+        self.upstream_stations, self.downstream_stations = self.get_station_neighbours(
+            completed_rivers=station_river_data_if.completed_rivers
+        )
+
+        # the last 2 * delta + 1 consecutive readings of each station
+        self.readings = {}
+        # the confirmed peaks of each station that can still be connected to new peaks
+        self.recent_peaks = {}
+        # open waves: wave id -> {'nodes': list, 'edges': list, 'last_step': int}
+        self.open_waves = {}
+        self.node_wave_mapping = {}
+        # (expiry step, wave id) pairs, entries made stale by an extension are skipped
+        self.expiry_heap = []
+        self.next_wave_id = 0
+        self.current_step = None
+
+    @staticmethod
+    def get_station_neighbours(completed_rivers: dict) -> tuple:
+        """
+        Collects the upstream and downstream neighbours of every station along the
+        completed rivers.
+        :param dict completed_rivers: dictionary containing the completed rivers
+        :return tuple: dictionary of upstream neighbours, dictionary of downstream neighbours
+        """
+        upstream_stations = {}
+        downstream_stations = {}
+        for completed_river in completed_rivers.values():
+            for start, end in zip(completed_river[:-1], completed_river[1:]):
+                downstream_stations.setdefault(start, set()).add(end)
+                upstream_stations.setdefault(end, set()).add(start)
+
+        return upstream_stations, downstream_stations
+
+    def update(self, date, readings: dict) -> list:
+        """
+        Processes the readings of one tick. Only the stations present in readings are touched.
+        :param date: the time of the readings (anything pd.Timestamp accepts)
+        :param dict readings: keys are reg-numbers, values are water levels (None or NaN if missing)
+        :return list: the emitted FloodWaveEvent instances
+        """
+        step = int(self.time_resolution.to_step_array(pd.DatetimeIndex([pd.Timestamp(date)]))[0])
+        if self.current_step is not None and step < self.current_step:
+            raise ValueError('Readings have to arrive in chronological order.')
+        self.current_step = step
+
+        events = []
+        for station, level in readings.items():
+            peak = self.push_reading(station=station, step=step, level=level)
+
+            if peak is not None:
+                events.extend(self.connect_peak(station=station, peak=peak))
+
+        events.extend(self.finish_waves())
+
+        return events
+
+    def push_reading(self, station: str, step: int, level) -> tuple:
+        """
+        Stores a reading and checks whether the reading delta time steps before it became a
+        confirmed delta-peak.
+        :param str station: reg-number of the station
+        :param int step: time step of the reading
+        :param level: water level
+        :return tuple: (step, node) of the confirmed peak, None if there is no new peak
+        """
+        buffer = self.readings.setdefault(station, deque(maxlen=2 * self.delta + 1))
+
+        if level is None or pd.isna(level):
+            buffer.clear()
+            return None
+        if buffer and buffer[-1][0] >= step:
+            raise ValueError(
+                f'Readings of station {station} have to arrive in chronological order.'
+            )
+        if buffer and buffer[-1][0] != step - 1:
+            # missing time steps break the window just like NaN values do in the batch mode
+            buffer.clear()
+
+        buffer.append((step, level))
+        if len(buffer) < buffer.maxlen:
+            return None
+
+        candidate_step, candidate_level = buffer[self.delta]
+        levels = [reading[1] for reading in buffer]
+        is_peak = (
+            all(candidate_level > previous for previous in levels[:self.delta]) and
+            all(candidate_level >= following for following in levels[self.delta + 1:])
+        )
+        if not is_peak:
+            return None
+
+        time_key = self.time_resolution.encode([candidate_step]).tolist()[0]
+
+        return candidate_step, (station, time_key, int(candidate_level))
+
+    def connect_peak(self, station: str, peak: tuple) -> list:
+        """
+        Connects a newly confirmed peak to the recent peaks of the neighbouring stations.
+        :param str station: reg-number of the station
+        :param tuple peak: (step, node) of the confirmed peak
+        :return list: the emitted FloodWaveEvent instances
+        """
+        step, node = peak
+        new_edges = []
+        for upstream_station in self.upstream_stations.get(station, ()):
+            for upstream_step, upstream_node in self.get_recent_peaks(station=upstream_station):
+                if step - self.beta <= upstream_step <= step:
+                    new_edges.append(((upstream_node, node), step))
+        for downstream_station in self.downstream_stations.get(station, ()):
+            downstream_peaks = self.get_recent_peaks(station=downstream_station)
+            for downstream_step, downstream_node in downstream_peaks:
+                if step <= downstream_step <= step + self.beta:
+                    new_edges.append(((node, downstream_node), downstream_step))
+
+        if station in self.upstream_stations or station in self.downstream_stations:
+            # the own peaks are pruned as well, since the neighbours may not peak for a long time
+            self.recent_peaks.setdefault(station, deque())
+            self.get_recent_peaks(station=station).append(peak)
+
+        events = []
+        for edge, end_step in new_edges:
+            events.append(self.add_edge(edge=edge, end_step=end_step))
+
+        return events
+
+    def get_recent_peaks(self, station: str) -> deque:
+        """
+        Returns the recent peaks of a station after dropping the ones that can not get new edges.
+        :param str station: reg-number of the station
+        :return deque: (step, node) pairs of recent peaks
+        """
+        peaks = self.recent_peaks.get(station, deque())
+        while peaks and peaks[0][0] < self.current_step - self.beta - self.delta:
+            peaks.popleft()
+
+        return peaks
+
+    def add_edge(self, edge: tuple, end_step: int) -> FloodWaveEvent:
+        """
+        Adds an edge to the open waves. Starts a new wave, extends a wave or merges two waves.
+        :param tuple edge: the new edge
+        :param int end_step: time step of the end node of the edge
+        :return FloodWaveEvent: the emitted event
+        """
+        wave_ids = {self.node_wave_mapping.get(node) for node in edge} - {None}
+
+        if not wave_ids:
+            wave_id = self.next_wave_id
+            self.next_wave_id += 1
+            self.open_waves[wave_id] = {'nodes': [], 'edges': [], 'last_step': end_step}
+            event_type = FloodWaveEvent.WAVE_STARTED
+            merged_wave_ids = []
+        else:
+            # merge the smaller waves into the largest one
+            wave_id = max(wave_ids, key=lambda x: len(self.open_waves[x]['nodes']))
+            event_type = FloodWaveEvent.WAVE_EXTENDED
+            merged_wave_ids = sorted(wave_ids - {wave_id})
+            for merged_wave_id in merged_wave_ids:
+                merged_wave = self.open_waves.pop(merged_wave_id)
+                for node in merged_wave['nodes']:
+                    self.node_wave_mapping[node] = wave_id
+                self.open_waves[wave_id]['nodes'].extend(merged_wave['nodes'])
+                self.open_waves[wave_id]['edges'].extend(merged_wave['edges'])
+                self.open_waves[wave_id]['last_step'] = max(
+                    self.open_waves[wave_id]['last_step'], merged_wave['last_step']
+                )
+
+        wave = self.open_waves[wave_id]
+        new_nodes = [node for node in edge if node not in self.node_wave_mapping]
+        for node in new_nodes:
+            self.node_wave_mapping[node] = wave_id
+            wave['nodes'].append(node)
+        wave['edges'].append(edge)
+
+        wave['last_step'] = max(wave['last_step'], end_step)
+        heapq.heappush(
+            self.expiry_heap, (wave['last_step'] + self.beta + self.delta, wave_id)
+        )
+
+        return FloodWaveEvent(
+            event_type=event_type, wave_id=wave_id, date=self.get_current_time_key(),
+            nodes=new_nodes, edges=[edge], merged_wave_ids=merged_wave_ids
+        )
+
+    def get_current_time_key(self):
+        """
+        Returns the node time key of the current tick.
+        :return: the time key
+        """
+        return self.time_resolution.encode([self.current_step]).tolist()[0]
+
+    def finish_waves(self, do_finish_all: bool = False) -> list:
+        """
+        Closes the waves that can not be extended anymore: a peak confirmed later than
+        beta + delta time steps after the last node of a wave can not be connected to the wave.
+        :param bool do_finish_all: True if all open waves should be closed
+        :return list: the emitted FloodWaveEvent instances
+        """
+        events = []
+        while self.expiry_heap and (do_finish_all or self.expiry_heap[0][0] < self.current_step):
+            expiry_step, wave_id = heapq.heappop(self.expiry_heap)
+            wave = self.open_waves.get(wave_id)
+            if wave is None or expiry_step != wave['last_step'] + self.beta + self.delta:
+                continue
+
+            del self.open_waves[wave_id]
+            for node in wave['nodes']:
+                del self.node_wave_mapping[node]
+
+            events.append(FloodWaveEvent(
+                event_type=FloodWaveEvent.WAVE_FINISHED, wave_id=wave_id,
+                date=self.get_current_time_key(),
+                nodes=wave['nodes'], edges=wave['edges'],
+                flood_waves=self.extract_flood_waves(edges=wave['edges'])
+            ))
+
+        return events
+
+    def extract_flood_waves(self, edges: list) -> list:
+        """
+        Extracts the flood waves of a finished wave using FloodWaveExtractor.
+        :param list edges: the edges of the finished wave
+        :return list: list of extracted flood waves
+        """
+        wave_graph = nx.DiGraph()
+        wave_graph.add_edges_from(edges)
+
+        extractor = FloodWaveExtractor(
+            fwg=wave_graph, wng=self.wng,
+            data_if=self.data_if,
+            is_equivalence_applied=self.is_equivalence_applied
+        )
+
+        return extractor.get_flood_waves()
+
+    def flush(self) -> list:
+        """
+        Closes all open waves, e.g. at the end of the stream.
+        :return list: the emitted FloodWaveEvent instances
+        """
+        return self.finish_waves(do_finish_all=True)
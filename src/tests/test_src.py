@@ -1,22 +1,56 @@
+import asyncio
+import http.client
+import json
+import os
 from typing import Tuple
 
+import networkx as nx
 import numpy as np
 import pandas as pd
 
+from src.analysis.static.component_labeller import ComponentLabeller
 from src.analysis.static.flood_wave_analyser import FloodWaveAnalyser
+from src.analysis.static.flood_wave_event_table import FloodWaveEventTable
 from src.analysis.static.flood_wave_extractor import FloodWaveExtractor
 from src.analysis.static.flood_wave_extractor_interface import FloodWaveExtractorInterface
+from src.analysis.static.flood_wave_path_dag import FloodWavePathDAG
 from src.analysis.static.flood_wave_selector import FloodWaveSelector
+from src.analysis.static.periodic_flood_wave_analyser import PeriodicFloodWaveAnalyser
+from src.analysis.static.position_creator import PositionCreator
+from src.analysis.static.quantile_sketch import QuantileSketch
+from src.analysis.static.streaming_flood_wave_analyser import StreamingFloodWaveAnalyser
+from src.analysis.dynamic.batch_query_runner import BatchQueryRunner
+from src.analysis.dynamic.bounding_box_fwg_selector import BoundingBoxFWGSelector
+from src.analysis.dynamic.fwg_query_cache import FWGQueryCache
+from src.analysis.dynamic.query_executor import QueryExecutor
+from src.analysis.dynamic.station_grid_index import StationGridIndex
+from src.analysis.dynamic.temporal_reachability_index import TemporalReachabilityIndex
 from src.analysis.dynamic.wng_path_fwg_selector import WNGPathFWGSelector
+from src.analysis.dynamic.wng_sink_fwg_selector import WNGSinkFWGSelector
+from src.analysis.utils.wng_path_fwg_plot_preparer import WNGPathFWGPlotPreparer
+from src.analysis.utils.wng_sink_fwg_plot_preparer import WNGSinkFWGPlotPreparer
+from src.benchmarks.benchmark_runner import BenchmarkRunner
+from src.benchmarks.synthetic_data_generator import SyntheticDataGenerator
 from src.data_handling.data_downloader import DataDownloader
 from src.data_handling.data_handler import DataHandler
 from src.data_handling.data_interface import DataInterface
 from src.data_handling.dataloader import DataLoader
+from src.data_handling.flood_wave_file import FloodWaveFile
+from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.data_handling.time_resolution import TimeResolution
+from src.fwg_building.chunked_flood_wave_graph_preparer import ChunkedFloodWaveGraphPreparer
 from src.fwg_building.flood_wave_graph_builder import FloodWaveGraphBuilder
 from src.fwg_building.flood_wave_graph_preparer import FloodWaveGraphPreparer
+from src.fwg_building.fwg_shard_store import FWGShardStore
+from src.pipeline.pipeline_runner import PipelineRunner
+from src.profiling.stage_profiler import StageProfiler
+from src.service.query_service import QueryService
+from src.streaming.flood_wave_event import FloodWaveEvent
+from src.streaming.streaming_flood_wave_detector import StreamingFloodWaveDetector
 from src.wng_building.station_river_creator import StationRiverCreator
 from src.wng_building.station_river_data_interface import StationRiverDataInterface
 from src.wng_building.water_network_graph_builder import WaterNetworkGraphBuilder
+from src.wng_building.wng_data_interface import WNGDataInterface
 
 
 def create_example_data() -> Tuple[pd.DataFrame, dict]:
@@ -40,6 +74,33 @@ def create_example_data() -> Tuple[pd.DataFrame, dict]:
     return time_series_data, completed_rivers
 
 
+def create_example_data_folder(folder_path: str, time_series_data: pd.DataFrame) -> None:
+    time_series_data.to_csv(os.path.join(folder_path, 'time_series_data.csv'))
+    pd.DataFrame(
+        data=[['a', 'r', 10.0, 20.0, 2.0, 2.0, '1111'], ['b', 'r', 11.0, 21.0, 1.0, 1.0, '2222'],
+              ['c', 's', 12.0, 22.0, 5.0, 5.0, '3333'], ['a', 's', 13.0, 23.0, 4.0, 4.0, '4444']],
+        columns=['station_name', 'river', 'EOVx', 'EOVy', 'null_point', 'rkm_relative', 'reg']
+    ).to_csv(os.path.join(folder_path, 'meta_data.csv'), index=False)
+    with open(os.path.join(folder_path, 'river_connections.json'), 'w') as f:
+        json.dump({}, f)
+
+
+def create_synthetic_pipeline(folder_path: str, number_of_stations: int, number_of_years: int,
+                              seed: int, **config) -> Tuple[SyntheticDataGenerator, PipelineRunner]:
+    generator = SyntheticDataGenerator(
+        number_of_stations=number_of_stations, number_of_years=number_of_years, seed=seed
+    )
+    generator.run()
+    generator.save(data_folder_path=folder_path)
+
+    pipeline_runner = PipelineRunner(config={
+        'data_folder_path': folder_path, 'beta': 3, 'delta': 2, **config
+    })
+    pipeline_runner.run()
+
+    return generator, pipeline_runner
+
+
 def test_fwg_building():
     time_series_data, completed_rivers = create_example_data()
 
@@ -387,3 +448,1069 @@ def test_flood_wave_analyser():
     assert rounded_dist_result == rounded_dist_expected, 'Distances do not match.'
 
     assert analyser.durations == expected_durations, 'Durations do not match.'
+
+
+def test_streaming_flood_wave_detector():
+    time_series_data, completed_rivers = create_example_data()
+
+    data_if = DataInterface()
+    data_if.time_series_data = time_series_data
+    data_if.station_coordinates = {'1111': {'null_point': 100.0}, '2222': {'null_point': 90.0}}
+
+    station_river_data_if = StationRiverDataInterface()
+    station_river_data_if.completed_rivers = completed_rivers
+
+    wng_data_if = WNGDataInterface()
+    wng_data_if.water_network_graph.add_edge('1111', '2222')
+
+    fwg_preparer = FloodWaveGraphPreparer(
+        data_if=data_if,
+        station_river_data_if=station_river_data_if,
+        beta=3, delta=2
+    )
+    fwg_preparer.run()
+
+    detector = StreamingFloodWaveDetector(
+        data_if=data_if,
+        station_river_data_if=station_river_data_if,
+        wng_data_if=wng_data_if,
+        beta=3, delta=2
+    )
+
+    events = []
+    for date, row in time_series_data.iterrows():
+        events.extend(detector.update(date=date, readings=row.to_dict()))
+    events.extend(detector.flush())
+
+    streamed_edges = {edge for event in events
+                      if event.event_type != FloodWaveEvent.WAVE_FINISHED for edge in event.edges}
+    finished_edges = {edge for event in events
+                      if event.event_type == FloodWaveEvent.WAVE_FINISHED for edge in event.edges}
+
+    assert streamed_edges == set(fwg_preparer.preparer_if.edges), 'Streamed edges do not match.'
+    assert finished_edges == streamed_edges, 'Finished waves do not contain all edges.'
+
+    started = [event for event in events if event.event_type == FloodWaveEvent.WAVE_STARTED]
+    finished = [event for event in events if event.event_type == FloodWaveEvent.WAVE_FINISHED]
+    assert len(started) == len(finished) == 2, 'Wave events are not emitted properly.'
+    assert finished[0].date == '2000-01-13', 'The first wave was not closed in time.'
+    assert finished[0].flood_waves == [
+        [('1111', '2000-01-06', 130), ('2222', '2000-01-07', 130)]
+    ], 'Flood waves of a finished wave are not extracted properly.'
+    assert not detector.open_waves and not detector.node_wave_mapping, 'Memory is not released.'
+
+    # only the downstream station and a station without neighbours peak from now on
+    for date in pd.date_range(start='2000-01-16', periods=60, freq='D'):
+        level = 100 + 50 * (date.day % 6 == 0)
+        detector.update(date=date, readings={'1111': 100, '2222': level, '3333': level})
+    assert len(detector.recent_peaks['2222']) <= 2, 'Recent peaks of a station are not pruned.'
+    assert '3333' not in detector.recent_peaks, 'Peaks of a station without neighbours are stored.'
+
+
+def test_chunked_fwg_preparer(tmp_path):
+    time_series_data, completed_rivers = create_example_data()
+    time_series_data = pd.concat([time_series_data] * 3)
+    time_series_data.index = pd.date_range(start='2000-01-01', periods=45, freq='D')
+
+    create_example_data_folder(folder_path=str(tmp_path), time_series_data=time_series_data)
+
+    data_if = DataInterface()
+    data_if.time_series_data = time_series_data.astype(pd.Int64Dtype())
+
+    station_river_data_if = StationRiverDataInterface()
+    station_river_data_if.completed_rivers = completed_rivers
+
+    fwg_preparer = FloodWaveGraphPreparer(
+        data_if=data_if,
+        station_river_data_if=station_river_data_if,
+        beta=3, delta=2
+    )
+    fwg_preparer.run()
+
+    dl = DataLoader(data_folder_path=str(tmp_path), do_load_time_series=False)
+    for block_size in [1, 4, 7, 100]:
+        chunked_preparer = ChunkedFloodWaveGraphPreparer(
+            dl=dl,
+            station_river_data_if=station_river_data_if,
+            beta=3, delta=2,
+            block_size=block_size,
+            data_folder_path=str(tmp_path)
+        )
+        chunked_preparer.run()
+
+        fwg_builder = FloodWaveGraphBuilder(preparer_interface=chunked_preparer.preparer_if)
+        fwg_builder.run()
+
+        error_msg = f'Chunked preparation with block size {block_size} does not match.'
+        assert set(fwg_builder.fwg_if.flood_wave_graph.edges()) == set(fwg_preparer.preparer_if.edges), \
+            error_msg
+        assert chunked_preparer.number_of_edges == len(fwg_preparer.preparer_if.edges), error_msg
+
+
+def test_hourly_time_resolution():
+    time_series_data, completed_rivers = create_example_data()
+    time_series_data.index = pd.date_range(start='2000-01-01', periods=15, freq='h')
+
+    time_resolution = TimeResolution(freq='h')
+    data_if = DataInterface()
+    data_if.time_series_data = time_series_data
+    data_if.time_resolution = time_resolution
+    data_if.reg_rkm_mapping = {'1111': 10.0, '2222': 0.0}
+
+    station_river_data_if = StationRiverDataInterface()
+    station_river_data_if.completed_rivers = completed_rivers
+
+    fwg_preparer = FloodWaveGraphPreparer(
+        data_if=data_if,
+        station_river_data_if=station_river_data_if,
+        beta='3h', delta=2
+    )
+    fwg_preparer.run()
+
+    fwg_builder = FloodWaveGraphBuilder(preparer_interface=fwg_preparer.preparer_if)
+    fwg_builder.run()
+
+    step = time_resolution.to_key('2000-01-01')
+    expected_edges = [(('1111', step + 5, 130), ('2222', step + 6, 130)),
+                      (('1111', step + 9, 130), ('2222', step + 9, 130)),
+                      (('1111', step + 9, 130), ('2222', step + 12, 140)),
+                      (('1111', step + 12, 120), ('2222', step + 12, 140))]
+
+    fwg = fwg_builder.fwg_if.flood_wave_graph
+    assert set(fwg.edges()) == set(expected_edges), 'Error while finding hourly edges'
+
+    wng_data_if = WNGDataInterface()
+    wng_data_if.water_network_graph.add_edge('1111', '2222')
+
+    path_selector = WNGPathFWGSelector(
+        data_folder_path='',
+        fwg_data_if=fwg_builder.fwg_if,
+        wng_data_if=wng_data_if
+    )
+    path_selector.run(
+        temporal_filtering={'start_date': '2000-01-01 06:00', 'end_date': '2000-01-01 11:00'},
+        spatial_filtering={'source': '1111', 'target': '2222', 'through': []}
+    )
+    assert set(path_selector.fwg_subgraph.edges()) == set(expected_edges[1:2]), \
+        'Error while filtering hourly nodes'
+
+    extractor_if = FloodWaveExtractorInterface()
+    extractor_if.flood_waves = [list(edge) for edge in expected_edges]
+    analyser = FloodWaveAnalyser(
+        extractor_if=extractor_if, data_if=data_if, is_equivalence_applied=True
+    )
+    analyser.run()
+    assert analyser.durations == [1, 0, 3, 0], 'Hourly durations do not match.'
+
+    filtered_waves = FloodWaveSelector.get_flood_waves_by_duration(
+        waves=extractor_if.flood_waves, max_duration_days='2h',
+        is_equivalence_applied=True, time_resolution=time_resolution
+    )
+    assert len(filtered_waves) == 3, 'Hourly duration filtering is not working.'
+
+
+def test_data_handler_mappings(tmp_path):
+    time_series_data, _ = create_example_data()
+    create_example_data_folder(folder_path=str(tmp_path), time_series_data=time_series_data)
+
+    data_handler = DataHandler(dl=DataLoader(data_folder_path=str(tmp_path)))
+    data_if = data_handler.data_if
+
+    assert data_if.river_station_mapping == {'r': ['a', 'b'], 's': ['c', 'a']}, \
+        'River-station mapping is not correct.'
+    assert data_if.station_river_mapping == {'a': 'r', 'b': 'r', 'c': 's'}, \
+        'Station-river mapping is not correct.'
+    assert data_if.station_coordinates['3333'] == {'EOVx': 12.0, 'EOVy': 22.0, 'null_point': 5.0}, \
+        'Station coordinates are not correct.'
+
+    coordinates = data_if.station_coordinate_array[data_if.reg_index_mapping['4444']]
+    assert list(data_if.reg_numbers) == ['1111', '2222', '3333', '4444'], 'Reg-numbers are not correct.'
+    assert coordinates.tolist() == [13.0, 23.0, 4.0], 'Coordinate array is not correct.'
+
+
+def test_water_network_graph_assembly():
+    completed_river_edges = {
+        'r1': [('1', '2'), ('2', '3'), ('3', '4')],
+        'r2': [('5', '6'), ('6', '3')],
+        'r3': [('2', '3'), ('3', '7')]
+    }
+
+    expected_wng = nx.DiGraph()
+    for edges in completed_river_edges.values():
+        river_graph = nx.DiGraph()
+        river_graph.add_edges_from(edges)
+        expected_wng = nx.compose(expected_wng, river_graph)
+
+    wng = WaterNetworkGraphBuilder.create_water_network_graph(
+        completed_river_edges=completed_river_edges
+    )
+
+    assert list(wng.nodes()) == list(expected_wng.nodes()), 'WNG nodes do not match.'
+    assert list(wng.edges()) == list(expected_wng.edges()), 'WNG edges do not match.'
+    assert wng.edges[('2', '3')]['rivers'] == ['r1', 'r3'], 'River membership is not stored.'
+
+    data_if = DataInterface()
+    data_if.river_connections = {'r1': {'close_beginning': None, 'close_ending': '3'},
+                                 'r2': {'close_beginning': None, 'close_ending': None}}
+    rivers = {'r1': ['1', '2'], 'r2': ['4']}
+    completed_rivers = StationRiverCreator(data_if=data_if).create_completed_rivers(rivers=rivers)
+    assert completed_rivers == {'r1': ['1', '2', '3'], 'r2': ['4']}, \
+        'Completed rivers are not correct.'
+    assert not any(completed_rivers[river_name] is stations
+                   for river_name, stations in rivers.items()), \
+        'Completed rivers share their lists with the rivers.'
+
+
+def test_wng_bundle(tmp_path):
+    station_river_if = StationRiverDataInterface()
+    station_river_if.stations = {'1': {}, '2': {}, '3': {}, '4': {}}
+    station_river_if.rivers = {'r1': ['1', '2'], 'r2': ['4']}
+    station_river_if.completed_rivers = {'r1': ['1', '2', '3'], 'r2': ['4', '3']}
+
+    wng_builder = WaterNetworkGraphBuilder(
+        station_river_if=station_river_if,
+        do_save_all=True,
+        data_folder_path=str(tmp_path)
+    )
+    wng_builder.run()
+
+    folder_path = os.path.join(tmp_path, 'generated', 'water_network_graph')
+    assert os.listdir(folder_path) == ['wng_bundle.zip'], 'The bundle is not written atomically.'
+
+    river = GeneratedDataLoader.read_bundle(
+        data_folder_path=str(tmp_path),
+        folder_name='water_network_graph',
+        file_name='wng_bundle',
+        member_names=['completed_rivers/cl_r2']
+    )
+    assert river == {'completed_rivers/cl_r2': [('4', '3')]}, 'Random access of a river failed.'
+
+    bundle = GeneratedDataLoader.read_bundle(
+        data_folder_path=str(tmp_path),
+        folder_name='water_network_graph',
+        file_name='wng_bundle'
+    )
+    assert bundle['vertices'] == ['1', '2', '3', '4'], 'Vertices are not saved.'
+    assert set(bundle['water_network_graph'].edges()) == {('1', '2'), ('2', '3'), ('4', '3')}, \
+        'The WNG is not saved.'
+
+
+def test_compact_flood_wave_file(tmp_path):
+    waves = [
+        [('1514', '2016-02-01', -52), ('1515', '2016-02-02', 64), ('1516', '2016-02-02', 182)],
+        [('1514', '2016-02-05', -2), ('1515', '2016-02-05', 201)],
+        [('1514', '2016-02-12', -2), ('1515', '2016-02-12', 191), ('1516', '2016-02-13', 227)]
+    ]
+    waves_without_equivalence = [waves[:2], waves[2:]]
+
+    for flood_waves, is_equivalence_applied in [(waves, True), (waves_without_equivalence, False)]:
+        FloodWaveFile.save(
+            flood_waves=flood_waves,
+            is_equivalence_applied=is_equivalence_applied,
+            stations=['1514', '1515', '1516'],
+            data_folder_path=str(tmp_path),
+            subfolder_names=['flood_waves', str(is_equivalence_applied)]
+        )
+        wave_file = FloodWaveFile(
+            data_folder_path=str(tmp_path),
+            subfolder_names=['flood_waves', str(is_equivalence_applied)]
+        )
+
+        assert len(wave_file) == 3, 'Wrong number of flood waves.'
+        assert wave_file.get_wave(index=1) == waves[1], 'Partial read is not working.'
+        assert wave_file.get_waves(start=1) == waves[1:], 'Partial read is not working.'
+        assert wave_file.to_flood_waves() == flood_waves, 'Compact format is not lossless.'
+
+        wave_file.export_jsonl(
+            data_folder_path=str(tmp_path),
+            subfolder_names=['flood_waves', str(is_equivalence_applied)],
+            file_name='waves'
+        )
+        lines = list(GeneratedDataLoader.iter_jsonl(
+            data_folder_path=str(tmp_path),
+            subfolder_names=['flood_waves', str(is_equivalence_applied)],
+            file_name='waves'
+        ))
+        assert lines[0]['is_equivalence_applied'] == is_equivalence_applied, 'Wrong jsonl header.'
+        assert len(lines) == len(flood_waves) + 1, 'Wrong number of jsonl lines.'
+
+
+def test_flood_wave_path_dag():
+    fwg = nx.DiGraph()
+    fwg.add_edges_from([
+        (('1', '2000-01-01', 1), ('2', '2000-01-01', 1)),
+        (('1', '2000-01-01', 1), ('2', '2000-01-02', 2)),
+        (('2', '2000-01-01', 1), ('3', '2000-01-02', 1)),
+        (('2', '2000-01-02', 2), ('3', '2000-01-02', 1)),
+        (('2', '2000-01-02', 2), ('3', '2000-01-03', 2)),
+        (('3', '2000-01-02', 1), ('4', '2000-01-04', 1)),
+        (('3', '2000-01-03', 2), ('4', '2000-01-04', 1))
+    ])
+    wng = nx.DiGraph([('1', '2'), ('2', '3'), ('3', '4')])
+
+    data_if = DataInterface()
+    data_if.station_coordinates = {
+        reg: {'null_point': 10.0 - i} for i, reg in enumerate(['1', '2', '3', '4'])
+    }
+    data_if.reg_rkm_mapping = {'1': 30.0, '2': 20.0, '3': 10.0, '4': 0.0}
+
+    flood_waves = {}
+    for do_share_paths in [False, True]:
+        extractor = FloodWaveExtractor(
+            fwg=fwg, wng=wng, data_if=data_if,
+            is_equivalence_applied=False, do_share_paths=do_share_paths
+        )
+        extractor.run()
+        flood_waves[do_share_paths] = extractor.extractor_if.flood_waves
+
+    path_dag = flood_waves[True][0]
+    expected_paths = sorted(flood_waves[False][0])
+    assert isinstance(path_dag, FloodWavePathDAG), 'Shared paths are not returned.'
+    assert len(path_dag.nodes) == 6, 'Nodes are not shared between the paths.'
+    assert len(path_dag) == 3, 'Number of paths is not correct.'
+    assert sorted(path_dag) == expected_paths, 'Paths of the DAG do not match.'
+
+    filtered_waves = FloodWaveSelector.get_flood_waves_by_impacted_stations(
+        waves=flood_waves[True], impacted_stations=['3'], is_equivalence_applied=False
+    )
+    assert sorted(filtered_waves[0]) == expected_paths, 'Station filtering of DAGs is not working.'
+    assert FloodWaveSelector.get_flood_waves_by_duration(
+        waves=flood_waves[True], max_duration_days=2, is_equivalence_applied=False
+    ) == [], 'Duration filtering of DAGs is not working.'
+
+    results = {}
+    for do_share_paths, waves in flood_waves.items():
+        extractor_if = FloodWaveExtractorInterface()
+        extractor_if.flood_waves = waves
+        analyser = FloodWaveAnalyser(
+            extractor_if=extractor_if, data_if=data_if, is_equivalence_applied=False
+        )
+        results[do_share_paths] = analyser.run()
+    assert results[True] == results[False], 'Analysis of DAGs does not match.'
+    assert results[True]['number_of_flood_waves'] == 3, 'Number of flood waves is not correct.'
+    assert len(analyser.start_nodes) == len(flood_waves[False]), 'Paths of a class are listed.'
+
+    data = np.array([4.0, 1.0, 7.0, 2.0])
+    weights = np.array([3, 1, 2, 2])
+    assert FloodWaveAnalyser.get_statistics(data=data, weights=weights) == \
+        FloodWaveAnalyser.get_statistics(data=np.repeat(data, weights)), \
+        'Weighted statistics do not match.'
+
+
+def test_component_labeller():
+    fwg = nx.DiGraph()
+    fwg.add_edges_from([
+        (('2', '2000-01-03', 1), ('3', '2000-01-03', 1)),
+        (('1', '2000-01-05', 2), ('2', '2000-01-06', 2)),
+        (('1', '2000-01-01', 1), ('2', '2000-01-02', 1)),
+        (('3', '2000-01-04', 1), ('2', '2000-01-03', 1)),
+        (('10', '2000-01-01', 5), ('2', '2000-01-06', 2))
+    ])
+    fwg.add_node(('4', '2000-01-01', 0))
+
+    component_labeller = ComponentLabeller(graph=fwg)
+    component_labeller.run()
+
+    expected_components = sorted(map(sorted, nx.weakly_connected_components(fwg)))
+    assert list(component_labeller.iter_components()) == expected_components, \
+        'Components do not match.'
+    assert component_labeller.labels.tolist() == [0, 0, 1, 1, 1, 2, 2, 2, 3], \
+        'Component labels do not match.'
+
+    fwg_without_levels = nx.relabel_nodes(fwg, mapping={node: node[:2] for node in fwg.nodes})
+    component_labeller = ComponentLabeller(graph=fwg_without_levels)
+    component_labeller.run()
+    expected_components = sorted(map(sorted, nx.weakly_connected_components(fwg_without_levels)))
+    assert list(component_labeller.iter_components()) == expected_components, \
+        'Components of nodes without water levels do not match.'
+
+
+def test_stage_profiler(tmp_path):
+    time_series_data, completed_rivers = create_example_data()
+    data_if = DataInterface()
+    data_if.time_series_data = time_series_data
+    station_river_data_if = StationRiverDataInterface()
+    station_river_data_if.completed_rivers = completed_rivers
+
+    StageProfiler.enable(do_trace_memory=True)
+    try:
+        fwg_preparer = FloodWaveGraphPreparer(
+            data_if=data_if, station_river_data_if=station_river_data_if, beta=3, delta=2
+        )
+        fwg_preparer.run()
+        fwg_builder = FloodWaveGraphBuilder(preparer_interface=fwg_preparer.preparer_if)
+        fwg_builder.run()
+    finally:
+        StageProfiler.disable()
+
+    report_path = os.path.join(str(tmp_path), 'profile.json')
+    StageProfiler.save_report(file_path=report_path)
+    with open(report_path) as f:
+        report = json.load(f)
+    StageProfiler.reset()
+
+    stages = [record['stage'] for record in report['stages']]
+    assert stages == ['FloodWaveGraphPreparer.run', 'FloodWaveGraphBuilder.run'], \
+        'Stages are not recorded.'
+    assert report['stages'][1]['counts'] == {'nodes': 6, 'edges': 4}, 'Wrong item counts.'
+    assert report['stages'][0]['memory_peak'] > 0, 'Memory is not traced.'
+
+    fwg_builder.run()
+    assert StageProfiler.records == [], 'Disabled profiler should not record stages.'
+
+
+def test_synthetic_data_generator(tmp_path):
+    generators = [
+        SyntheticDataGenerator(number_of_stations=30, number_of_years=1, seed=7) for _ in range(2)
+    ]
+    for generator in generators:
+        generator.run()
+    pd.testing.assert_frame_equal(generators[0].time_series_data, generators[1].time_series_data)
+
+    generators[0].save(data_folder_path=str(tmp_path))
+    data_handler = DataHandler(dl=DataLoader(data_folder_path=str(tmp_path)))
+    station_river_creator = StationRiverCreator(data_if=data_handler.data_if)
+    station_river_creator.run()
+    wng_builder = WaterNetworkGraphBuilder(
+        station_river_if=station_river_creator.station_river_if,
+        do_save_all=False, data_folder_path=str(tmp_path)
+    )
+    wng_builder.run()
+
+    wng = wng_builder.wng_if.water_network_graph
+    assert wng.number_of_nodes() == 30, 'Wrong number of stations.'
+    assert nx.is_tree(wng.to_undirected()), 'The river network is not a tree.'
+    assert len([node for node in wng if wng.out_degree(node) == 0]) == 1, 'There is no outlet.'
+
+    benchmark_runner = BenchmarkRunner(sizes=[{'number_of_stations': 10, 'number_of_years': 1}])
+    benchmark_runner.run()
+    baseline_path = os.path.join(str(tmp_path), 'baseline.json')
+    benchmark_runner.save_baseline(file_path=baseline_path)
+
+    stages = [record['stage'] for record in benchmark_runner.results['benchmarks'][0]['stages']]
+    assert 'FloodWaveGraphPreparer.run' in stages, 'Pipeline stages are not timed.'
+    assert benchmark_runner.compare(baseline_file_path=baseline_path, tolerance=0.0) == [], \
+        'Results should not regress against themselves.'
+
+    import_time = BenchmarkRunner.measure_import_time(
+        module_name='src.data_handling.data_downloader'
+    )
+    assert import_time['loaded_lazy_dependencies'] == [], 'gdown is loaded at import.'
+
+
+class FailingPipelineRunner(PipelineRunner):
+    # module level, so the worker processes of the pipeline can unpickle it
+    @staticmethod
+    def run_wng(station_rivers):
+        raise ValueError('The WNG can not be built.')
+
+
+def test_pipeline_runner(tmp_path):
+    generator = SyntheticDataGenerator(number_of_stations=10, number_of_years=1, seed=3)
+    generator.run()
+    generator.save(data_folder_path=str(tmp_path))
+
+    config = {
+        'data_folder_path': str(tmp_path),
+        'beta': 3,
+        'delta': 2,
+        'selector': {
+            'type': 'wng_sink',
+            'temporal_filtering': {'start_date': '1990-01-01', 'end_date': '1990-03-01'},
+            'spatial_filtering': {'sink': generator.get_path_to_outlet(reg_number='100000')[-1]}
+        }
+    }
+
+    pipeline_runner = PipelineRunner(config=config)
+    StageProfiler.enable()
+    try:
+        statistical_results = pipeline_runner.run()
+    finally:
+        StageProfiler.disable()
+    profiled_stages = [record['stage'] for record in StageProfiler.records]
+    StageProfiler.reset()
+    assert sorted(pipeline_runner.executed_stages) == sorted(PipelineRunner.dependencies), \
+        'Not every stage was executed.'
+    assert 'FloodWaveGraphPreparer.run' in profiled_stages, \
+        'Stages of the worker processes are not profiled.'
+
+    # simulate a crash after the preparation of the FWG
+    GeneratedDataLoader.save_json(
+        data={'config_hash': pipeline_runner.config_hash,
+              'completed_stages': ['data', 'station_rivers', 'wng', 'fwg_preparation']},
+        data_folder_path=str(tmp_path),
+        subfolder_names=[PipelineRunner.folder_name],
+        file_name=PipelineRunner.state_file_name
+    )
+    resumed_pipeline_runner = PipelineRunner(config=config)
+    assert resumed_pipeline_runner.run() == statistical_results, 'Resumed run gives other results.'
+    expected_stages = ['fwg', 'selection', 'extraction', 'analysis']
+    assert resumed_pipeline_runner.executed_stages == expected_stages, \
+        'Completed stages should not be executed again.'
+
+    failing_pipeline_runner = FailingPipelineRunner(config=config, do_restart=True)
+    try:
+        failing_pipeline_runner.run()
+        raise AssertionError('The exception of a stage is not raised.')
+    except ValueError:
+        pass
+    completed_stages = failing_pipeline_runner.read_state()
+    assert 'fwg_preparation' in completed_stages and 'wng' not in completed_stages, \
+        'The stages running besides a failed one are not checkpointed.'
+
+
+def test_batch_query_runner(tmp_path):
+    generator, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=20, number_of_years=1, seed=5
+    )
+    data_if = pipeline_runner.get_artifact(stage='data')
+    fwg_data_if = pipeline_runner.get_artifact(stage='fwg')
+    wng_data_if = pipeline_runner.get_artifact(stage='wng')
+    number_of_fwg_nodes = fwg_data_if.flood_wave_graph.number_of_nodes()
+    assert pipeline_runner.get_artifact(stage='selection') is None, \
+        'The whole FWG is checkpointed as the selection.'
+    assert pipeline_runner.get_artifact(stage='extraction').flood_waves, \
+        'No flood waves are extracted from the whole FWG.'
+
+    path = generator.get_path_to_outlet(reg_number='100019')
+    queries = {
+        'sink': {'selector': 'wng_sink',
+                 'temporal_filtering': {'start_date': '1990-01-01', 'end_date': '1990-04-01'},
+                 'spatial_filtering': {'sink': path[-1]}},
+        'path': {'selector': 'wng_path',
+                 'temporal_filtering': {'start_date': '1990-02-01', 'end_date': '1990-09-01'},
+                 'spatial_filtering': {'source': path[0], 'target': path[-1], 'through': []},
+                 'is_equivalence_applied': False},
+        'unknown_sink': {'selector': 'wng_sink',
+                         'temporal_filtering': {'start_date': '1990-01-01',
+                                                'end_date': '1990-04-01'},
+                         'spatial_filtering': {'sink': 'unknown'}}
+    }
+
+    query_executor = QueryExecutor(
+        data_if=data_if, fwg_data_if=fwg_data_if, wng_data_if=wng_data_if
+    )
+    batch_query_runner = BatchQueryRunner(
+        data_if=data_if, fwg_data_if=fwg_data_if, wng_data_if=wng_data_if, max_workers=2
+    )
+    results = batch_query_runner.run(queries=queries)
+
+    for query_id in ['sink', 'path']:
+        assert results[query_id]['error'] is None, 'Query failed.'
+        assert results[query_id]['result'] == query_executor.run(query=queries[query_id]), \
+            'Batch results differ from the serial results.'
+    assert results['unknown_sink']['error'].startswith('ValueError'), 'Error is not reported.'
+    assert fwg_data_if.flood_wave_graph.number_of_nodes() == number_of_fwg_nodes, \
+        'The selection modified the FWG.'
+    assert len(next(iter(fwg_data_if.flood_wave_graph.nodes))) == 3, \
+        'Water levels were removed from the FWG.'
+
+
+def test_query_service(tmp_path):
+    generator, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=15, number_of_years=1, seed=2
+    )
+    query_executor = QueryExecutor(
+        data_if=pipeline_runner.get_artifact(stage='data'),
+        fwg_data_if=pipeline_runner.get_artifact(stage='fwg'),
+        wng_data_if=pipeline_runner.get_artifact(stage='wng')
+    )
+
+    path = generator.get_path_to_outlet(reg_number='100014')
+    query = {'selector': 'wng_sink',
+             'temporal_filtering': {'start_date': '1990-01-01', 'end_date': '1990-04-01'},
+             'spatial_filtering': {'sink': path[-1]}}
+
+    def send_requests(port: int) -> list:
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        responses = []
+        for method, endpoint, body in [('POST', '/analyse', query), ('POST', '/analyse', query),
+                                       ('POST', '/select', query), ('GET', '/unknown', None),
+                                       ('GET', '/stats', None)]:
+            connection.request(method, endpoint, body=None if body is None else json.dumps(body))
+            response = connection.getresponse()
+            responses.append((response.status, json.loads(response.read())))
+        connection.close()
+        return responses
+
+    async def run_service() -> Tuple[list, list, tuple]:
+        query_service = QueryService(query_executor=query_executor, port=0)
+        await query_service.start()
+        try:
+            responses = await asyncio.to_thread(send_requests, query_service.port)
+            concurrent_responses = await asyncio.gather(*[
+                asyncio.to_thread(send_requests, query_service.port) for _ in range(3)
+            ])
+
+            def fail(query: dict) -> dict:
+                raise RuntimeError('Unexpected error.')
+            query_service.operations['/plot'] = fail
+            error_response = await query_service.handle_request(
+                method='POST', path='/plot', body=json.dumps(query).encode()
+            )
+        finally:
+            await query_service.stop()
+        return responses, concurrent_responses, error_response
+
+    responses, concurrent_responses, error_response = asyncio.run(run_service())
+    assert error_response == (500, {'error': 'RuntimeError: Unexpected error.'}), \
+        'Unexpected exceptions are not returned as a JSON error.'
+
+    expected = json.loads(json.dumps(query_executor.run(query=query), default=str))
+    assert [status for status, _ in responses] == [200, 200, 200, 404, 200], 'Wrong status codes.'
+    assert responses[0][1] == expected, 'Service result differs from QueryExecutor.'
+    assert responses[1][1] == expected, 'Cached result differs.'
+    stats = responses[-1][1]
+    assert stats['connections'] == 1, 'Connection was not reused.'
+    assert stats['cache_hits'] == 1 and stats['cache_misses'] == 2, 'Wrong cache counters.'
+    for other_responses in concurrent_responses:
+        assert other_responses[0][1] == expected, 'Concurrent result differs.'
+
+
+def test_fwg_query_cache(tmp_path):
+    cache = FWGQueryCache(max_entries=2)
+    for i in range(3):
+        cache.put(key=FWGQueryCache.get_key('key', i), value=[i])
+    assert cache.get(key=FWGQueryCache.get_key('key', 0)) is None, 'Oldest entry is not evicted.'
+    assert cache.get(key=FWGQueryCache.get_key('key', 2)) == [2], 'Entry is missing.'
+    assert FWGQueryCache.get_key({'a': 1, 'b': 2}) == FWGQueryCache.get_key({'b': 2, 'a': 1}), \
+        'Keys depend on the order of the dictionary keys.'
+    assert cache.get(key=('key', 2), identities=([2], )) is None, 'Identities are not checked.'
+
+    small_cache = FWGQueryCache(max_bytes=FWGQueryCache.get_size(list(range(100))) + 1)
+    small_cache.put(key=('a', ), value=list(range(100)))
+    small_cache.put(key=('b', ), value=list(range(100)))
+    assert small_cache.get_stats()['entries'] == 1, 'Byte limit is not applied.'
+
+    generator, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=15, number_of_years=1, seed=2
+    )
+    data_if = pipeline_runner.get_artifact(stage='data')
+    fwg_data_if = pipeline_runner.get_artifact(stage='fwg')
+    wng_data_if = pipeline_runner.get_artifact(stage='wng')
+
+    cache = FWGQueryCache()
+    query_executor = QueryExecutor(
+        data_if=data_if, fwg_data_if=fwg_data_if, wng_data_if=wng_data_if, cache=cache
+    )
+    sink = generator.get_path_to_outlet(reg_number='100014')[-1]
+    query = {'selector': 'wng_sink',
+             'temporal_filtering': {'start_date': '1990-01-01', 'end_date': '1990-04-01'},
+             'spatial_filtering': {'sink': sink}}
+    same_query = {'selector': 'wng_sink',
+                  'temporal_filtering': {'end_date': pd.Timestamp('1990-04-01'),
+                                         'start_date': '1990-01-01'},
+                  'spatial_filtering': {'sink': sink}}
+
+    first_selector = query_executor.select(query=query)
+    first_waves = query_executor.extract(query=query, selector=first_selector)
+    second_selector = query_executor.select(query=same_query)
+    second_waves = query_executor.extract(query=same_query, selector=second_selector)
+    assert second_selector.fwg_subgraph is first_selector.fwg_subgraph, 'Selection is recomputed.'
+    assert second_waves == first_waves, 'Cached flood waves differ.'
+    assert cache.get_stats()['hits'] == 2 and cache.get_stats()['misses'] == 2, \
+        'Wrong cache counters.'
+
+    fwg_data_if.version += 1
+    third_selector = query_executor.select(query=query)
+    assert third_selector.fwg_subgraph is not first_selector.fwg_subgraph, \
+        'Selection of an older FWG version is reused.'
+
+
+def test_wng_path_fwg_plot_preparer():
+    wng_path = nx.DiGraph([('1', '2'), ('2', '3')])
+    fwg = nx.DiGraph()
+    fwg.add_edges_from([
+        (('1', '2000-01-01', 10), ('2', '2000-01-02', 11)),
+        (('2', '2000-01-02', 11), ('3', '2000-01-03', 12)),
+        (('1', '2000-01-05', 10), ('2', '2000-01-05', 11)),
+        (('1', '2000-01-09', 10), ('2', '2000-01-10', 11)),
+        (('2', '2000-01-10', 11), ('3', '2000-01-12', 12))
+    ])
+
+    plot_preparer = WNGPathFWGPlotPreparer(fwg_subgraph=fwg, wng_path=wng_path)
+    plot_preparer.run()
+    assert plot_preparer.positions[('1', '2000-01-01', 10)] == (-1, 3), 'Wrong position.'
+    assert plot_preparer.positions[('3', '2000-01-12', 12)] == (10, 1), 'Wrong position.'
+    assert plot_preparer.positions == PositionCreator.create_positions(
+        graph=fwg, reg_numbers=['1', '2', '3']
+    ), 'Positions differ from PositionCreator.'
+
+    plot_preparer.run(start_date='2000-01-02', end_date='2000-01-09')
+    assert set(plot_preparer.graph_to_plot.edges) == {
+        (('2', '2000-01-02', 11), ('3', '2000-01-03', 12)),
+        (('1', '2000-01-05', 10), ('2', '2000-01-05', 11))
+    }, 'Wrong cut graph.'
+    assert plot_preparer.nodes == list(plot_preparer.graph_to_plot.nodes), 'Nodes are not aligned.'
+
+    plot_preparer.run(max_time_steps=3)
+    aggregated_graph = plot_preparer.graph_to_plot
+    assert set(aggregated_graph.nodes) == {
+        ('1', '2000-01-01'), ('2', '2000-01-01'), ('3', '2000-01-01'), ('1', '2000-01-05'),
+        ('2', '2000-01-05'), ('1', '2000-01-09'), ('2', '2000-01-09'), ('3', '2000-01-09')
+    }, 'Wrong time buckets.'
+    assert aggregated_graph.nodes[('1', '2000-01-01')]['weight'] == 1, 'Wrong node weight.'
+    assert aggregated_graph.number_of_edges() == 5, 'Wrong aggregated edges.'
+    assert len(plot_preparer.x_coords) == len(plot_preparer.nodes), 'Coordinates are not aligned.'
+
+
+def test_wng_sink_fwg_plot_preparer(tmp_path):
+    generator, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=15, number_of_years=1, seed=3
+    )
+    data_if = pipeline_runner.get_artifact(stage='data')
+    query_executor = QueryExecutor(
+        data_if=data_if, fwg_data_if=pipeline_runner.get_artifact(stage='fwg'),
+        wng_data_if=pipeline_runner.get_artifact(stage='wng')
+    )
+    selector = query_executor.select(query={
+        'selector': 'wng_sink',
+        'temporal_filtering': {'start_date': '1990-01-01', 'end_date': '1990-12-31'},
+        'spatial_filtering': {'sink': generator.get_path_to_outlet(reg_number='100014')[-1]}
+    })
+
+    plot_preparer = WNGSinkFWGPlotPreparer(
+        data_if=data_if, fwg_subgraph=selector.fwg_subgraph, wng_subgraph=selector.wng_subgraph
+    )
+    plot_preparer.run()
+
+    station_dates = {station: set() for station in selector.wng_subgraph.nodes}
+    for node in selector.fwg_subgraph.nodes:
+        coordinates = data_if.station_coordinates[node[0]]
+        assert plot_preparer.node_positions[node] == (coordinates['EOVy'], coordinates['EOVx']), \
+            'Wrong node position.'
+        station_dates[node[0]].add(node[1])
+    for station, dates in station_dates.items():
+        assert plot_preparer.dates_dict[station] == sorted(dates), 'Wrong dates of a station.'
+
+    for start_date, end_date in [('1990-03-01', None), ('1990-03-01', '1990-03-20'),
+                                 ('1989-01-01', '1990-01-05'), ('1991-02-01', '1991-03-01')]:
+        last_date = start_date if end_date is None else end_date
+        expected = [any(start_date <= date <= last_date for date in station_dates[station])
+                    for station in plot_preparer.stations]
+        assert plot_preparer.get_active_stations(
+            start_date=start_date, end_date=end_date
+        ).tolist() == expected, 'Wrong active stations.'
+
+
+def test_fwg_shard_store(tmp_path):
+    generator, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=10, number_of_years=3, seed=4,
+        do_save_fwg=True, fwg_shard_partition='hydrological_year'
+    )
+    fwg_data_if = pipeline_runner.get_artifact(stage='fwg')
+    wng_data_if = pipeline_runner.get_artifact(stage='wng')
+
+    shard_store = FWGShardStore(data_folder_path=str(tmp_path))
+    assert sorted(shard_store.read_manifest()) == ['1990', '1991', '1992', '1993'], \
+        'Wrong hydrological years.'
+    assert shard_store.get_shard_names(start_key='1990-10-20', end_key='1990-11-10') == \
+        ['1990', '1991'], 'Wrong overlapping shards.'
+
+    temporal_filtering = {'start_date': '1991-10-15', 'end_date': '1991-11-15'}
+    spatial_filtering = {'sink': generator.get_path_to_outlet(reg_number='100009')[-1]}
+    full_selector = WNGSinkFWGSelector(
+        data_folder_path=None, fwg_data_if=fwg_data_if, wng_data_if=wng_data_if
+    )
+    full_selector.run(temporal_filtering=temporal_filtering, spatial_filtering=spatial_filtering)
+    shard_selector = WNGSinkFWGSelector(
+        data_folder_path=None, fwg_data_if=None, wng_data_if=wng_data_if, shard_store=shard_store
+    )
+    shard_selector.run(temporal_filtering=temporal_filtering, spatial_filtering=spatial_filtering)
+
+    assert shard_store.loaded_shard_names == {'1991', '1992'}, 'Wrong shards are loaded.'
+    assert set(shard_selector.fwg_subgraph.edges) == set(full_selector.fwg_subgraph.edges), \
+        'Sharded selection differs from the selection of the whole FWG.'
+
+    shard_store.load()
+    assert set(shard_store.fwg_data_if.flood_wave_graph.edges) == \
+        set(fwg_data_if.flood_wave_graph.edges), 'Shards do not add up to the FWG.'
+
+    query_inputs = pipeline_runner.get_query_inputs()
+    assert query_inputs['fwg_data_if'] is None, 'The FWG checkpoint is read.'
+    query = {'selector': 'wng_sink', 'temporal_filtering': temporal_filtering,
+             'spatial_filtering': spatial_filtering}
+    expected = QueryExecutor(
+        data_if=query_inputs['data_if'], fwg_data_if=fwg_data_if, wng_data_if=wng_data_if
+    ).run(query=query)
+    shard_query_executor = QueryExecutor(**query_inputs)
+    assert shard_query_executor.run(query=query) == expected, \
+        'Sharded query differs from the query of the whole FWG.'
+    assert query_inputs['shard_store'].loaded_shard_names == {'1991', '1992'}, \
+        'Wrong shards are loaded by the query.'
+    batch_query_runner = BatchQueryRunner(**pipeline_runner.get_query_inputs(), max_workers=1,
+                                          start_method='spawn')
+    assert batch_query_runner.run(queries=[query])[0]['result'] == expected, \
+        'Sharded batch query differs from the query of the whole FWG.'
+
+
+def test_bounding_box_fwg_selector(tmp_path):
+    rng = np.random.default_rng(0)
+    coordinates = rng.uniform(0, 1000, size=(500, 2))
+    reg_numbers = np.array([str(i) for i in range(500)])
+    station_grid_index = StationGridIndex(reg_numbers=reg_numbers, coordinates=coordinates)
+    is_in_box = (coordinates[:, 0] >= 200) & (coordinates[:, 0] <= 450) & \
+        (coordinates[:, 1] >= 100) & (coordinates[:, 1] <= 700)
+    assert station_grid_index.get_stations_in_box(
+        min_x=200, min_y=100, max_x=450, max_y=700
+    ) == reg_numbers[is_in_box].tolist(), 'Wrong stations in the box.'
+    is_in_triangle = (coordinates[:, 1] < coordinates[:, 0]) & (coordinates[:, 0] < 1000)
+    assert station_grid_index.get_stations_in_polygon(
+        polygon=[[0, 0], [1000, 0], [1000, 1000]]
+    ) == reg_numbers[is_in_triangle].tolist(), 'Wrong stations in the polygon.'
+    assert station_grid_index.get_stations_in_box(
+        min_x=-np.inf, min_y=-np.inf, max_x=np.inf, max_y=np.inf
+    ) == reg_numbers.tolist(), 'Open boxes lose stations.'
+    is_in_large_box = (coordinates[:, 0] >= 400) & (coordinates[:, 1] >= 400)
+    assert station_grid_index.get_stations_in_box(
+        min_x=400, min_y=400, max_x=1e20, max_y=1e20
+    ) == reg_numbers[is_in_large_box].tolist(), 'Huge boxes lose stations.'
+
+    coordinates[3] = np.nan
+    station_grid_index = StationGridIndex(reg_numbers=reg_numbers, coordinates=coordinates)
+    assert not np.isnan(station_grid_index.cell_size), 'Missing coordinates are indexed.'
+    assert station_grid_index.get_stations_in_box(
+        min_x=-np.inf, min_y=-np.inf, max_x=np.inf, max_y=np.inf
+    ) == np.delete(reg_numbers, 3).tolist(), 'Stations with missing coordinates are found.'
+
+    generator, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=20, number_of_years=1, seed=6
+    )
+    data_if = pipeline_runner.get_artifact(stage='data')
+    fwg_data_if = pipeline_runner.get_artifact(stage='fwg')
+
+    meta_data = generator.meta_data
+    region = meta_data[(meta_data['EOVx'] <= meta_data['EOVx'].median()) &
+                       (meta_data['EOVy'] <= meta_data['EOVy'].median())]
+    selector = BoundingBoxFWGSelector(
+        data_folder_path=None, fwg_data_if=fwg_data_if,
+        wng_data_if=pipeline_runner.get_artifact(stage='wng'), data_if=data_if
+    )
+    selector.run(
+        temporal_filtering={'start_date': '1990-03-01', 'end_date': '1990-06-01'},
+        spatial_filtering={'bounding_box': [meta_data['EOVx'].min(), meta_data['EOVy'].min(),
+                                            meta_data['EOVx'].median(),
+                                            meta_data['EOVy'].median()]}
+    )
+
+    assert set(selector.wng_subgraph.nodes) == set(region['reg']), 'Wrong stations are selected.'
+    expected_nodes = set(
+        node for node in fwg_data_if.flood_wave_graph.nodes
+        if node[0] in set(region['reg']) and '1990-03-01' <= node[1] <= '1990-06-01'
+    )
+    assert set(selector.fwg_subgraph.nodes) <= expected_nodes, 'Wrong FWG nodes are selected.'
+    assert selector.fwg_subgraph.number_of_edges() > 0, 'No edges are selected.'
+
+
+def test_temporal_reachability_index(tmp_path):
+    generator, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=12, number_of_years=1, seed=7
+    )
+    fwg = pipeline_runner.get_artifact(stage='fwg').flood_wave_graph
+
+    reachability_index = TemporalReachabilityIndex(fwg=fwg)
+    outlet = generator.get_path_to_outlet(reg_number='100011')[-1]
+
+    for node in list(fwg.nodes)[::25]:
+        descendants = nx.descendants(fwg, node)
+        expected = {}
+        for descendant in descendants:
+            earliest, latest = expected.get(descendant[0], (descendant[1], descendant[1]))
+            expected[descendant[0]] = (min(earliest, descendant[1]), max(latest, descendant[1]))
+        assert reachability_index.get_downstream(node=node) == expected, 'Wrong labels.'
+
+        last_key = (pd.Timestamp(node[1]) + pd.Timedelta(days=4)).strftime('%Y-%m-%d')
+        expected_latest = max([d[1] for d in descendants if d[0] == outlet and d[1] <= last_key],
+                              default=None)
+        downstream = reachability_index.get_downstream(node=node, max_steps=4)
+        assert downstream.get(outlet, (None, None))[1] == expected_latest, \
+            'Wrong latest arrival within the time limit.'
+
+    for start_date, end_date in [('1990-03-01', '1990-03-08'), ('1990-07-10', '1990-07-10'),
+                                 ('1990-01-01', '1990-12-31')]:
+        targets = [node for node in fwg.nodes
+                   if node[0] == outlet and start_date <= node[1] <= end_date]
+        expected = set().union(*[nx.ancestors(fwg, target) for target in targets])
+        upstream = reachability_index.get_upstream(
+            station=outlet, start_date=start_date, end_date=end_date
+        )
+        assert set(upstream) == expected, 'Wrong upstream nodes.'
+        assert len(upstream) == len(expected), 'Duplicated upstream nodes.'
+
+
+def test_flood_wave_event_table(tmp_path):
+    _, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=15, number_of_years=2, seed=8
+    )
+    data_if = pipeline_runner.get_artifact(stage='data')
+    extractor_if = pipeline_runner.get_artifact(stage='extraction')
+    assert extractor_if.flood_waves, 'No flood waves to test with.'
+
+    event_table = FloodWaveEventTable(
+        extractor_if=extractor_if, data_if=data_if, is_equivalence_applied=True
+    )
+    event_table.run()
+    events = event_table.events
+    analyser = FloodWaveAnalyser(
+        extractor_if=extractor_if, data_if=data_if, is_equivalence_applied=True
+    )
+    analyser.run()
+
+    assert events['distance'].tolist() == analyser.distances, 'Distances differ from analyser.'
+    assert events['duration'].tolist() == analyser.durations, 'Durations differ from analyser.'
+    wave = extractor_if.flood_waves[0]
+    assert events.loc[0, 'attenuation'] == wave[0][2] - wave[-1][2], 'Wrong attenuation.'
+    is_moving = events['duration'] > 0
+    assert np.allclose(events.loc[is_moving, 'celerity'],
+                       events.loc[is_moving, 'distance'] / events.loc[is_moving, 'duration']), \
+        'Wrong celerity.'
+
+    segments = event_table.segments
+    assert len(segments) == sum(len(wave) - 1 for wave in extractor_if.flood_waves), \
+        'Wrong number of segments.'
+    assert segments.groupby('wave')['lag'].sum().tolist() == \
+        events.loc[events['number_of_nodes'] > 1, 'duration'].tolist(), \
+        'Segment lags do not add up to the durations.'
+
+    by_year = event_table.aggregate(by=['start_river', 'year'])
+    assert by_year[('duration', 'count')].sum() == len(events), 'Wrong grouped counts.'
+    assert set(by_year.index.get_level_values('year')) <= {1990, 1991}, 'Wrong years.'
+
+
+def test_fwg_edge_attributes(tmp_path):
+    _, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=12, number_of_years=1, seed=9
+    )
+    data_if = pipeline_runner.get_artifact(stage='data')
+    station_river_data_if = pipeline_runner.get_artifact(stage='station_rivers')
+    preparer_if = pipeline_runner.get_artifact(stage='fwg_preparation')
+    fwg = pipeline_runner.get_artifact(stage='fwg').flood_wave_graph
+
+    assert fwg.number_of_edges() > 0, 'No edges to test with.'
+    for start, end, attributes in fwg.edges(data=True):
+        lag = (pd.Timestamp(end[1]) - pd.Timestamp(start[1])).days
+        assert attributes['lag'] == lag, 'Wrong lag.'
+        assert attributes['level_difference'] == end[2] - start[2], 'Wrong level difference.'
+        completed_river = station_river_data_if.completed_rivers[
+            preparer_if.river_names[attributes['river']]
+        ]
+        assert start[0] in completed_river and end[0] in completed_river, 'Wrong river.'
+
+    fwg_builder = FloodWaveGraphBuilder(preparer_interface=preparer_if, max_lag=1)
+    fwg_builder.run()
+    fwg_preparer = FloodWaveGraphPreparer(
+        data_if=data_if, station_river_data_if=station_river_data_if, beta=1, delta=2
+    )
+    fwg_preparer.run()
+    assert set(fwg_builder.fwg_if.flood_wave_graph.edges) == set(fwg_preparer.preparer_if.edges), \
+        'Filtering by lag differs from a smaller beta.'
+    assert fwg_preparer.find_edges(delta_peak_bools=fwg_preparer.find_delta_peaks()) == \
+        fwg_preparer.preparer_if.edges, 'Edges without attributes differ.'
+
+    chunked_preparer = ChunkedFloodWaveGraphPreparer(
+        dl=DataLoader(data_folder_path=str(tmp_path), do_load_time_series=False),
+        station_river_data_if=station_river_data_if, beta=3, delta=2, block_size=50,
+        data_folder_path=str(tmp_path)
+    )
+    chunked_preparer.run()
+    chunked_builder = FloodWaveGraphBuilder(preparer_interface=chunked_preparer.preparer_if)
+    chunked_builder.run()
+    assert dict(chunked_builder.fwg_if.flood_wave_graph.edges) == dict(fwg.edges), \
+        'Chunked edge attributes differ.'
+
+
+def test_streaming_statistics(tmp_path):
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.lognormal(3, 1, 5000), -rng.lognormal(1, 1, 1000), np.zeros(100)])
+    quantiles = np.linspace(0, 1, 41)
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    sketch.add(values[:3000])
+    other_sketch = QuantileSketch(relative_accuracy=0.01)
+    other_sketch.add(values[3000:])
+    sketch.merge(other=other_sketch)
+    exact = np.quantile(values, quantiles)
+    assert np.all(np.abs(np.array(sketch.get_quantiles(quantiles)) - exact) <=
+                  0.01 * np.abs(exact) + 1e-9), 'Quantiles are not within the relative accuracy.'
+    assert sketch.count == len(values) and sketch.min == values.min() and \
+        sketch.max == values.max(), 'Wrong exact statistics.'
+    even_sketch = QuantileSketch(relative_accuracy=0.01)
+    even_sketch.add(np.array([1.0, 100.0]))
+    assert abs(even_sketch.get_quantile(0.5) - 50.5) <= 0.01 * 50.5, \
+        'The median of an even number of values is not interpolated.'
+
+    _, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=15, number_of_years=2, seed=8
+    )
+    data_if = pipeline_runner.get_artifact(stage='data')
+    extractor_if = pipeline_runner.get_artifact(stage='extraction')
+    flood_waves = extractor_if.flood_waves
+    assert flood_waves, 'No flood waves to test with.'
+
+    analyser = FloodWaveAnalyser(
+        extractor_if=extractor_if, data_if=data_if, is_equivalence_applied=True
+    )
+    results = analyser.run()
+    streaming_analyser = StreamingFloodWaveAnalyser(data_if=data_if, is_equivalence_applied=True)
+    worker_analyser = StreamingFloodWaveAnalyser(data_if=data_if, is_equivalence_applied=True)
+    streaming_analyser.add_flood_waves(flood_waves=flood_waves[:len(flood_waves) // 2])
+    worker_analyser.add_flood_waves(flood_waves=flood_waves[len(flood_waves) // 2:])
+    streaming_results = streaming_analyser.merge(other=worker_analyser).get_statistical_results()
+
+    assert streaming_results['number_of_flood_waves'] == results['number_of_flood_waves'], \
+        'Wrong number of flood waves.'
+    for key in ['spatial_statistics', 'temporal_statistics']:
+        for statistic in ['mean', 'min', 'max']:
+            assert np.isclose(streaming_results[key][statistic], results[key][statistic]), \
+                f'Wrong {statistic} in {key}.'
+        exact_median = results[key]['median']
+        assert abs(streaming_results[key]['median'] - exact_median) <= 0.01 * abs(exact_median), \
+            f'Median of {key} is not within the relative accuracy.'
+
+
+def test_periodic_flood_wave_statistics(tmp_path):
+    _, pipeline_runner = create_synthetic_pipeline(
+        folder_path=str(tmp_path), number_of_stations=15, number_of_years=3, seed=8
+    )
+    data_if = pipeline_runner.get_artifact(stage='data')
+    extractor_if = pipeline_runner.get_artifact(stage='extraction')
+    flood_waves = extractor_if.flood_waves
+    assert flood_waves, 'No flood waves to test with.'
+
+    periodic_analyser = PeriodicFloodWaveAnalyser(
+        extractor_if=extractor_if, data_if=data_if, is_equivalence_applied=True,
+        bucket_type='hydrological_year', boundary_policy='start'
+    )
+    results = periodic_analyser.run()
+    for label, bucket_results in results.items():
+        year = int(label)
+        bucket_waves = [wave for wave in flood_waves
+                        if f'{year - 1}-11-01' <= wave[0][1] <= f'{year}-10-31']
+        bucket_extractor_if = FloodWaveExtractorInterface()
+        bucket_extractor_if.flood_waves = bucket_waves
+        analyser = FloodWaveAnalyser(
+            extractor_if=bucket_extractor_if, data_if=data_if, is_equivalence_applied=True
+        )
+        assert bucket_results == analyser.run(), f'Wrong statistics of {label}.'
+    assert sum(bucket_results['number_of_flood_waves'] for bucket_results in results.values()) \
+        == len(flood_waves), 'Waves are lost or duplicated.'
+
+    window_starts = pd.date_range(start='1990-01-01', end='1993-01-01', freq='20D')
+    for boundary_policy in ['overlap', 'contained']:
+        periodic_analyser = PeriodicFloodWaveAnalyser(
+            extractor_if=extractor_if, data_if=data_if, is_equivalence_applied=True,
+            bucket_type='window', boundary_policy=boundary_policy,
+            window_length='30D', window_step='20D', origin='1990-01-01'
+        )
+        results = periodic_analyser.run()
+        for window_start in window_starts:
+            first_key = window_start.strftime('%Y-%m-%d')
+            last_key = (window_start + pd.Timedelta(days=29)).strftime('%Y-%m-%d')
+            if boundary_policy == 'overlap':
+                expected = sum(wave[0][1] <= last_key and first_key <= wave[-1][1]
+                               for wave in flood_waves)
+            else:
+                expected = sum(first_key <= wave[0][1] and wave[-1][1] <= last_key
+                               for wave in flood_waves)
+            assert results.get(first_key, {'number_of_flood_waves': 0})[
+                'number_of_flood_waves'] == expected, \
+                f'Wrong number of waves in the window of {first_key} ({boundary_policy}).'
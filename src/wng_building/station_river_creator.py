@@ -1,6 +1,5 @@
-import copy
-
 from src.data_handling.data_interface import DataInterface
+from src.profiling.stage_profiler import StageProfiler
 from src.wng_building.station_river_data_interface import StationRiverDataInterface
 
 
@@ -17,6 +16,10 @@ class StationRiverCreator:
 
         self.station_river_if = StationRiverDataInterface()
 
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'stations': len(self.station_river_if.stations),
+        'rivers': len(self.station_river_if.rivers)
+    })
     def run(self) -> None:
         """
         Run function. Gets stations, rivers and completed rivers.
@@ -73,11 +76,12 @@ class StationRiverCreator:
     def create_completed_rivers(self, rivers: dict) -> dict:
         """
         Creates completed rivers. Uses river_connections to append the rivers with some
-        "completing" stations.
-        :return dict rivers: dictionary containing the rivers
+        "completing" stations. The lists of the rivers are not modified, the completed rivers
+        are new lists.
+        :param dict rivers: dictionary containing the rivers
         :return dict: dictionary containing the completed rivers
         """
-        completed_rivers = copy.deepcopy(rivers)
+        completed_rivers = {river_name: list(stations) for river_name, stations in rivers.items()}
         for river_name in list(self.data_if.river_connections.keys()):
             close_beginning = self.data_if.river_connections[river_name]['close_beginning']
             close_ending = self.data_if.river_connections[river_name]['close_ending']
@@ -1,6 +1,7 @@
 import networkx as nx
 
 from src.data_handling.generated_dataloader import GeneratedDataLoader
+from src.profiling.stage_profiler import StageProfiler
 from src.wng_building.station_river_data_interface import StationRiverDataInterface
 from src.wng_building.wng_data_interface import WNGDataInterface
 
@@ -11,19 +12,29 @@ class WaterNetworkGraphBuilder:
     along the way.
     """
     def __init__(self, station_river_if: StationRiverDataInterface,
-                 do_save_all: bool, data_folder_path: str):
+                 do_save_all: bool, data_folder_path: str, artifact_format: str = 'bundle'):
         """
         Constructor.
         :param StationRiverDataInterface station_river_if: a StationRiverDataInterface instance
         :param bool do_save_all: whether to save all created data structures or not
         :param str data_folder_path: path of the data folder
+        :param str artifact_format: 'bundle' for saving everything into one compressed file,
+        'pickle' for saving every data structure into its own pickle file
         """
+        if artifact_format not in ['bundle', 'pickle']:
+            raise ValueError(f'Unknown artifact format: {artifact_format}')
+
         self.station_river_if = station_river_if
         self.do_save_all = do_save_all
         self.data_folder_path = data_folder_path
+        self.artifact_format = artifact_format
 
         self.wng_if = WNGDataInterface()
 
+    @StageProfiler.profile_stage(get_counts=lambda self: {
+        'nodes': self.wng_if.water_network_graph.number_of_nodes(),
+        'edges': self.wng_if.water_network_graph.number_of_edges()
+    })
     def run(self) -> None:
         """
         Run function. Gets vertices, edges of rivers, edges of completed rivers, the WNG,
@@ -81,21 +92,22 @@ class WaterNetworkGraphBuilder:
     @staticmethod
     def create_water_network_graph(completed_river_edges: dict) -> nx.DiGraph:
         """
-        Takes the union of the graphs of completed rivers to get the WNG.
+        Takes the union of the graphs of completed rivers to get the WNG. All edges are inserted
+        in one pass, the names of the completed rivers containing an edge are stored in the
+        'rivers' edge attribute.
         :param dict completed_river_edges: dictionary containing the edges of the
         completed rivers
         :return nx.DiGraph: the WNG
         """
-        water_network_graph = nx.DiGraph()
-        for river_name in list(completed_river_edges.keys()):
-            completed_river_graph = nx.DiGraph()
-            completed_river_graph.add_edges_from(
-                completed_river_edges[river_name]
-            )
+        edge_rivers = {}
+        for river_name, edges in completed_river_edges.items():
+            for edge in edges:
+                edge_rivers.setdefault(edge, []).append(river_name)
 
-            water_network_graph = nx.compose(
-                water_network_graph, completed_river_graph
-            )
+        water_network_graph = nx.DiGraph()
+        water_network_graph.add_edges_from(
+            (start, end, {'rivers': rivers}) for (start, end), rivers in edge_rivers.items()
+        )
 
         return water_network_graph
 
@@ -104,6 +116,36 @@ class WaterNetworkGraphBuilder:
         Saves all created data structures: vertices, rivers (individually), completed rivers
         (individually), and the WNG.
         """
+        if self.artifact_format == 'bundle':
+            self.save_bundle()
+        else:
+            self.save_pickles()
+
+    def save_bundle(self) -> None:
+        """
+        Saves all created data structures into generated/water_network_graph/wng_bundle.zip.
+        The members are 'vertices', 'rivers/<river_name>', 'completed_rivers/cl_<river_name>'
+        (lists of edges) and 'water_network_graph' (the WNG). A single river can be read with
+        GeneratedDataLoader.read_bundle.
+        """
+        data = {'vertices': self.wng_if.vertices}
+        for river_name in list(self.wng_if.river_edges.keys()):
+            data[f'rivers/{river_name}'] = self.wng_if.river_edges[river_name]
+            data[f'completed_rivers/cl_{river_name}'] = \
+                self.wng_if.completed_river_edges[river_name]
+        data['water_network_graph'] = self.wng_if.water_network_graph
+
+        GeneratedDataLoader.save_bundle(
+            data=data,
+            data_folder_path=self.data_folder_path,
+            folder_name='water_network_graph',
+            file_name='wng_bundle'
+        )
+
+    def save_pickles(self) -> None:
+        """
+        Saves all created data structures into individual pickle files.
+        """
         # save vertices
         GeneratedDataLoader.save_pickle(
             vertices=self.wng_if.vertices, edges=[],